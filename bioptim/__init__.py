@@ -14,3 +14,4 @@ from .misc.non_linear_program import NonLinearProgram
 from .misc.optimal_control_program import OptimalControlProgram
 from .misc.parameters import ParameterList
 from .misc.simulate import Simulate
+from .misc.solution_library import SolutionLibrary
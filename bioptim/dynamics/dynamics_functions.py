@@ -1,6 +1,8 @@
-from casadi import vertcat, MX
+from casadi import vertcat
 import biorbd
 
+from ..interfaces.biorbd_interface import BiorbdInterface
+
 
 class DynamicsFunctions:
     """
@@ -16,6 +18,7 @@ class DynamicsFunctions:
     def forward_dynamics_torque_driven(states, controls, parameters, nlp):
         """
         Forward dynamics (q, qdot, qddot -> tau) with external forces driven by joint torques (controls).
+        The external forces of the node are the symbolic input nlp.f_ext.
         :param states: States. (MX.sym from CasADi)
         :param controls: Controls. (MX.sym from CasADi)
         :param nlp: An OptimalControlProgram class.
@@ -28,18 +31,13 @@ class DynamicsFunctions:
         q_dot = nlp.model.computeQdot(q, qdot).to_mx()
         qdot_reduced = nlp.mapping["q"].reduce.map(q_dot)
 
-        if nlp.external_forces:
-            dxdt = MX(nlp.nx, nlp.ns)
-            for i, f_ext in enumerate(nlp.external_forces):
-                qddot = nlp.model.ForwardDynamics(q, qdot, tau, f_ext).to_mx()
-                qddot_reduced = nlp.mapping["q_dot"].reduce.map(qddot)
-                dxdt[:, i] = vertcat(qdot_reduced, qddot_reduced)
+        if nlp.external_forces is not None:
+            f_ext = BiorbdInterface.convert_mx_to_external_forces(nlp.f_ext)
+            qddot = nlp.model.ForwardDynamics(q, qdot, tau, f_ext).to_mx()
         else:
             qddot = nlp.model.ForwardDynamics(q, qdot, tau).to_mx()
-            qddot_reduced = nlp.mapping["q_dot"].reduce.map(qddot)
-            dxdt = vertcat(qdot_reduced, qddot_reduced)
-
-        return dxdt
+        qddot_reduced = nlp.mapping["q_dot"].reduce.map(qddot)
+        return vertcat(qdot_reduced, qddot_reduced)
 
     @staticmethod
     def forward_dynamics_torque_driven_with_contact(states, controls, parameters, nlp):
@@ -355,6 +353,61 @@ class DynamicsFunctions:
         biorbd.Model.ForwardDynamicsConstraintsDirect(nlp.model, q, qdot, tau, cs)
         return cs.getForce().to_mx()
 
+    @staticmethod
+    def forward_dynamics_implicit(states, controls, parameters, nlp):
+        """
+        Derivative of the states when the generalized accelerations are controls (implicit dynamics).
+        :param states: States. (MX.sym from CasADi)
+        :param controls: Controls. (MX.sym from CasADi)
+        :param nlp: An OptimalControlProgram class.
+        :return: Vertcat of derived states. (MX.sym from CasADi)
+        """
+        DynamicsFunctions.apply_parameters(parameters, nlp)
+        q, qdot, _ = DynamicsFunctions.dispatch_q_qdot_tau_data(states, controls, nlp)
+
+        q_dot = nlp.model.computeQdot(q, qdot).to_mx()
+        qdot_reduced = nlp.mapping["q"].reduce.map(q_dot)
+        qddot_reduced = controls[nlp.nu - nlp.shape["q_ddot"] :]
+        return vertcat(qdot_reduced, qddot_reduced)
+
+    @staticmethod
+    def inverse_dynamics_residual_torque_driven(states, controls, parameters, nlp):
+        """
+        Residual of the inverse dynamics (q, qdot, qddot -> tau) driven by joint torques (controls).
+        :param states: States. (MX.sym from CasADi)
+        :param controls: Controls. (MX.sym from CasADi)
+        :param nlp: An OptimalControlProgram class.
+        :return: Difference between the inverse dynamics and the joint torques. (MX.sym from CasADi)
+        """
+        DynamicsFunctions.apply_parameters(parameters, nlp)
+        q, qdot, tau = DynamicsFunctions.dispatch_q_qdot_tau_data(states, controls, nlp)
+        qddot = DynamicsFunctions.dispatch_qddot_data(controls, nlp)
+
+        return nlp.model.InverseDynamics(q, qdot, qddot).to_mx() - tau
+
+    @staticmethod
+    def inverse_dynamics_residual_muscle_activations_and_torque_driven(states, controls, parameters, nlp):
+        """
+        Residual of the inverse dynamics (q, qdot, qddot -> tau) driven by joint torques and muscles (controls).
+        :param states: States. (MX.sym from CasADi)
+        :param controls: Controls. (MX.sym from CasADi)
+        :param nlp: An OptimalControlProgram class.
+        :return: Difference between the inverse dynamics and the joint torques. (MX.sym from CasADi)
+        """
+        DynamicsFunctions.apply_parameters(parameters, nlp)
+        q, qdot, residual_tau = DynamicsFunctions.dispatch_q_qdot_tau_data(states, controls, nlp)
+        qddot = DynamicsFunctions.dispatch_qddot_data(controls, nlp)
+
+        muscles_states = biorbd.VecBiorbdMuscleState(nlp.shape["muscle"])
+        muscles_activations = controls[nlp.shape["tau"] : nlp.shape["tau"] + nlp.shape["muscle"]]
+
+        for k in range(nlp.shape["muscle"]):
+            muscles_states[k].setActivation(muscles_activations[k])
+        muscles_tau = nlp.model.muscularJointTorque(muscles_states, q, qdot).to_mx()
+        tau = muscles_tau + residual_tau
+
+        return nlp.model.InverseDynamics(q, qdot, qddot).to_mx() - tau
+
     @staticmethod
     def dispatch_q_qdot_tau_data(states, controls, nlp):
         """
@@ -374,6 +427,17 @@ class DynamicsFunctions:
 
         return q, qdot, tau
 
+    @staticmethod
+    def dispatch_qddot_data(controls, nlp):
+        """
+        Returns the generalized accelerations (unreduced by a potential symmetry) of the implicit dynamics.
+        They are the last controls.
+        :param controls: Controls. (MX.sym from CasADi)
+        :param nlp: An OptimalControlProgram class.
+        :return: qddot -> Generalized coordinates accelerations. (MX.sym from CasADi)
+        """
+        return nlp.mapping["q_dot"].expand.map(controls[nlp.nu - nlp.shape["q_ddot"] :])
+
     @staticmethod
     def apply_parameters(mx, nlp):
         for key in nlp.parameters_to_optimize:
@@ -33,6 +33,23 @@ class Problem:
         else:
             Problem.configure_forward_dyn_func(ocp, nlp, DynamicsFunctions.forward_dynamics_torque_driven)
 
+    @staticmethod
+    def torque_driven_implicit(ocp, nlp):
+        """
+        Names states (nlp.x) and controls (nlp.u) and gives size to (nlp.nx) and (nlp.nu).
+        Works with torques but without muscles. The generalized accelerations are controls and the dynamics is
+        enforced by the inverse dynamics (nlp.implicit_dynamics_func), which avoids the inversion of the mass matrix.
+        :param nlp: An instance of the OptimalControlProgram class.
+        """
+        Problem.configure_q_qdot(nlp, True, False)
+        Problem.configure_tau(nlp, False, True)
+        Problem.configure_qddot(nlp, False, True)
+        if nlp.dynamics_type.dynamics:
+            Problem.configure_forward_dyn_func(ocp, nlp, DynamicsFunctions.custom)
+        else:
+            Problem.configure_forward_dyn_func(ocp, nlp, DynamicsFunctions.forward_dynamics_implicit)
+        Problem.configure_implicit_dyn_func(ocp, nlp, DynamicsFunctions.inverse_dynamics_residual_torque_driven)
+
     @staticmethod
     def torque_driven_with_contact(ocp, nlp):
         """
@@ -116,6 +133,27 @@ class Problem:
         else:
             Problem.configure_forward_dyn_func(ocp, nlp, DynamicsFunctions.forward_dynamics_torque_muscle_driven)
 
+    @staticmethod
+    def muscle_activations_and_torque_driven_implicit(ocp, nlp):
+        """
+        Names states (nlp.x) and controls (nlp.u) and gives size to (nlp.nx) and (nlp.nu).
+        Works with torques and muscles. The generalized accelerations are controls and the dynamics is
+        enforced by the inverse dynamics (nlp.implicit_dynamics_func), which avoids the inversion of the mass matrix.
+        :param nlp: An OptimalControlProgram class.
+        """
+        Problem.configure_q_qdot(nlp, True, False)
+        Problem.configure_tau(nlp, False, True)
+        Problem.configure_muscles(nlp, False, True)
+        Problem.configure_qddot(nlp, False, True)
+
+        if nlp.dynamics_type.dynamics:
+            Problem.configure_forward_dyn_func(ocp, nlp, DynamicsFunctions.custom)
+        else:
+            Problem.configure_forward_dyn_func(ocp, nlp, DynamicsFunctions.forward_dynamics_implicit)
+        Problem.configure_implicit_dyn_func(
+            ocp, nlp, DynamicsFunctions.inverse_dynamics_residual_muscle_activations_and_torque_driven
+        )
+
     @staticmethod
     def muscle_excitations_driven(ocp, nlp):
         """
@@ -279,6 +317,50 @@ class Problem:
         nlp.nx = nlp.x.rows()
         nlp.nu = nlp.u.rows()
 
+    @staticmethod
+    def configure_qddot(nlp, as_states, as_controls):
+        """
+        Configures the generalized accelerations for the implicit dynamics. They are mapped as the velocities.
+        :param nlp: An OptimalControlProgram class.
+        """
+        dof_names = nlp.model.nameDof()
+        q_ddot_mx = MX()
+        for i in nlp.mapping["q_dot"].expand.map_idx:
+            q_ddot_mx = vertcat(q_ddot_mx, MX.sym("Qddot_" + dof_names[i].to_string(), 1, 1))
+
+        nlp.shape["q_ddot"] = nlp.mapping["q_dot"].reduce.len
+        legend_qddot = ["qddot_" + nlp.model.nameDof()[idx].to_string() for idx in nlp.mapping["q_dot"].reduce.map_idx]
+        nlp.q_ddot = q_ddot_mx
+
+        if as_states:
+            raise NotImplementedError("Generalized accelerations can only be declared as controls")
+
+        if as_controls:
+            n_col = nlp.control_type.value
+            all_qddot = [nlp.CX() for _ in range(n_col)]
+            for i in nlp.mapping["q_dot"].reduce.map_idx:
+                for j in range(len(all_qddot)):
+                    all_qddot[j] = vertcat(all_qddot[j], nlp.CX.sym(f"Qddot_{dof_names[i].to_string()}_{j}", 1, 1))
+
+            offset = nlp.u.rows()
+            nlp.u = vertcat(nlp.u, horzcat(*all_qddot))
+            nlp.var_controls["q_ddot"] = nlp.shape["q_ddot"]
+            qddot_bounds = nlp.u_bounds[offset : offset + nlp.shape["q_ddot"]]
+
+            if nlp.control_type == ControlType.LINEAR_CONTINUOUS:
+                plot_type = PlotType.PLOT
+            else:
+                plot_type = PlotType.STEP
+            nlp.plot["q_ddot"] = CustomPlot(
+                lambda x, u, p: u[offset : offset + nlp.shape["q_ddot"]],
+                plot_type=plot_type,
+                legend=legend_qddot,
+                bounds=qddot_bounds,
+            )
+
+        nlp.nx = nlp.x.rows()
+        nlp.nu = nlp.u.rows()
+
     @staticmethod
     def configure_q_qdot(nlp, as_states, as_controls):
         """
@@ -445,13 +527,38 @@ class Problem:
         nlp.np = symbolic_params.rows()
         MX_symbolic_params = MX.sym("p", nlp.np, 1)
 
+        symbolic_inputs = [MX_symbolic_states, MX_symbolic_controls, MX_symbolic_params]
+        input_names = ["x", "u", "p"]
+        if nlp.external_forces is not None:
+            # The external forces of a node are an input, so a single function serves all the nodes
+            nlp.f_ext = MX.sym("f_ext", nlp.external_forces.shape[0], 1)
+            symbolic_inputs.append(nlp.f_ext)
+            input_names.append("f_ext")
+
         dynamics = dyn_func(MX_symbolic_states, MX_symbolic_controls, MX_symbolic_params, nlp)
         if isinstance(dynamics, (list, tuple)):
             dynamics = vertcat(*dynamics)
-        nlp.dynamics_func = Function(
-            "ForwardDyn",
+        nlp.dynamics_func = Function("ForwardDyn", symbolic_inputs, [dynamics], input_names, ["xdot"]).expand()
+
+    @staticmethod
+    def configure_implicit_dyn_func(ocp, nlp, dyn_func):
+        """
+        Declares the inverse dynamics residual (nlp.implicit_dynamics_func) of the implicit formulations. It is
+        enforced as a path constraint (ConstraintFcn.IMPLICIT_DYNAMICS) when the program is built
+        :param nlp: An OptimalControlProgram class.
+        :param dyn_func: Function returning the residual between the inverse dynamics and the generalized forces
+        """
+        if nlp.external_forces is not None:
+            raise NotImplementedError("External forces are not implemented yet with implicit dynamics")
+
+        MX_symbolic_states = MX.sym("x", nlp.nx, 1)
+        MX_symbolic_controls = MX.sym("u", nlp.nu, 1)
+        MX_symbolic_params = MX.sym("p", nlp.np, 1)
+
+        nlp.implicit_dynamics_func = Function(
+            "InverseDynamicsResidual",
             [MX_symbolic_states, MX_symbolic_controls, MX_symbolic_params],
-            [dynamics],
+            [dyn_func(MX_symbolic_states, MX_symbolic_controls, MX_symbolic_params, nlp)],
             ["x", "u", "p"],
-            ["xdot"],
+            ["tau_residual"],
         ).expand()
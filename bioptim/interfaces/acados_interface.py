@@ -1,8 +1,12 @@
-from datetime import datetime
+import os
+import hashlib
+import inspect
+from contextlib import contextmanager
+from time import perf_counter
 
 import numpy as np
 from scipy import linalg
-from casadi import SX, vertcat, Function, MX
+from casadi import SX, vertcat, Function, MX, DM, sqrt
 from acados_template import AcadosModel, AcadosOcp, AcadosOcpSolver
 
 from ..misc.enums import Node
@@ -11,6 +15,13 @@ from ..limits.objective_functions import ObjectiveFunction
 from ..limits.path_conditions import Bounds
 from ..misc.enums import InterpolationType
 from ..limits.penalty import PenaltyType
+from ..limits.continuity import StateTransitionFcn
+
+try:
+    import fcntl
+except ImportError:
+    # Concurrent code generations in the same cache are not protected on platforms without fcntl (Windows)
+    fcntl = None
 
 
 class AcadosInterface(SolverInterface):
@@ -27,6 +38,16 @@ class AcadosInterface(SolverInterface):
         self.acados_ocp = AcadosOcp(acados_path=acados_path)
         self.acados_model = AcadosModel()
 
+        # The generated code is stored in a directory per problem so it can be reused by the next processes
+        self.cache_dir = os.path.abspath("acados_cache")
+        if "acados_cache_dir" in solver_options:
+            self.cache_dir = os.path.abspath(solver_options["acados_cache_dir"])
+
+        # Phases with different dynamics are all evaluated at every stage, so it must be requested explicitly
+        self.stacked_phase_dynamics = False
+        if "stacked_phase_dynamics" in solver_options:
+            self.stacked_phase_dynamics = solver_options["stacked_phase_dynamics"]
+
         if "cost_type" in solver_options:
             self.__set_cost_type(solver_options["cost_type"])
         else:
@@ -47,27 +68,73 @@ class AcadosInterface(SolverInterface):
         self.W = np.zeros((0, 0))
         self.W_e = np.zeros((0, 0))
         self.status = None
+        self.rti_times = None
+        self.is_rti_prepared = False
+        self.last_sent = {}
+        # Parts of the problem computed again (and sent to the solver) at the next solve
+        self.outdated = {"costs", "constraints", "initial_guess", "stage_flags"}
+        self.y_ref_values = None
+        self.x_init_values = None
+        self.u_init_values = None
+        self.x_init_end = None
         self.out = {}
 
     def __acados_export_model(self, ocp):
-        if ocp.nb_phases > 1:
-            raise NotImplementedError("More than 1 phase is not implemented yet with ACADOS backend")
+        for nlp in ocp.nlp:
+            if nlp.external_forces is not None:
+                raise NotImplementedError("External forces are not implemented yet with ACADOS backend")
+            if nlp.nx != ocp.nlp[0].nx or nlp.nu != ocp.nlp[0].nu:
+                raise NotImplementedError("ACADOS only handles phases with the same number of states and controls")
+        for pt in ocp.state_transitions:
+            if pt.type == StateTransitionFcn.IMPACT and pt.phase_pre_idx < ocp.nb_phases - 1:
+                continue
+            if pt.type != StateTransitionFcn.CONTINUOUS:
+                raise NotImplementedError(
+                    "ACADOS only handles continuous and impact state transitions between consecutive phases"
+                )
+
+        # The phases are chained in a single horizon, the last node of a phase being the first node of the next one
+        self.phase_start = np.cumsum([0] + [nlp.ns for nlp in ocp.nlp])
+        self.stage_phase = np.concatenate([[i] * nlp.ns for i, nlp in enumerate(ocp.nlp)] + [[ocp.nb_phases - 1]])
 
         # Declare model variables
         x = ocp.nlp[0].X[0]
         u = ocp.nlp[0].U[0]
         p = ocp.nlp[0].p
-        if ocp.nlp[0].parameters_to_optimize:
-            for n in range(ocp.nb_phases):
-                for i in range(len(ocp.nlp[0].parameters_to_optimize)):
-                    if str(ocp.nlp[0].p[i]) == f"time_phase_{n}":
-                        raise RuntimeError("Time constraint not implemented yet with Acados.")
 
+        # The parameters (including the free phase times) are states with a null dynamics, so they are optimized
         self.params = ocp.nlp[0].parameters_to_optimize
         x = vertcat(p, x)
         x_dot = SX.sym("x_dot", x.shape[0], x.shape[1])
 
-        f_expl = vertcat([0] * ocp.nlp[0].np, ocp.nlp[0].dynamics_func(x[ocp.nlp[0].np :, :], u, p))
+        # The stages are equally spaced over the nominal duration of the program, so the dynamics of each phase is
+        # scaled to its own (possibly optimized) time step
+        self.phase_times = self.__nominal_phase_times(ocp)
+        self.stage_dt = sum(self.phase_times) / self.phase_start[-1]
+        if ocp.nb_phases == 1:
+            self.stage_flags = SX()
+            nlp = ocp.nlp[0]
+            f_expl = self.__time_scaling(nlp) * nlp.dynamics_func(x[nlp.np :, :], u, p)
+        else:
+            # Each stage sets the flag of its phase (and of the phase it ends) through the model parameters
+            self.stage_flags = SX.sym("stage_flags", 2 * ocp.nb_phases - 1, 1)
+            nlp = ocp.nlp[0]
+            dynamics = nlp.dynamics_func.serialize()
+            if all([other.dynamics_func.serialize() == dynamics for other in ocp.nlp[1:]]):
+                # The dynamics is evaluated once, only its time scaling depends on the phase of the stage
+                time_scaling = sum([self.stage_flags[i] * self.__time_scaling(nlp) for i, nlp in enumerate(ocp.nlp)])
+                f_expl = time_scaling * nlp.dynamics_func(x[nlp.np :, :], u, p)
+            elif self.stacked_phase_dynamics:
+                f_expl = 0
+                for i, nlp in enumerate(ocp.nlp):
+                    f_expl += self.stage_flags[i] * self.__time_scaling(nlp) * nlp.dynamics_func(x[nlp.np :, :], u, p)
+            else:
+                raise NotImplementedError(
+                    "With ACADOS, phases with different dynamics are all evaluated (and integrated) at every stage, "
+                    "so the cost of a stage grows with the number of phases. Set the solver option "
+                    "stacked_phase_dynamics to True to solve the program this way"
+                )
+        f_expl = vertcat([0] * ocp.nlp[0].np, f_expl)
         f_impl = x_dot - f_expl
 
         self.acados_model.f_impl_expr = f_impl
@@ -77,21 +144,80 @@ class AcadosInterface(SolverInterface):
         self.acados_model.u = u
         self.acados_model.con_h_expr = np.zeros((0, 0))
         self.acados_model.con_h_expr_e = np.zeros((0, 0))
-        self.acados_model.p = []
-        now = datetime.now()  # current date and time
-        self.acados_model.name = f"model_{now.strftime('%Y_%m_%d_%H%M%S%f')[:-4]}"
+        self.acados_model.p = self.stage_flags if self.stage_flags.numel() else []
+        # The name is replaced by the hash of the problem when the solver is created
+        self.acados_model.name = "model"
+
+    def __nominal_phase_times(self, ocp):
+        """
+        Duration of each phase, the free phase times being evaluated at their initial guess
+        :return: The durations (list of float)
+        """
+        p_init = np.zeros((ocp.nlp[0].np, 1))
+        if self.params:
+            p_init = np.concatenate([self.params[key].initial_guess.init[:, 0:1] for key in self.params])
+
+        phase_times = []
+        for nlp in ocp.nlp:
+            if isinstance(nlp.tf, (SX, MX)):
+                phase_times.append(float(Function("nominal_time", [nlp.p], [nlp.tf])(p_init)))
+            else:
+                phase_times.append(nlp.tf)
+        return phase_times
+
+    def __time_scaling(self, nlp):
+        """
+        Ratio between the time step of a phase and the time step of the ACADOS stages
+        :param nlp: The phase
+        :return: The ratio (float, or SX if the time of the phase is optimized)
+        """
+        return nlp.dt / self.stage_dt
 
     def __prepare_acados(self, ocp):
         # set model
         self.acados_ocp.model = self.acados_model
 
         # set time
-        self.acados_ocp.solver_options.tf = ocp.nlp[0].tf
+        self.acados_ocp.solver_options.tf = sum(self.phase_times)
 
         # set dimensions
         self.acados_ocp.dims.nx = ocp.nlp[0].nx + ocp.nlp[0].np
         self.acados_ocp.dims.nu = ocp.nlp[0].nu
-        self.acados_ocp.dims.N = ocp.nlp[0].ns
+        self.acados_ocp.dims.N = self.phase_start[-1]
+        if self.stage_flags.numel():
+            self.acados_ocp.dims.np = self.stage_flags.numel()
+            self.acados_ocp.parameter_values = np.zeros((self.stage_flags.numel(),))
+
+    def __stage_flags(self, n):
+        """
+        Value of the model parameters at a stage: the flag of the phase the stage belongs to and, if the stage is the
+        first node of a phase, the flag of the phase it ends
+        :param n: The stage (integer)
+        :return: The flags (numpy array)
+        """
+        nb_phases = self.ocp.nb_phases
+        flags = np.zeros((2 * nb_phases - 1,))
+        flags[self.stage_phase[n]] = 1
+        for i in range(nb_phases - 1):
+            if n == self.phase_start[i + 1]:
+                flags[nb_phases + i] = 1
+        return flags
+
+    def __phase_expression(self, ocp, phase_idx, val, node):
+        """
+        Express a value of a phase (defined on its own symbolic variables) with the variables of the model
+        :param phase_idx: The phase of the value (integer)
+        :param val: The value (SX)
+        :param node: The node the value is defined at, -1 for the last node (integer)
+        :return: The value as a function of the model variables (SX)
+        """
+        nlp = ocp.nlp[phase_idx]
+        x = self.acados_model.x[nlp.np :, :]
+        if node == -1:
+            func = Function(f"cas_phase_func_{phase_idx}", [nlp.X[-1], nlp.p], [val])
+            return func(x, nlp.p)
+        func = Function(f"cas_phase_func_{phase_idx}", [nlp.X[node], nlp.U[node], nlp.p], [val])
+        return func(x, self.acados_model.u, nlp.p)
 
     def __set_constr_type(self, constr_type="BGH"):
         self.acados_ocp.constraints.constr_type = constr_type
@@ -99,73 +225,134 @@ class AcadosInterface(SolverInterface):
 
     def __set_constrs(self, ocp):
         # constraints handling in self.acados_ocp
-        u_min = np.array(ocp.nlp[0].u_bounds.min)
-        u_max = np.array(ocp.nlp[0].u_bounds.max)
-        x_min = np.array(ocp.nlp[0].x_bounds.min)
-        x_max = np.array(ocp.nlp[0].x_bounds.max)
-        self.all_constr = SX()
-        self.end_constr = SX()
+        ns = self.acados_ocp.dims.N
+        nb_phases = ocp.nb_phases
+        all_constr = []
+        end_constr = []
         ##TODO:change for more node flexibility on bounds
-        self.all_g_bounds = Bounds(interpolation=InterpolationType.CONSTANT)
-        self.end_g_bounds = Bounds(interpolation=InterpolationType.CONSTANT)
-        for i in range(ocp.nb_phases):
-            for g, G in enumerate(ocp.nlp[i].g):
+        # The bounds of the path constraints are declared for each stage, so the rows of the other phases are disabled
+        lh = []
+        uh = []
+        end_g_bounds = []
+        # A path constraint declared with the same expression in several phases is evaluated once at each stage
+        path_constr = {}
+        for i, nlp in enumerate(ocp.nlp):
+            stages = self.stage_phase[:ns] == i
+            for g, G in enumerate(nlp.g):
                 if not G:
                     continue
-                if G[0]["constraint"].node[0] is Node.ALL:
-                    self.all_constr = vertcat(self.all_constr, G[0]["val"].reshape((-1, 1)))
-                    self.all_g_bounds.concatenate(G[0]["bounds"])
-                    if len(G) > ocp.nlp[0].ns:
-                        constr_end_func_tp = Function(f"cas_constr_end_func_{i}_{g}", [ocp.nlp[i].X[-1]], [G[0]["val"]])
-                        self.end_constr = vertcat(self.end_constr, constr_end_func_tp(ocp.nlp[i].X[0]).reshape((-1, 1)))
-                        self.end_g_bounds.concatenate(G[0]["bounds"])
-
-                elif G[0]["constraint"].node[0] is Node.END:
-                    constr_end_func_tp = Function(f"cas_constr_end_func_{i}_{g}", [ocp.nlp[i].X[-1]], [G[0]["val"]])
-                    self.end_constr = vertcat(self.end_constr, constr_end_func_tp(ocp.nlp[i].X[0]).reshape((-1, 1)))
-                    self.end_g_bounds.concatenate(G[0]["bounds"])
-
-                else:
+                if G[0]["constraint"].node[0] is not Node.ALL and G[0]["constraint"].node[0] is not Node.END:
                     raise RuntimeError(
                         "Except for states and controls, Acados solver only handles constraints on last or all nodes."
                     )
 
+                if G[0]["constraint"].node[0] is Node.ALL:
+                    val = self.__phase_expression(ocp, i, G[0]["val"], 0).reshape((-1, 1))
+                    key = str(val)
+                    if key not in path_constr:
+                        path_constr[key] = {"val": val, "flag": 0, "lh": 0, "uh": 0}
+                    if nb_phases > 1:
+                        path_constr[key]["flag"] += self.stage_flags[i]
+                    path_constr[key]["lh"] += self.__bounds_at_stages(G[0]["bounds"].min, stages, val.shape[0])
+                    path_constr[key]["uh"] += self.__bounds_at_stages(G[0]["bounds"].max, stages, val.shape[0])
+
+                if G[0]["constraint"].node[0] is Node.END or len(G) > nlp.ns:
+                    val = self.__phase_expression(ocp, i, G[-1]["val"], -1).reshape((-1, 1))
+                    if i == nb_phases - 1:
+                        end_constr.append(val)
+                        end_g_bounds.append(G[-1]["bounds"])
+                    else:
+                        # The end of a phase is the first stage of the next one
+                        stages_end = np.arange(ns) == self.phase_start[i + 1]
+                        all_constr.append(self.stage_flags[nb_phases + i] * val)
+                        lh.append(self.__bounds_at_stages(G[-1]["bounds"].min, stages_end, val.shape[0]))
+                        uh.append(self.__bounds_at_stages(G[-1]["bounds"].max, stages_end, val.shape[0]))
+
+        for constr in path_constr.values():
+            all_constr.append(constr["flag"] * constr["val"] if nb_phases > 1 else constr["val"])
+            lh.append(constr["lh"])
+            uh.append(constr["uh"])
+
+        # The node shared by two phases cannot jump, so an impact is a constraint of this node: the impulse of the
+        # contacts of the next phase must leave its velocities unchanged
+        for pt in ocp.state_transitions:
+            if pt.type != StateTransitionFcn.IMPACT:
+                continue
+            i = pt.phase_pre_idx
+            nlp_pre, nlp_post = ocp.nlp[i], ocp.nlp[i + 1]
+            val = pt.type.value[0](ocp, pt)[nlp_pre.shape["q"] :]
+            func = Function(f"cas_impact_func_{i}", [nlp_pre.X[-1], nlp_post.X[0], nlp_pre.p], [val])
+            x = self.acados_model.x[nlp_pre.np :, :]
+            val = func(x, x, nlp_pre.p).reshape((-1, 1))
+            stages_end = np.arange(ns) == self.phase_start[i + 1]
+            all_constr.append(self.stage_flags[nb_phases + i] * val)
+            lh.append(self.__bounds_at_stages(np.zeros((val.shape[0], 1)), stages_end, val.shape[0]))
+            uh.append(self.__bounds_at_stages(np.zeros((val.shape[0], 1)), stages_end, val.shape[0]))
+
+        self.all_constr = vertcat(SX(), *all_constr)
+        self.end_constr = vertcat(SX(), *end_constr)
+        self.lh = np.vstack([np.zeros((0, ns))] + lh)
+        self.uh = np.vstack([np.zeros((0, ns))] + uh)
+        self.end_g_bounds = Bounds(interpolation=InterpolationType.CONSTANT)
+        self.end_g_bounds.concatenate(*end_g_bounds)
+
         self.acados_model.con_h_expr = self.all_constr
         self.acados_model.con_h_expr_e = self.end_constr
 
-        if not np.all(np.all(u_min.T == u_min.T[0, :], axis=0)):
-            raise NotImplementedError("u_bounds min must be the same at each shooting point with ACADOS")
-        if not np.all(np.all(u_max.T == u_max.T[0, :], axis=0)):
-            raise NotImplementedError("u_bounds max must be the same at each shooting point with ACADOS")
-
-        if (
-            not np.isfinite(u_min).all()
-            or not np.isfinite(x_min).all()
-            or not np.isfinite(u_max).all()
-            or not np.isfinite(x_max).all()
-        ):
-            raise NotImplementedError(
-                "u_bounds and x_bounds cannot be set to infinity in ACADOS. Consider changing it"
-                "to a big value instead."
-            )
-
-        # setup state constraints
-        self.x_bound_max = np.ndarray((self.acados_ocp.dims.nx, 3))
-        self.x_bound_min = np.ndarray((self.acados_ocp.dims.nx, 3))
-        param_bounds_max = []
-        param_bounds_min = []
+        for nlp in ocp.nlp:
+            u_min = np.array(nlp.u_bounds.min)
+            u_max = np.array(nlp.u_bounds.max)
+            x_min = np.array(nlp.x_bounds.min)
+            x_max = np.array(nlp.x_bounds.max)
+            if not np.all(np.all(u_min.T == u_min.T[0, :], axis=0)):
+                raise NotImplementedError("u_bounds min must be the same at each shooting point with ACADOS")
+            if not np.all(np.all(u_max.T == u_max.T[0, :], axis=0)):
+                raise NotImplementedError("u_bounds max must be the same at each shooting point with ACADOS")
+
+            if (
+                not np.isfinite(u_min).all()
+                or not np.isfinite(x_min).all()
+                or not np.isfinite(u_max).all()
+                or not np.isfinite(x_max).all()
+            ):
+                raise NotImplementedError(
+                    "u_bounds and x_bounds cannot be set to infinity in ACADOS. Consider changing it"
+                    "to a big value instead."
+                )
 
+        # setup state constraints, the node shared by two phases must respect the bounds of both of them
+        n_params = ocp.nlp[0].np
+        self.x_bound_max = np.ndarray((self.acados_ocp.dims.nx, ns + 1))
+        self.x_bound_min = np.ndarray((self.acados_ocp.dims.nx, ns + 1))
         if self.params:
-            param_bounds_max = np.concatenate([self.params[key].bounds.max for key in self.params.keys()])[:, 0]
-            param_bounds_min = np.concatenate([self.params[key].bounds.min for key in self.params.keys()])[:, 0]
-
-        for i in range(3):
-            self.x_bound_max[:, i] = np.concatenate((param_bounds_max, np.array(ocp.nlp[0].x_bounds.max[:, i])))
-            self.x_bound_min[:, i] = np.concatenate((param_bounds_min, np.array(ocp.nlp[0].x_bounds.min[:, i])))
+            self.x_bound_max[:n_params, :] = np.concatenate([self.params[key].bounds.max for key in self.params])
+            self.x_bound_min[:n_params, :] = np.concatenate([self.params[key].bounds.min for key in self.params])
+            if (
+                not np.isfinite(self.x_bound_min[:n_params, :]).all()
+                or not np.isfinite(self.x_bound_max[:n_params, :]).all()
+            ):
+                raise NotImplementedError(
+                    "The bounds of the parameters (including the max_bound of the phase times) cannot be set to "
+                    "infinity in ACADOS. Consider changing it to a big value instead."
+                )
+        for n in range(ns + 1):
+            i = self.stage_phase[n]
+            self.x_bound_max[n_params:, n] = ocp.nlp[i].x_bounds.max.evaluate_at(n - self.phase_start[i])
+            self.x_bound_min[n_params:, n] = ocp.nlp[i].x_bounds.min.evaluate_at(n - self.phase_start[i])
+            if i > 0 and n == self.phase_start[i]:
+                nlp_pre = ocp.nlp[i - 1]
+                self.x_bound_max[n_params:, n] = np.minimum(
+                    self.x_bound_max[n_params:, n], nlp_pre.x_bounds.max.evaluate_at(nlp_pre.ns)
+                )
+                self.x_bound_min[n_params:, n] = np.maximum(
+                    self.x_bound_min[n_params:, n], nlp_pre.x_bounds.min.evaluate_at(nlp_pre.ns)
+                )
 
         # setup control constraints
-        self.acados_ocp.constraints.lbu = np.array(ocp.nlp[0].u_bounds.min[:, 0])
-        self.acados_ocp.constraints.ubu = np.array(ocp.nlp[0].u_bounds.max[:, 0])
+        self.u_bound_max = np.array([ocp.nlp[i].u_bounds.max[:, 0] for i in self.stage_phase[:ns]]).T
+        self.u_bound_min = np.array([ocp.nlp[i].u_bounds.min[:, 0] for i in self.stage_phase[:ns]]).T
+        self.acados_ocp.constraints.lbu = self.u_bound_min[:, 0]
+        self.acados_ocp.constraints.ubu = self.u_bound_max[:, 0]
         self.acados_ocp.constraints.idxbu = np.array(range(self.acados_ocp.dims.nu))
         self.acados_ocp.dims.nbu = self.acados_ocp.dims.nu
 
@@ -190,21 +377,33 @@ class AcadosInterface(SolverInterface):
         self.acados_ocp.dims.nbx_e = self.acados_ocp.dims.nx
 
         # setup algebraic constraint
-        self.acados_ocp.constraints.lh = np.array(self.all_g_bounds.min[:, 0])
-        self.acados_ocp.constraints.uh = np.array(self.all_g_bounds.max[:, 0])
+        self.acados_ocp.constraints.lh = self.lh[:, 0]
+        self.acados_ocp.constraints.uh = self.uh[:, 0]
 
         # setup terminal algebraic constraint
         self.acados_ocp.constraints.lh_e = np.array(self.end_g_bounds.min[:, 0])
         self.acados_ocp.constraints.uh_e = np.array(self.end_g_bounds.max[:, 0])
 
+    @staticmethod
+    def __bounds_at_stages(bound, stages, n_rows):
+        """
+        Bounds of a constraint for each stage. The stages where the constraint is not active are bounded to zero, as
+        the constraint is multiplied by a null flag
+        :param bound: The bound of each row of the constraint
+        :param stages: Whether the constraint is active at each stage (boolean array)
+        :param n_rows: Number of elements of the constraint, the bounds being repeated for each of its columns
+        :return: The bounds (n_rows x N)
+        """
+        bound = np.array(bound)[:, 0:1]
+        bounds = np.zeros((n_rows, stages.shape[0]))
+        bounds[:, stages] = np.tile(bound, (n_rows // bound.shape[0], 1))
+        return bounds
+
     def __set_cost_type(self, cost_type="NONLINEAR_LS"):
         self.acados_ocp.cost.cost_type = cost_type
         self.acados_ocp.cost.cost_type_e = cost_type
 
     def __set_costs(self, ocp):
-
-        if ocp.nb_phases != 1:
-            raise NotImplementedError("ACADOS with more than one phase is not implemented yet.")
         # costs handling in self.acados_ocp
         self.y_ref = []
         self.y_ref_end = []
@@ -222,6 +421,12 @@ class AcadosInterface(SolverInterface):
         ]
 
         if self.acados_ocp.cost.cost_type == "LINEAR_LS":
+            if ocp.nb_phases != 1:
+                raise NotImplementedError("ACADOS with more than one phase is only implemented for NONLINEAR_LS")
+            if isinstance(self.__time_scaling(ocp.nlp[0]), SX):
+                raise NotImplementedError("ACADOS with a free phase time is only implemented for NONLINEAR_LS")
+            if any(ocp.J):
+                raise NotImplementedError("Objectives on the parameters are only implemented for NONLINEAR_LS")
             self.Vu = np.array([], dtype=np.int64).reshape(0, ocp.nlp[0].nu)
             self.Vx = np.array([], dtype=np.int64).reshape(0, ocp.nlp[0].nx)
             self.Vxe = np.array([], dtype=np.int64).reshape(0, ocp.nlp[0].nx)
@@ -310,8 +515,10 @@ class AcadosInterface(SolverInterface):
                     else:
                         raise RuntimeError("The objective function is not Lagrange nor Mayer.")
 
-                if self.params:
-                    raise RuntimeError("Params not yet handled with LINEAR_LS cost type")
+            # The parameters lead the states of the model and are not penalized
+            n_params = ocp.nlp[0].np
+            self.Vx = np.hstack((np.zeros((self.Vx.shape[0], n_params)), self.Vx))
+            self.Vxe = np.hstack((np.zeros((self.Vxe.shape[0], n_params)), self.Vxe))
 
             # Set costs
             self.acados_ocp.cost.Vx = self.Vx if self.Vx.shape[0] else np.zeros((0, 0))
@@ -331,57 +538,81 @@ class AcadosInterface(SolverInterface):
             self.acados_ocp.cost.yref_e = np.zeros((self.acados_ocp.cost.W_e.shape[0],))
 
         elif self.acados_ocp.cost.cost_type == "NONLINEAR_LS":
-            for i in range(ocp.nb_phases):
-                for j, J in enumerate(ocp.nlp[i].J):
+            ns = self.acados_ocp.dims.N
+            for i, nlp in enumerate(ocp.nlp):
+                is_last_phase = i == ocp.nb_phases - 1
+                for j, J in enumerate(nlp.J):
+                    if not J:
+                        continue
+
+                    end_values = []
                     if J[0]["objective"].type.get_type() == ObjectiveFunction.LagrangeFunction:
-                        self.lagrange_costs = vertcat(self.lagrange_costs, J[0]["val"].reshape((-1, 1)))
-                        self.W = linalg.block_diag(self.W, np.diag([J[0]["objective"].weight] * J[0]["val"].numel()))
-                        if J[0]["target"] is not None:
-                            self.y_ref.append([J_tp["target"].T.reshape((-1, 1)) for J_tp in J])
-                        else:
-                            self.y_ref.append([np.zeros((J_tp["val"].numel(), 1)) for J_tp in J])
+                        val = self.__phase_expression(ocp, i, J[0]["val"], 0).reshape((-1, 1))
+                        # The stages being equally spaced, the cost is scaled to the time step of its phase
+                        time_scaling = self.__time_scaling(nlp)
+                        if isinstance(time_scaling, SX) and any([j_dict["target"] is not None for j_dict in J]):
+                            raise NotImplementedError(
+                                "Lagrange objectives with a target cannot be used with a free phase time with ACADOS"
+                            )
+                        val = sqrt(time_scaling) * val
+                        ref_scaling = 1 if isinstance(time_scaling, SX) else np.sqrt(time_scaling)
+                        if ocp.nb_phases > 1:
+                            val = self.stage_flags[i] * val
+                        self.lagrange_costs = vertcat(self.lagrange_costs, val)
+                        self.W = linalg.block_diag(self.W, np.diag([J[0]["objective"].weight] * val.numel()))
+                        self.y_ref.append(
+                            [
+                                (
+                                    ref_scaling * self.__reference(J[n - self.phase_start[i]])
+                                    if self.stage_phase[n] == i
+                                    else np.zeros((val.numel(), 1))
+                                )
+                                for n in range(ns)
+                            ]
+                        )
 
                         # Deal with last node to match ipopt formulation
-                        if J[0]["objective"].node[0].value == "all" and len(J) > ocp.nlp[0].ns:
-                            mayer_func_tp = Function(f"cas_mayer_func_{i}_{j}", [ocp.nlp[i].X[-1]], [J[0]["val"]])
-                            self.W_e = linalg.block_diag(
-                                self.W_e, np.diag([J[0]["objective"].weight] * J[0]["val"].numel())
-                            )
-                            self.mayer_costs = vertcat(
-                                self.mayer_costs, mayer_func_tp(ocp.nlp[i].X[0]).reshape((-1, 1))
-                            )
-                            if J[0]["target"] is not None:
-                                self.y_ref_end.append(J[-1]["target"].T.reshape((-1, 1)))
-                            else:
-                                self.y_ref_end.append(np.zeros((J[-1]["val"].numel(), 1)))
+                        if J[0]["objective"].node[0].value == "all" and len(J) > nlp.ns:
+                            end_values.append(J[-1])
 
                     elif J[0]["objective"].type.get_type() == ObjectiveFunction.MayerFunction:
-                        mayer_func_tp = Function(f"cas_mayer_func_{i}_{j}", [ocp.nlp[i].X[-1]], [J[0]["val"]])
-                        self.W_e = linalg.block_diag(
-                            self.W_e, np.diag([J[0]["objective"].weight] * J[0]["val"].numel())
-                        )
-                        self.mayer_costs = vertcat(self.mayer_costs, mayer_func_tp(ocp.nlp[i].X[0]).reshape((-1, 1)))
-                        if J[0]["target"] is not None:
-                            self.y_ref_end.append(J[0]["target"].T.reshape((-1, 1)))
-                        else:
-                            self.y_ref_end.append(np.zeros((J[0]["val"].numel(), 1)))
+                        end_values.append(J[0])
 
                     else:
                         raise RuntimeError("The objective function is not Lagrange nor Mayer.")
 
-                # parameter as mayer function
-                # IMPORTANT: it is considered that only parameters are stored in ocp.J, for now.
-                if self.params:
-                    for j, J in enumerate(ocp.J):
-                        mayer_func_tp = Function(f"cas_J_mayer_func_{i}_{j}", [ocp.nlp[i].X[-1]], [J[0]["val"]])
-                        self.W_e = linalg.block_diag(
-                            self.W_e, np.diag(([J[0]["objective"].weight] * J[0]["val"].numel()))
-                        )
-                        self.mayer_costs = vertcat(self.mayer_costs, mayer_func_tp(ocp.nlp[i].X[0]).reshape((-1, 1)))
-                        if J[0]["target"] is not None:
-                            self.y_ref_end.append(J[0]["target"].T.reshape((-1, 1)))
+                    for end_value in end_values:
+                        val = self.__phase_expression(ocp, i, end_value["val"], -1).reshape((-1, 1))
+                        weight = np.diag([J[0]["objective"].weight] * val.numel())
+                        if is_last_phase:
+                            self.mayer_costs = vertcat(self.mayer_costs, val)
+                            self.W_e = linalg.block_diag(self.W_e, weight)
+                            self.y_ref_end.append(self.__reference(end_value))
                         else:
-                            self.y_ref_end.append(np.zeros((J[0]["val"].numel(), 1)))
+                            # The end of a phase is the first stage of the next one
+                            self.lagrange_costs = vertcat(
+                                self.lagrange_costs, self.stage_flags[ocp.nb_phases + i] * val
+                            )
+                            self.W = linalg.block_diag(self.W, weight)
+                            self.y_ref.append(
+                                [
+                                    (
+                                        self.__reference(end_value)
+                                        if n == self.phase_start[i + 1]
+                                        else np.zeros((val.numel(), 1))
+                                    )
+                                    for n in range(ns)
+                                ]
+                            )
+
+            # parameter as mayer function
+            # IMPORTANT: it is considered that only parameters are stored in ocp.J, for now.
+            if self.params:
+                for j, J in enumerate(ocp.J):
+                    val = self.__phase_expression(ocp, ocp.nb_phases - 1, J[0]["val"], -1).reshape((-1, 1))
+                    self.W_e = linalg.block_diag(self.W_e, np.diag(([J[0]["objective"].weight] * val.numel())))
+                    self.mayer_costs = vertcat(self.mayer_costs, val)
+                    self.y_ref_end.append(self.__reference(J[0]))
 
             # Set costs
             self.acados_ocp.model.cost_y_expr = self.lagrange_costs if self.lagrange_costs.numel() else SX(1, 1)
@@ -405,70 +636,153 @@ class AcadosInterface(SolverInterface):
         else:
             raise RuntimeError("Available acados cost type: 'LINEAR_LS', 'NONLINEAR_LS' and 'EXTERNAL'.")
 
-    def __update_solver(self):
-        param_init = []
-        for n in range(self.acados_ocp.dims.N):
-            if self.y_ref:
-                self.ocp_solver.cost_set(n, "yref", np.vstack([data[n] for data in self.y_ref])[:, 0])
-            # check following line
-            # self.ocp_solver.cost_set(n, "W", self.W)
+        # The references of every node are gathered once
+        ns = self.acados_ocp.dims.N
+        self.y_ref_values = np.vstack([np.hstack(data[:ns]) for data in self.y_ref]) if self.y_ref else None
+
+    @staticmethod
+    def __reference(j_dict):
+        """
+        Reference of a least square cost entry
+        :param j_dict: The objective entry
+        :return: The target, or zeros if the objective has no target (column)
+        """
+        if j_dict["target"] is None:
+            return np.zeros((j_dict["val"].numel(), 1))
+        return j_dict["target"].T.reshape((-1, 1))
+
+    def __set_initial_guess(self, ocp):
+        """
+        Gather the initial guess of every node
+        :param ocp: The OptimalControlProgram
+        """
+        ns = self.acados_ocp.dims.N
+        n_params = ocp.nlp[0].np
 
-            if self.params:
-                param_init = np.concatenate(
-                    [self.params[key].initial_guess.init.evaluate_at(n) for key in self.params.keys()]
-                )
+        param_init = np.ndarray((n_params, ns + 1))
+        if self.params:
+            param_init[:, :] = np.concatenate([self.params[key].initial_guess.init[:, 0] for key in self.params])[
+                :, np.newaxis
+            ]
+        self.x_init_values = np.ndarray((n_params + ocp.nlp[0].nx, ns))
+        self.u_init_values = np.ndarray((ocp.nlp[0].nu, ns))
+        for n in range(ns):
+            nlp = ocp.nlp[self.stage_phase[n]]
+            self.x_init_values[:, n] = np.concatenate(
+                (param_init[:, n], nlp.x_init.init.evaluate_at(n - self.phase_start[self.stage_phase[n]]))
+            )
+            self.u_init_values[:, n] = nlp.u_init.init.evaluate_at(n - self.phase_start[self.stage_phase[n]])
 
-            self.ocp_solver.set(n, "x", np.concatenate((param_init, self.ocp.nlp[0].x_init.init.evaluate_at(n))))
-            self.ocp_solver.set(n, "u", self.ocp.nlp[0].u_init.init.evaluate_at(n))
-            self.ocp_solver.constraints_set(n, "lbu", self.ocp.nlp[0].u_bounds.min[:, 0])
-            self.ocp_solver.constraints_set(n, "ubu", self.ocp.nlp[0].u_bounds.max[:, 0])
-            self.ocp_solver.constraints_set(n, "uh", self.all_g_bounds.max[:, 0])
-            self.ocp_solver.constraints_set(n, "lh", self.all_g_bounds.min[:, 0])
+        self.x_init_end = None
+        nlp = ocp.nlp[-1]
+        if nlp.x_init.init.shape[1] == nlp.ns + 1:
+            self.x_init_end = np.concatenate((param_init[:, ns], nlp.x_init.init[:, nlp.ns]))
 
-            if n == 0:
-                self.ocp_solver.constraints_set(n, "lbx", self.x_bound_min[:, 0])
-                self.ocp_solver.constraints_set(n, "ubx", self.x_bound_max[:, 0])
-            else:
-                self.ocp_solver.constraints_set(n, "lbx", self.x_bound_min[:, 1])
-                self.ocp_solver.constraints_set(n, "ubx", self.x_bound_max[:, 1])
+    def __update_solver(self):
+        """
+        Send to the solver the parts of the problem modified since the previous solve
+        """
+        ns = self.acados_ocp.dims.N
 
-        if self.y_ref_end:
-            if len(self.y_ref_end) == 1:
-                self.ocp_solver.cost_set(self.acados_ocp.dims.N, "yref", np.array(self.y_ref_end[0])[:, 0])
-            else:
-                self.ocp_solver.cost_set(
-                    self.acados_ocp.dims.N, "yref", np.concatenate([data for data in self.y_ref_end])[:, 0]
-                )
-            # check following line
-            # self.ocp_solver.cost_set(self.acados_ocp.dims.N, "W", self.W_e)
-        self.ocp_solver.constraints_set(self.acados_ocp.dims.N, "lbx", self.x_bound_min[:, -1])
-        self.ocp_solver.constraints_set(self.acados_ocp.dims.N, "ubx", self.x_bound_max[:, -1])
-        if len(self.end_g_bounds.max[:, 0]):
-            self.ocp_solver.constraints_set(self.acados_ocp.dims.N, "uh", self.end_g_bounds.max[:, 0])
-            self.ocp_solver.constraints_set(self.acados_ocp.dims.N, "lh", self.end_g_bounds.min[:, 0])
-
-        if self.ocp.nlp[0].x_init.init.shape[1] == self.acados_ocp.dims.N + 1:
-            if self.params:
-                self.ocp_solver.set(
-                    self.acados_ocp.dims.N,
-                    "x",
-                    np.concatenate(
-                        (
-                            np.concatenate([self.params[key]["initial_guess"].init for key in self.params.keys()])[
-                                :, 0
-                            ],
-                            self.ocp.nlp[0].x_init.init[:, self.acados_ocp.dims.N],
-                        )
-                    ),
-                )
-            else:
-                self.ocp_solver.set(self.acados_ocp.dims.N, "x", self.ocp.nlp[0].x_init.init[:, self.acados_ocp.dims.N])
+        if "stage_flags" in self.outdated and self.stage_flags.numel():
+            for n in range(ns + 1):
+                self.__parameters_set(n, self.__stage_flags(n))
+
+        if "costs" in self.outdated:
+            if self.y_ref_values is not None:
+                for n in range(ns):
+                    self.__cost_set(n, "yref", self.y_ref_values[:, n])
+                    # check following line
+                    # self.ocp_solver.cost_set(n, "W", self.W)
+            if self.y_ref_end:
+                self.__cost_set(ns, "yref", np.concatenate(self.y_ref_end)[:, 0])
+                # check following line
+                # self.ocp_solver.cost_set(self.acados_ocp.dims.N, "W", self.W_e)
+
+        if "constraints" in self.outdated:
+            for n in range(ns):
+                self.__constraints_set(n, "lbu", self.u_bound_min[:, n])
+                self.__constraints_set(n, "ubu", self.u_bound_max[:, n])
+                self.__constraints_set(n, "uh", self.uh[:, n])
+                self.__constraints_set(n, "lh", self.lh[:, n])
+                self.__constraints_set(n, "lbx", self.x_bound_min[:, n])
+                self.__constraints_set(n, "ubx", self.x_bound_max[:, n])
+            self.__constraints_set(ns, "lbx", self.x_bound_min[:, ns])
+            self.__constraints_set(ns, "ubx", self.x_bound_max[:, ns])
+            if len(self.end_g_bounds.max[:, 0]):
+                self.__constraints_set(ns, "uh", self.end_g_bounds.max[:, 0])
+                self.__constraints_set(ns, "lh", self.end_g_bounds.min[:, 0])
+        else:
+            # The first node may have been fixed to a measured state by the feedback phase of a real-time iteration
+            self.__constraints_set(0, "lbx", self.x_bound_min[:, 0])
+            self.__constraints_set(0, "ubx", self.x_bound_max[:, 0])
+
+        # Otherwise, the solver starts from the solution of the previous solve
+        if "initial_guess" in self.outdated:
+            for n in range(ns):
+                self.ocp_solver.set(n, "x", self.x_init_values[:, n])
+                self.ocp_solver.set(n, "u", self.u_init_values[:, n])
+            if self.x_init_end is not None:
+                self.ocp_solver.set(ns, "x", self.x_init_end)
+
+        self.outdated = set()
+
+    def invalidate(self, modification):
+        """
+        Mark the parts of the problem depending on a modification of the program, so they are computed and sent to the
+        solver again at the next solve
+        :param modification: "objective_functions", "constraints", "parameters", "bounds" or "initial_guess" (string)
+        """
+        if modification == "objective_functions":
+            self.outdated.add("costs")
+        elif modification in ("constraints", "bounds"):
+            self.outdated.add("constraints")
+        elif modification == "initial_guess":
+            self.outdated.add("initial_guess")
+        else:
+            self.outdated.update(("costs", "constraints", "initial_guess"))
+
+    def __parameters_set(self, n, value):
+        """
+        Send the model parameters of a stage to the solver if they differ from the ones sent at the previous solve
+        """
+        if self.__is_already_sent("parameters", n, "p", value):
+            return
+        self.ocp_solver.set(n, "p", value)
+
+    def __cost_set(self, n, field, value):
+        """
+        Send a cost value to the solver if it differs from the one sent at the previous solve
+        """
+        if self.__is_already_sent("cost", n, field, value):
+            return
+        self.ocp_solver.cost_set(n, field, value)
+
+    def __constraints_set(self, n, field, value):
+        """
+        Send a constraint value to the solver if it differs from the one sent at the previous solve
+        """
+        if self.__is_already_sent("constraints", n, field, value):
+            return
+        self.ocp_solver.constraints_set(n, field, value)
+
+    def __is_already_sent(self, module, n, field, value):
+        value = np.array(value, dtype=float)
+        key = (module, n, field)
+        if key in self.last_sent and np.array_equal(self.last_sent[key], value):
+            return True
+        self.last_sent[key] = value
+        return False
 
     def configure(self, options):
         if "acados_dir" in options:
             del options["acados_dir"]
         if "cost_type" in options:
             del options["cost_type"]
+        if "acados_cache_dir" in options:
+            del options["acados_cache_dir"]
+        if "stacked_phase_dynamics" in options:
+            del options["stacked_phase_dynamics"]
         if self.ocp_solver is None:
             self.acados_ocp.solver_options.qp_solver = "PARTIAL_CONDENSING_HPIPM"  # FULL_CONDENSING_QPOASES
             self.acados_ocp.solver_options.hessian_approx = "GAUSS_NEWTON"
@@ -502,6 +816,87 @@ class AcadosInterface(SolverInterface):
                         f"[ACADOS] Only editable solver options after solver creation are :\n {available_options}"
                     )
 
+    def __create_solver(self):
+        """
+        Generate and compile the C code of the problem, or reload it if the same problem was already compiled in the
+        cache directory
+        :return: The AcadosOcpSolver
+        """
+        problem_hash = self.__problem_hash()
+        self.acados_model.name = f"model_{problem_hash[:16]}"
+        cache_path = os.path.join(self.cache_dir, problem_hash)
+        os.makedirs(cache_path, exist_ok=True)
+        self.acados_ocp.code_export_directory = os.path.join(cache_path, "c_generated_code")
+        json_file = os.path.join(cache_path, "acados_ocp.json")
+        built_marker = os.path.join(cache_path, "built")
+
+        # Older versions of acados_template always generate and build the code
+        can_reuse = "build" in inspect.signature(AcadosOcpSolver.__init__).parameters
+        with AcadosInterface.__cache_lock(cache_path):
+            if can_reuse and os.path.isfile(built_marker):
+                return AcadosOcpSolver(self.acados_ocp, json_file=json_file, build=False, generate=False)
+
+            ocp_solver = AcadosOcpSolver(self.acados_ocp, json_file=json_file)
+            open(built_marker, "w").close()
+            return ocp_solver
+
+    def __problem_hash(self):
+        """
+        Hash of everything that is compiled in the C code: the model and cost expressions, the constraints, the
+        dimensions and the solver options. Values that are set at each solve (bounds, targets and initial guesses)
+        are not part of it
+        :return: The hexadecimal digest (string)
+        """
+
+        def update(value):
+            if isinstance(value, (SX, MX)):
+                sha.update(str(value).encode())
+            elif isinstance(value, np.ndarray):
+                sha.update(str(value.shape).encode())
+                sha.update(np.ascontiguousarray(value, dtype=float).tobytes())
+            else:
+                sha.update(repr(value).encode())
+
+        sha = hashlib.sha256()
+        model = self.acados_model
+        for expr in (model.x, model.xdot, model.u, model.f_impl_expr, model.f_expl_expr):
+            update(expr)
+        update(model.con_h_expr)
+        update(model.con_h_expr_e)
+        update(getattr(model, "cost_y_expr", None))
+        update(getattr(model, "cost_y_expr_e", None))
+
+        cost = self.acados_ocp.cost
+        for key in ("cost_type", "cost_type_e", "W", "W_e", "Vx", "Vu", "Vx_e"):
+            update(getattr(cost, key, None))
+        constraints = self.acados_ocp.constraints
+        for key in ("constr_type", "constr_type_e", "idxbu", "idxbx_0", "idxbx", "idxbx_e", "Jbx", "Jbx_e"):
+            update(getattr(constraints, key, None))
+        for key, value in sorted(vars(self.acados_ocp.dims).items()):
+            update((key, value))
+        for key, value in sorted(vars(self.acados_ocp.solver_options).items()):
+            update(key)
+            update(value)
+        return sha.hexdigest()
+
+    @staticmethod
+    @contextmanager
+    def __cache_lock(cache_path):
+        """
+        Prevent two processes from generating the same code at the same time
+        :param cache_path: The directory of the generated code (string)
+        """
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(cache_path, "lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
     def get_iterations(self):
         raise NotImplementedError("return_iterations is not implemented yet with ACADOS backend")
 
@@ -511,12 +906,8 @@ class AcadosInterface(SolverInterface):
     def get_optimized_value(self):
         ns = self.acados_ocp.dims.N
         nx = self.acados_ocp.dims.nx
-        nq = self.ocp.nlp[0].q.shape[0]
         nparams = self.ocp.nlp[0].np
         acados_x = np.array([self.ocp_solver.get(i, "x") for i in range(ns + 1)]).T
-        acados_p = acados_x[:nparams, :]
-        acados_q = acados_x[nparams : nq + nparams, :]
-        acados_qdot = acados_x[nq + nparams : nx, :]
         acados_u = np.array([self.ocp_solver.get(i, "u") for i in range(ns)]).T
 
         out = {
@@ -527,14 +918,16 @@ class AcadosInterface(SolverInterface):
             "iter": self.ocp_solver.get_stats("sqp_iter")[0],
             "status": self.status,
         }
-        for i in range(ns):
-            out["x"] = vertcat(out["x"], acados_q[:, i])
-            out["x"] = vertcat(out["x"], acados_qdot[:, i])
-            out["x"] = vertcat(out["x"], acados_u[:, i])
-
-        out["x"] = vertcat(out["x"], acados_q[:, ns])
-        out["x"] = vertcat(out["x"], acados_qdot[:, ns])
-        out["x"] = vertcat(acados_p[:, 0], out["x"])
+        if self.rti_times is not None:
+            out["time_preparation"] = self.rti_times["preparation"]
+            out["time_feedback"] = self.rti_times["feedback"]
+
+        # V is [parameters, then for each phase: (q, q_dot, u) of each node, (q, q_dot) of the last node]
+        v = [acados_x[:nparams, 0]]
+        for start, end in zip(self.phase_start[:-1], self.phase_start[1:]):
+            states_and_controls = np.vstack((acados_x[nparams:nx, start:end], acados_u[:, start:end]))
+            v += [states_and_controls.reshape((-1,), order="F"), acados_x[nparams:nx, end]]
+        out["x"] = DM(np.concatenate(v))
         self.out["sol"] = out
         out = []
         for key in self.out.keys():
@@ -542,12 +935,67 @@ class AcadosInterface(SolverInterface):
         return out[0] if len(out) == 1 else out
 
     def solve(self):
-        # Populate costs and constrs vectors
-        self.__set_costs(self.ocp)
-        self.__set_constrs(self.ocp)
+        # Populate costs and constrs vectors, only if the program was modified since the previous solve
+        if "costs" in self.outdated:
+            self.__set_costs(self.ocp)
+        if "constraints" in self.outdated:
+            self.__set_constrs(self.ocp)
+        if "initial_guess" in self.outdated:
+            self.__set_initial_guess(self.ocp)
         if self.ocp_solver is None:
-            self.ocp_solver = AcadosOcpSolver(self.acados_ocp, json_file="acados_ocp.json")
+            self.ocp_solver = self.__create_solver()
         self.__update_solver()
+        if self.is_rti:
+            # Both the preparation and the feedback phases
+            self.ocp_solver.options_set("rti_phase", 0)
+            self.rti_times = None
+            self.is_rti_prepared = False
         self.status = self.ocp_solver.solve()
         self.get_optimized_value()
         return self
+
+    @property
+    def is_rti(self):
+        return self.acados_ocp.solver_options.nlp_solver_type == "SQP_RTI"
+
+    def prepare(self):
+        """
+        Preparation phase of the real-time iteration (linearization and condensing around the current iterate). It
+        does not depend on the current state, so it should be called before the measurement is available
+        """
+        if self.ocp_solver is None:
+            raise RuntimeError("The program must be solved once with ACADOS before calling prepare")
+        if not self.is_rti:
+            raise RuntimeError("prepare is only available with nlp_solver_type='SQP_RTI'")
+
+        tic = perf_counter()
+        self.ocp_solver.options_set("rti_phase", 1)
+        self.ocp_solver.solve()
+        self.rti_times = {"preparation": perf_counter() - tic}
+        self.is_rti_prepared = True
+
+    def feedback(self, x0):
+        """
+        Feedback phase of the real-time iteration. The initial state is fixed to the measured one and the prepared QP
+        is solved
+        :param x0: The measured states (nx)
+        :return: The solution, with the wall time of the preparation and feedback phases (dictionary)
+        """
+        if not self.is_rti_prepared:
+            raise RuntimeError("prepare must be called before feedback")
+
+        x0 = np.array(x0, dtype=float).reshape(-1)
+        if x0.shape[0] != self.ocp.nlp[0].nx:
+            raise RuntimeError(f"x0 should have {self.ocp.nlp[0].nx} elements, got {x0.shape[0]}")
+        n_params = self.ocp.nlp[0].np
+
+        tic = perf_counter()
+        self.__constraints_set(0, "lbx", np.concatenate((self.x_bound_min[:n_params, 0], x0)))
+        self.__constraints_set(0, "ubx", np.concatenate((self.x_bound_max[:n_params, 0], x0)))
+        self.ocp_solver.options_set("rti_phase", 2)
+        self.status = self.ocp_solver.solve()
+        self.rti_times["feedback"] = perf_counter() - tic
+        self.is_rti_prepared = False
+
+        self.get_optimized_value()
+        return self.out["sol"]
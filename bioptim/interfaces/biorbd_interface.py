@@ -1,5 +1,4 @@
 import numpy as np
-from casadi import MX
 import biorbd
 
 
@@ -11,37 +10,45 @@ class BiorbdInterface:
     @staticmethod
     def convert_array_to_external_forces(all_f_ext):
         """
-        Converts type of external forces from numpy array to biorbd.SpatialVector
+        Converts the external forces of each phase to a numeric matrix. The column k holds the spatial vectors
+        (6 rows each) of all the external forces at the k-th shooting node. These values are sent to the solver at
+        runtime, so they can be updated without rebuilding the program
         :param all_f_ext: all external forces (numpy array of size : 6 x number of external forces x number of shooting
         nodes or 6 x number of shooting nodes)
-        :return: sv_over_all_phases -> External phases. (biorbd.SpatialVector)
+        :return: The external forces of each phase (list of numpy array of size 6 x number of external forces by
+        number of shooting nodes)
         """
         if not isinstance(all_f_ext, (list, tuple)):
             raise RuntimeError(
                 "f_ext should be a list of (6 x nb_external_forces x nb_shooting) or (6 x nb_shooting) matrix"
             )
 
-        sv_over_all_phases = []
+        f_ext_over_all_phases = []
         for f_ext in all_f_ext:
-            f_ext = np.array(f_ext)
+            f_ext = np.array(f_ext, dtype=float)
             if len(f_ext.shape) < 2 or len(f_ext.shape) > 3:
                 raise RuntimeError(
                     "f_ext should be a list of (6 x nb_external_forces x nb_shooting) or (6 x nb_shooting) matrix"
                 )
             if len(f_ext.shape) == 2:
-                f_ext = f_ext[:, :, np.newaxis]
+                f_ext = f_ext[:, np.newaxis, :]
 
             if f_ext.shape[0] != 6:
                 raise RuntimeError(
                     "f_ext should be a list of (6 x nb_external_forces x nb_shooting) or (6 x nb_shooting) matrix"
                 )
+            f_ext_over_all_phases.append(f_ext.reshape((6 * f_ext.shape[1], f_ext.shape[2]), order="F"))
 
-            sv_over_phase = []
-            for node in range(f_ext.shape[2]):
-                sv = biorbd.VecBiorbdSpatialVector()
-                for idx in range(f_ext.shape[1]):
-                    sv.append(biorbd.SpatialVector(MX(f_ext[:, idx, node])))
-                sv_over_phase.append(sv)
-            sv_over_all_phases.append(sv_over_phase)
+        return f_ext_over_all_phases
 
-        return sv_over_all_phases
+    @staticmethod
+    def convert_mx_to_external_forces(f_ext):
+        """
+        Converts the symbolic external forces of one node to biorbd.SpatialVector
+        :param f_ext: The stacked spatial vectors of all the external forces (MX of size 6 x number of external forces)
+        :return: The external forces (biorbd.VecBiorbdSpatialVector)
+        """
+        sv = biorbd.VecBiorbdSpatialVector()
+        for idx in range(f_ext.shape[0] // 6):
+            sv.append(biorbd.SpatialVector(f_ext[6 * idx : 6 * (idx + 1)]))
+        return sv
@@ -1,20 +1,149 @@
-from casadi import Function, vertcat, horzcat, norm_fro, collocation_points, tangent, rootfinder
+import numpy as np
+from casadi import Function, SX, vertcat, horzcat, norm_fro, collocation_points, rootfinder, jacobian, solve, repmat
 
-from ..misc.enums import ControlType
+from ..misc.enums import ControlType, OdeSolver
 
 
-def RK4(ode, ode_opt):
+class ButcherTableau:
     """
-    Numerical integration using fourth order Runge-Kutta method.
+    Coefficients of an explicit Runge-Kutta method. If b_hat is provided, the method is embedded and the difference
+    between both solutions is used as an error estimate
+    """
+
+    def __init__(self, a, b, c, b_hat=None):
+        """
+        :param a: Lower triangular coefficients, one list per stage (list of lists)
+        :param b: Weights of the stages (list)
+        :param c: Normalized times of the stages (list)
+        :param b_hat: Weights of the stages of the embedded method (list)
+        """
+        if len(a) != len(b) or len(c) != len(b) or (b_hat is not None and len(b_hat) != len(b)):
+            raise RuntimeError("a, b, c (and b_hat) of a ButcherTableau must have the same number of stages")
+        for i, row in enumerate(a):
+            if len(row) != i:
+                raise RuntimeError("a of a ButcherTableau must be strictly lower triangular")
+
+        self.a = a
+        self.b = b
+        self.c = c
+        self.b_hat = b_hat
+
+    @property
+    def nb_stages(self):
+        return len(self.b)
+
+
+_sqrt21 = np.sqrt(21)
+butcher_tableaus = {
+    # Forward Euler
+    OdeSolver.RK1: ButcherTableau([[]], [1], [0]),
+    # Midpoint method, with forward Euler as embedded method
+    OdeSolver.RK2: ButcherTableau([[], [1 / 2]], [0, 1], [0, 1 / 2], b_hat=[1, 0]),
+    # Classical fourth order method
+    OdeSolver.RK4: ButcherTableau(
+        [[], [1 / 2], [0, 1 / 2], [0, 0, 1]], [1 / 6, 1 / 3, 1 / 3, 1 / 6], [0, 1 / 2, 1 / 2, 1]
+    ),
+    # Dormand-Prince 5(4)
+    OdeSolver.RK45: ButcherTableau(
+        [
+            [],
+            [1 / 5],
+            [3 / 40, 9 / 40],
+            [44 / 45, -56 / 15, 32 / 9],
+            [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+            [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+            [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+        ],
+        [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0],
+        [0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1],
+        b_hat=[5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40],
+    ),
+    # Cooper-Verner eighth order method
+    OdeSolver.RK8: ButcherTableau(
+        [
+            [],
+            [1 / 2],
+            [1 / 4, 1 / 4],
+            [1 / 7, (-7 - 3 * _sqrt21) / 98, (21 + 5 * _sqrt21) / 49],
+            [(11 + _sqrt21) / 84, 0, (18 + 4 * _sqrt21) / 63, (21 - _sqrt21) / 252],
+            [(5 + _sqrt21) / 48, 0, (9 + _sqrt21) / 36, (-231 + 14 * _sqrt21) / 360, (63 - 7 * _sqrt21) / 80],
+            [
+                (10 - _sqrt21) / 42,
+                0,
+                (-432 + 92 * _sqrt21) / 315,
+                (633 - 145 * _sqrt21) / 90,
+                (-504 + 115 * _sqrt21) / 70,
+                (63 - 13 * _sqrt21) / 35,
+            ],
+            [1 / 14, 0, 0, 0, (14 - 3 * _sqrt21) / 126, (13 - 3 * _sqrt21) / 63, 1 / 9],
+            [
+                1 / 32,
+                0,
+                0,
+                0,
+                (91 - 21 * _sqrt21) / 576,
+                11 / 72,
+                (-385 - 75 * _sqrt21) / 1152,
+                (63 + 13 * _sqrt21) / 128,
+            ],
+            [
+                1 / 14,
+                0,
+                0,
+                0,
+                1 / 9,
+                (-733 - 147 * _sqrt21) / 2205,
+                (515 + 111 * _sqrt21) / 504,
+                (-51 - 11 * _sqrt21) / 56,
+                (132 + 28 * _sqrt21) / 245,
+            ],
+            [
+                0,
+                0,
+                0,
+                0,
+                (-42 + 7 * _sqrt21) / 18,
+                (-18 + 28 * _sqrt21) / 45,
+                (-273 - 53 * _sqrt21) / 72,
+                (301 + 53 * _sqrt21) / 72,
+                (28 - 28 * _sqrt21) / 45,
+                (49 - 7 * _sqrt21) / 18,
+            ],
+        ],
+        [1 / 20, 0, 0, 0, 0, 0, 0, 49 / 180, 16 / 45, 49 / 180, 1 / 20],
+        [
+            0,
+            1 / 2,
+            1 / 2,
+            (7 + _sqrt21) / 14,
+            (7 + _sqrt21) / 14,
+            1 / 2,
+            (7 - _sqrt21) / 14,
+            (7 - _sqrt21) / 14,
+            1 / 2,
+            (7 + _sqrt21) / 14,
+            1,
+        ],
+    ),
+}
+
+
+def RK(ode, ode_opt):
+    """
+    Numerical integration using an explicit Runge-Kutta method described by its Butcher tableau.
     :param ode: ode["x"] -> States. ode["p"] -> Controls. ode["ode"] -> Ordinary differential equation function
     (dynamics of the system).
     :param ode_opt: ode_opt["t0"] -> Initial time of the integration. ode_opt["tf"] -> Final time of the integration.
-    ode_opt["number_of_finite_elements"] -> Number of steps between nodes. ode_opt["idx"] -> Index of ??. (integer)
-    :return: Integration function. (CasADi function)
+    ode_opt["number_of_finite_elements"] -> Number of steps between nodes. ode_opt["butcher_tableau"] -> Coefficients of
+    the method (ButcherTableau). ode_opt["external_forces"] -> Symbolic external forces of the node, they are then an
+    input ("f_ext") of the integrator (CX or None).
+    :return: Integration function. (CasADi function). If the tableau is embedded, the "xerr" output is the estimate of
+    the local error accumulated over the steps
     """
     t_span = ode_opt["t0"], ode_opt["tf"]
     n_step = ode_opt["number_of_finite_elements"]
-    idx = ode_opt["idx"]
+    tableau = ode_opt["butcher_tableau"]
+    f_ext_sym = ode_opt["external_forces"] if "external_forces" in ode_opt else None
     CX = ode_opt["CX"]
     x_sym = ode["x"]
     u_sym = ode["p"]
@@ -34,9 +163,10 @@ def RK4(ode, ode_opt):
         else:
             raise RuntimeError(f"{control_type} ControlType not implemented yet")
 
-    def dxdt(h, states, controls, params):
+    def dxdt(h, states, controls, params, *f_ext):
         u = controls
         x = CX(states.shape[0], n_step + 1)
+        x_err = CX.zeros(states.shape[0], 1)
         p = params
         x[:, 0] = states
 
@@ -51,11 +181,19 @@ def RK4(ode, ode_opt):
 
         for i in range(1, n_step + 1):
             t_norm_init = (i - 1) / n_step  # normalized time
-            k1 = fun(x[:, i - 1], get_u(u, t_norm_init), p)[:, idx]
-            k2 = fun(x[:, i - 1] + h / 2 * k1, get_u(u, t_norm_init + h_norm / 2), p)[:, idx]
-            k3 = fun(x[:, i - 1] + h / 2 * k2, get_u(u, t_norm_init + h_norm / 2), p)[:, idx]
-            k4 = fun(x[:, i - 1] + h * k3, get_u(u, t_norm_init + h_norm), p)[:, idx]
-            x[:, i] = x[:, i - 1] + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+            k = []
+            for stage in range(tableau.nb_stages):
+                x_stage = x[:, i - 1]
+                for j, a in enumerate(tableau.a[stage]):
+                    if a != 0:
+                        x_stage += h * a * k[j]
+                k.append(fun(x_stage, get_u(u, t_norm_init + tableau.c[stage] * h_norm), p, *f_ext))
+
+            x[:, i] = x[:, i - 1] + h * sum([b * k[stage] for stage, b in enumerate(tableau.b) if b != 0])
+            if tableau.b_hat is not None:
+                x_err += h * sum(
+                    [(b - b_hat) * k[stage] for stage, (b, b_hat) in enumerate(zip(tableau.b, tableau.b_hat))]
+                )
 
             for j in range(model.nbQuat()):
                 quaternion = vertcat(
@@ -65,11 +203,61 @@ def RK4(ode, ode_opt):
                 x[quat_idx[j][0] : quat_idx[j][2] + 1, i] = quaternion[1:4]
                 x[quat_idx[j][3], i] = quaternion[0]
 
+        if tableau.b_hat is not None:
+            return x[:, -1], x, x_err
         return x[:, -1], x
 
-    return Function(
-        "integrator", [x_sym, u_sym, param_sym], dxdt(h, x_sym, u_sym, param_sym), ["x0", "p", "params"], ["xf", "xall"]
-    )
+    inputs, input_names = [x_sym, u_sym, param_sym], ["x0", "p", "params"]
+    if f_ext_sym is not None:
+        inputs.append(f_ext_sym)
+        input_names.append("f_ext")
+    out_names = ["xf", "xall", "xerr"] if tableau.b_hat is not None else ["xf", "xall"]
+    return Function("integrator", inputs, dxdt(h, *inputs), input_names, out_names)
+
+
+def RK4(ode, ode_opt):
+    """
+    Numerical integration using fourth order Runge-Kutta method.
+    :param ode: ode["x"] -> States. ode["p"] -> Controls. ode["ode"] -> Ordinary differential equation function
+    (dynamics of the system).
+    :param ode_opt: ode_opt["t0"] -> Initial time of the integration. ode_opt["tf"] -> Final time of the integration.
+    ode_opt["number_of_finite_elements"] -> Number of steps between nodes. ode_opt["external_forces"] -> Symbolic
+    external forces of the node (CX or None).
+    :return: Integration function. (CasADi function)
+    """
+    return RK(ode, {**ode_opt, "butcher_tableau": butcher_tableaus[OdeSolver.RK4]})
+
+
+def collocation_coefficients(degree, scheme="legendre"):
+    """
+    Coefficients of the collocation and continuity equations of the IRK integrator. They only depend on the degree
+    and the scheme, so they are computed numerically once and cached
+    :param degree: Degree of the interpolating polynomial (integer)
+    :param scheme: Collocation points, "legendre" or "radau" (string)
+    :return: The normalized time points (including 0), the C matrix (C[j, r] is the derivative of the j-th Lagrange
+    polynomial at the r-th time point) and the D vector (value of the Lagrange polynomials at the end of the interval)
+    """
+    key = (degree, scheme)
+    if key not in _collocation_coefficients:
+        if scheme not in ("legendre", "radau"):
+            raise RuntimeError("scheme should be 'legendre' or 'radau'")
+        time_points = np.array([0] + collocation_points(degree, scheme))
+
+        C = np.zeros((degree + 1, degree + 1))
+        D = np.zeros(degree + 1)
+        for j in range(degree + 1):
+            # Lagrange polynomial of the j-th time point
+            lagrange = np.poly1d([1.0])
+            for r in range(degree + 1):
+                if r != j:
+                    lagrange *= np.poly1d([1.0, -time_points[r]]) / (time_points[j] - time_points[r])
+            D[j] = lagrange(1.0)
+            C[j, :] = np.polyder(lagrange)(time_points)
+        _collocation_coefficients[key] = time_points, C, D
+    return _collocation_coefficients[key]
+
+
+_collocation_coefficients = {}
 
 
 def IRK(ode, ode_opt):
@@ -78,12 +266,20 @@ def IRK(ode, ode_opt):
     :param ode: ode["x"] -> States. ode["p"] -> Controls. ode["ode"] -> Ordinary differential equation function
     (dynamics of the system).
     :param ode_opt: ode_opt["t0"] -> Initial time of the integration. ode_opt["tf"] -> Final time of the integration.
-    ode_opt["number_of_finite_elements"] -> Number of steps between nodes. ode_opt["idx"] -> Index of ??. (integer)
+    ode_opt["irk_polynomial_interpolation_degree"] -> Degree of the interpolating polynomial (integer).
+    ode_opt["irk_collocation_scheme"] -> Collocation points, "legendre" or "radau" (string).
+    ode_opt["irk_newton_iterations"] -> Number of Newton iterations written in the graph when CX is SX, since a
+    rootfinder cannot be used. The collocation equations are then solved approximately (starting from the initial
+    state) and the derivatives are the ones of the iterations, not the implicit function sensitivities. The residual
+    of the collocation equations is returned as an additional output ("residual") (integer).
+    ode_opt["external_forces"] -> Symbolic external forces of the node, they are then an input ("f_ext") of the
+    integrator (CX or None).
     :return: Integration function. (CasADi function)
     """
     t_span = ode_opt["t0"], ode_opt["tf"]
     degree = ode_opt["irk_polynomial_interpolation_degree"]
-    idx = ode_opt["idx"]
+    scheme = ode_opt["irk_collocation_scheme"] if "irk_collocation_scheme" in ode_opt else "legendre"
+    f_ext_sym = ode_opt["external_forces"] if "external_forces" in ode_opt else None
     CX = ode_opt["CX"]
     x_sym = ode["x"]
     u_sym = ode["p"]
@@ -92,6 +288,7 @@ def IRK(ode, ode_opt):
     step_time = t_span[1] - t_span[0]
     h = step_time
     control_type = ode_opt["control_type"]
+    nb_newton_iterations = ode_opt["irk_newton_iterations"] if "irk_newton_iterations" in ode_opt else 5
 
     def get_u(u, dt_norm):
         if control_type == ControlType.CONSTANT:
@@ -99,39 +296,11 @@ def IRK(ode, ode_opt):
         else:
             raise NotImplementedError(f"{control_type} ControlType not implemented yet")
 
-    def dxdt(h, states, controls, params):
-        nu = controls.shape[0]
+    def dxdt(h, states, controls, params, *f_ext):
         nx = states.shape[0]
 
-        # Choose collocation points
-        time_points = [0] + collocation_points(degree, "legendre")
-
-        # Coefficients of the collocation equation
-        C = CX.zeros((degree + 1, degree + 1))
-
-        # Coefficients of the continuity equation
-        D = CX.zeros(degree + 1)
-
-        # Dimensionless time inside one control interval
-        time_control_interval = CX.sym("time_control_interval")
-
-        # For all collocation points
-        for j in range(degree + 1):
-            # Construct Lagrange polynomials to get the polynomial basis at the collocation point
-            L = 1
-            for r in range(degree + 1):
-                if r != j:
-                    L *= (time_control_interval - time_points[r]) / (time_points[j] - time_points[r])
-
-            # Evaluate the polynomial at the final time to get the coefficients of the continuity equation
-            lfcn = Function("lfcn", [time_control_interval], [L])
-            D[j] = lfcn(1.0)
-
-            # Evaluate the time derivative of the polynomial at all collocation points to get
-            # the coefficients of the continuity equation
-            tfcn = Function("tfcn", [time_control_interval], [tangent(L, time_control_interval)])
-            for r in range(degree + 1):
-                C[j, r] = tfcn(time_points[r])
+        # Coefficients of the collocation (C) and continuity (D) equations
+        _, C, D = collocation_coefficients(degree, scheme)
 
         # Total number of variables for one finite element
         x0 = states
@@ -150,19 +319,33 @@ def IRK(ode, ode_opt):
                 xp_j += C[r, j] * x[r]
 
             # Append collocation equations
-            f_j = fun(x[j], get_u(u, t_norm_init), params)[:, idx]
+            f_j = fun(x[j], get_u(u, t_norm_init), params, *f_ext)
             x_irk_points_eq.append(h * f_j - xp_j)
 
         # Concatenate constraints
         x_irk_points = vertcat(*x_irk_points)
         x_irk_points_eq = vertcat(*x_irk_points_eq)
 
-        # Root-finding function, implicitly defines x_irk_points as a function of x0 and p
-        vfcn = Function("vfcn", [x_irk_points, x0, u, params], [x_irk_points_eq]).expand()
+        if CX is SX:
+            # A rootfinder cannot be called with SX, the Newton iterations are therefore written in the graph,
+            # starting from the initial state at every collocation point
+            vfcn = Function("vfcn", [x_irk_points, x0, u, params, *f_ext], [x_irk_points_eq])
+            jac_vfcn = Function(
+                "jac_vfcn", [x_irk_points, x0, u, params, *f_ext], [jacobian(x_irk_points_eq, x_irk_points)]
+            )
+            x_irk_points = repmat(x0, degree, 1)
+            for _ in range(nb_newton_iterations):
+                x_irk_points -= solve(
+                    jac_vfcn(x_irk_points, x0, u, params, *f_ext), vfcn(x_irk_points, x0, u, params, *f_ext)
+                )
+            residual = vfcn(x_irk_points, x0, u, params, *f_ext)
+        else:
+            # Root-finding function, implicitly defines x_irk_points as a function of x0 and p
+            vfcn = Function("vfcn", [x_irk_points, x0, u, params, *f_ext], [x_irk_points_eq]).expand()
 
-        # Create a implicit function instance to solve the system of equations
-        ifcn = rootfinder("ifcn", "newton", vfcn)
-        x_irk_points = ifcn(CX(), x0, u, params)
+            # Create a implicit function instance to solve the system of equations
+            ifcn = rootfinder("ifcn", "newton", vfcn)
+            x_irk_points = ifcn(CX(), x0, u, params, *f_ext)
         x = [x0 if r == 0 else x_irk_points[(r - 1) * nx : r * nx] for r in range(degree + 1)]
 
         # Get an expression for the state at the end of the finite element
@@ -170,8 +353,13 @@ def IRK(ode, ode_opt):
         for r in range(degree + 1):
             xf[:, r] = xf[:, r - 1] + D[r] * x[r]
 
+        if CX is SX:
+            return xf[:, -1], horzcat(x0, xf[:, -1]), residual
         return xf[:, -1], horzcat(x0, xf[:, -1])
 
-    return Function(
-        "integrator", [x_sym, u_sym, param_sym], dxdt(h, x_sym, u_sym, param_sym), ["x0", "p", "params"], ["xf", "xall"]
-    )
+    inputs, input_names = [x_sym, u_sym, param_sym], ["x0", "p", "params"]
+    if f_ext_sym is not None:
+        inputs.append(f_ext_sym)
+        input_names.append("f_ext")
+    out_names = ["xf", "xall", "residual"] if CX is SX else ["xf", "xall"]
+    return Function("integrator", inputs, dxdt(h, *inputs), input_names, out_names)
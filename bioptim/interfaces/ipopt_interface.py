@@ -1,20 +1,56 @@
 import os
 import pickle
+from time import perf_counter
 
-from casadi import vertcat, sum1, nlpsol, SX, MX
+import numpy as np
+from casadi import (
+    vertcat,
+    horzcat,
+    sum1,
+    nlpsol,
+    SX,
+    MX,
+    DM,
+    Function,
+    jacobian,
+    hessian,
+    dot,
+    vec,
+    mtimes,
+    sqrt,
+    triu,
+    diag,
+    gradient,
+    reshape,
+    blockcat,
+    Linsol,
+)
 
 from .solver_interface import SolverInterface
+from .solve_monitor import IterationMonitor, Checkpoint
 from ..gui.plot import OnlineCallback
 from ..limits.path_conditions import Bounds
-from ..misc.enums import InterpolationType
+from ..misc.enums import InterpolationType, OdeSolver, ControlType
 
 
 class IpoptInterface(SolverInterface):
+    # Keep the interior point close to the previous solution instead of pushing it away from the bounds
+    warm_start_options = {
+        "ipopt.warm_start_init_point": "yes",
+        "ipopt.mu_init": 1e-6,
+        "ipopt.warm_start_bound_push": 1e-9,
+        "ipopt.warm_start_bound_frac": 1e-9,
+        "ipopt.warm_start_slack_bound_push": 1e-9,
+        "ipopt.warm_start_slack_bound_frac": 1e-9,
+        "ipopt.warm_start_mult_bound_push": 1e-9,
+    }
+
     def __init__(self, ocp):
         super().__init__(ocp)
 
         self.options_common = {}
         self.opts = None
+        self.warm_start_opts = {}
 
         self.lam_g = None
         self.lam_x = None
@@ -23,6 +59,30 @@ class IpoptInterface(SolverInterface):
         self.ipopt_limits = None
         self.ocp_solver = None
 
+        self.record_iterations = False
+        self.profile_blocks = False
+
+        self.warm_start = False
+        self.warm_start_shift = 0
+        self.previous_sol = None
+        self.g_blocks = []
+
+        self.time_budget = None
+        self.cancel_event = None
+        self.monitor = None
+
+        self.checkpoint_path = None
+        self.checkpoint_every = 10
+        self.resume_options = None
+
+        self.gauss_newton = False
+        self.auto_scaling = False
+
+        self.sensitivity_update = False
+        self.sensitivity_tol = 1e-6
+        self.parametric_nlp = None
+        self.linearization = None
+
         self.bobo_directory = ".__tmp_biorbd_optim"
         self.bobo_file_path = ".__tmp_biorbd_optim/temp_save_iter.bobo"
 
@@ -44,7 +104,73 @@ class IpoptInterface(SolverInterface):
             os.remove(self.bobo_file_path)
             os.rmdir(self.bobo_directory)
 
+    def set_warm_start(self, warm_start, shift=0):
+        """
+        Start the next solves from the primal-dual solution of the previous one
+        :param warm_start: If the previous solution (x, lam_x and lam_g) should be used as initial guess (bool)
+        :param shift: Number of nodes the previous solution is moved backward in time in each phase, the last node
+        being repeated. This is useful for receding horizons (integer)
+        """
+        if shift < 0:
+            raise RuntimeError("warm_start_shift must be positive")
+        self.warm_start = warm_start
+        self.warm_start_shift = shift
+
+    def set_sensitivity_update(self, sensitivity_update, kkt_tol=1e-6):
+        """
+        Predict the solution of the next solves from the derivatives of the last solution with respect to the data of
+        the problem (the targets of the objectives and the external forces). Ipopt is only called, from the predicted
+        solution, when the KKT residual of the prediction is larger than kkt_tol
+        :param sensitivity_update: If the next solves should first try the predicted solution (bool)
+        :param kkt_tol: The largest KKT residual (stationarity, constraint violation and multiplier sign) of an
+        accepted prediction (float)
+        """
+        if kkt_tol < 0:
+            raise RuntimeError("sensitivity_tol must be positive")
+        self.sensitivity_update = sensitivity_update
+        self.sensitivity_tol = kkt_tol
+
+    def set_cancel_event(self, cancel_event):
+        """
+        :param cancel_event: The solver is stopped at the end of its current iteration when this event is set. The
+        solution is then the best iterate found so far and sol["interrupted"] is True (threading.Event)
+        """
+        self.cancel_event = cancel_event
+
     def configure(self, solver_options):
+        """
+        Prepare the options sent to nlpsol. Apart from the bioptim specific options below, the keys are sent to Ipopt
+        :param solver_options: The options (dictionary). The bioptim specific options are:
+        record_iterations: If the per-iteration values of solver.stats() should be kept in sol["solver_stats"] (bool)
+        profile_blocks: If the time spent in the dynamics, continuity, constraints and objectives blocks should be
+        estimated after the solve (bool)
+        time_budget: Wall time in seconds after which the solver is stopped at the end of its current iteration. The
+        solution is then the best iterate found so far and sol["interrupted"] is True (float)
+        checkpoint_path: If not None, the current primal-dual iterate and the Ipopt options are periodically saved to
+        this file, which can be given to ocp.solve(resume_from=checkpoint_path) (string)
+        checkpoint_every: The number of iterations between two checkpoints (integer)
+        hessian_approximation: Apart from the Ipopt values ("exact" and "limited-memory"), "gauss-newton" approximates
+        the Hessian of the Lagrangian from the least-squares objectives (string)
+        auto_scaling: If Ipopt should solve for scaled decision variables and constraints. The scale factors are
+        derived from the bounds and the initial guess of V and from the jacobian of the constraints at the initial
+        guess. The solution is returned unscaled, the factors being in sol["scaling"] (bool)
+        """
+        solver_options = dict(solver_options)
+        self.record_iterations = solver_options.pop("record_iterations", False)
+        self.profile_blocks = solver_options.pop("profile_blocks", False)
+        self.time_budget = solver_options.pop("time_budget", None)
+        self.checkpoint_path = solver_options.pop("checkpoint_path", None)
+        self.checkpoint_every = solver_options.pop("checkpoint_every", 10)
+        if self.checkpoint_every < 1:
+            raise RuntimeError("checkpoint_every must be at least 1")
+        self.auto_scaling = solver_options.pop("auto_scaling", False)
+        self.gauss_newton = False
+        for key in ("hessian_approximation", "ipopt.hessian_approximation"):
+            if solver_options.get(key) == "gauss-newton":
+                # Ipopt uses the Hessian sent through hess_lag as if it was exact
+                del solver_options[key]
+                self.gauss_newton = True
+
         options = {
             "ipopt.tol": 1e-6,
             "ipopt.max_iter": 1000,
@@ -52,18 +178,23 @@ class IpoptInterface(SolverInterface):
             "ipopt.limited_memory_max_history": 50,
             "ipopt.linear_solver": "mumps",  # "ma57", "ma86", "mumps"
         }
+        if self.resume_options is not None:
+            # The options of the interrupted solve, which the options of this call can still override
+            options.update(self.resume_options)
+            self.resume_options = None
         for key in solver_options:
             ipopt_key = key
             if key[:6] != "ipopt.":
                 ipopt_key = "ipopt." + key
             options[ipopt_key] = solver_options[key]
         self.opts = {**options, **self.options_common}
+        # Only used by the solves which really start from a previous solution (see solve), the options above prevail
+        self.warm_start_opts = {
+            key: val for key, val in IpoptInterface.warm_start_options.items() if key not in options
+        }
 
     def solve(self):
-        all_J = self.__dispatch_obj_func()
         all_g, all_g_bounds = self.__dispatch_bounds()
-
-        self.ipopt_nlp = {"x": self.ocp.V, "f": sum1(all_J), "g": all_g}
         self.ipopt_limits = {
             "lbx": self.ocp.V_bounds.min,
             "ubx": self.ocp.V_bounds.max,
@@ -72,18 +203,131 @@ class IpoptInterface(SolverInterface):
             "x0": self.ocp.V_init.init,
         }
 
+        all_f_ext, all_f_ext_values = self.__dispatch_external_forces()
+        if all_f_ext.numel():
+            self.ipopt_limits["p"] = all_f_ext_values
+
         if self.lam_g is not None:
             self.ipopt_limits["lam_g0"] = self.lam_g
         if self.lam_x is not None:
             self.ipopt_limits["lam_x0"] = self.lam_x
+        is_warm_started = False
+        if self.warm_start and self.__is_warm_start_compatible():
+            is_warm_started = True
+            shift = self.warm_start_shift
+            self.ipopt_limits["x0"] = self.__shift_decision_variables(self.previous_sol["x"], shift)
+            self.ipopt_limits["lam_x0"] = self.__shift_decision_variables(self.previous_sol["lam_x"], shift)
+            self.ipopt_limits["lam_g0"] = self.__shift_multipliers(self.previous_sol["lam_g"], shift)
+
+        prediction = None
+        if self.sensitivity_update:
+            # The parametric problem and its KKT functions are only rebuilt when the structure of the problem changes
+            signature = self.__parametric_signature(all_g)
+            if self.parametric_nlp is None or self.parametric_nlp["signature"] != signature:
+                self.parametric_nlp = self.__dispatch_parameters(all_g)
+                self.parametric_nlp["signature"] = signature
+                self.linearization = None
+            self.parametric_nlp["p_values"] = self.__parameter_values()
+            if self.__is_linearization_compatible():
+                prediction = self.__predict_solution()
+                if prediction["kkt_residual"] <= self.sensitivity_tol:
+                    self.out = {"sol": prediction}
+                    self.previous_sol = {key: np.array(prediction[key]) for key in ("x", "lam_x", "lam_g")}
+                    return self.out
 
-        solver = nlpsol("nlpsol", "ipopt", self.ipopt_nlp, self.opts)
+                # Ipopt starts from the prediction, which is still closer to the solution than the previous one
+                is_warm_started = True
+                self.ipopt_limits["x0"] = prediction["x"]
+                self.ipopt_limits["lam_x0"] = prediction["lam_x"]
+                self.ipopt_limits["lam_g0"] = prediction["lam_g"]
+
+        all_J = self.__dispatch_obj_func()
+        self.ipopt_nlp = {"x": self.ocp.V, "f": sum1(all_J), "g": all_g}
+        if all_f_ext.numel():
+            self.ipopt_nlp["p"] = all_f_ext
+
+        nlp, limits = self.ipopt_nlp, self.ipopt_limits
+        scaling = None
+        if self.auto_scaling:
+            scaling = self.__auto_scaling()
+            nlp, limits = self.__scale_problem(*scaling)
+
+        # The monitor keeps the best iterate and stops the solver on a time budget or a cancellation request. It is
+        # only installed when needed, since it is called at each iteration. It also unscales the iterates sent to the
+        # online callback
+        self.monitor = None
+        forward = self.options_common.get("iteration_callback")
+        if (
+            self.time_budget is not None
+            or self.cancel_event is not None
+            or self.checkpoint_path is not None
+            or (scaling is not None and forward is not None)
+        ):
+            self.monitor = IterationMonitor(
+                self.ipopt_limits["lbx"],
+                self.ipopt_limits["ubx"],
+                self.ipopt_limits["lbg"],
+                self.ipopt_limits["ubg"],
+                time_budget=self.time_budget,
+                cancel_event=self.cancel_event,
+                forward=forward,
+                tol=self.opts.get("ipopt.constr_viol_tol", 1e-4),
+                checkpoint_path=self.checkpoint_path,
+                checkpoint_every=self.checkpoint_every,
+                checkpoint_options=self.opts,
+                scaling=scaling,
+            )
+        opts = dict(self.opts)
+        if self.monitor is not None:
+            opts["iteration_callback"] = self.monitor
+        if is_warm_started:
+            opts.update(self.warm_start_opts)
+        if self.gauss_newton:
+            opts["hess_lag"] = self.__gauss_newton_hessian(all_g.numel(), scaling)
+        solver = nlpsol("nlpsol", "ipopt", nlp, opts)
 
         # Solve the problem
-        self.out = {"sol": solver.call(self.ipopt_limits)}
-        self.out["sol"]["time_tot"] = solver.stats()["t_wall_total"]
+        if self.monitor is not None:
+            self.monitor.start()
+        self.out = {"sol": solver.call(limits)}
+        stats = solver.stats()
+        interruption = None if self.monitor is None else self.monitor.interruption
+        if scaling is not None:
+            x_scale, g_scale = scaling
+            self.out["sol"]["x"] = self.out["sol"]["x"] * DM(x_scale)
+            self.out["sol"]["lam_x"] = self.out["sol"]["lam_x"] / DM(x_scale)
+            self.out["sol"]["g"] = self.out["sol"]["g"] * DM(g_scale)
+            self.out["sol"]["lam_g"] = self.out["sol"]["lam_g"] / DM(g_scale)
+            self.out["sol"]["scaling"] = {"x": x_scale, "g": g_scale}
+        self.out["sol"]["interrupted"] = interruption is not None
+        if interruption is not None:
+            self.out["sol"]["interruption"] = interruption
+            for key in ("x", "f", "g", "lam_x", "lam_g"):
+                self.out["sol"][key] = DM(self.monitor.best[key])
+        self.out["sol"]["time_tot"] = stats["t_wall_total"]
         # To match acados convention (0 = success, 1 = error)
-        self.out["sol"]["status"] = int(not solver.stats()["success"])
+        self.out["sol"]["status"] = int(not stats["success"])
+        self.out["sol"]["solver_stats"] = self.__get_stats(stats)
+        if self.profile_blocks:
+            self.out["sol"]["solver_stats"]["blocks"] = self.__profile_blocks(stats, self.out["sol"])
+        self.previous_sol = {key: np.array(self.out["sol"][key]) for key in ("x", "lam_x", "lam_g")}
+        if self.sensitivity_update:
+            self.out["sol"]["predicted"] = False
+            if prediction is not None:
+                self.out["sol"]["kkt_residual"] = prediction["kkt_residual"]
+            # Only a converged solution is a valid point to differentiate the solution at
+            self.linearization = None
+            if stats["success"] and interruption is None:
+                self.linearization = {
+                    **self.previous_sol,
+                    "p": self.parametric_nlp["p_values"],
+                    "lbx": self.__limit("lbx"),
+                    "ubx": self.__limit("ubx"),
+                    "lbg": self.__limit("lbg"),
+                    "ubg": self.__limit("ubg"),
+                    "kkt": None,
+                    "solver_stats": self.out["sol"]["solver_stats"],
+                }
 
         return self.out
 
@@ -91,23 +335,516 @@ class IpoptInterface(SolverInterface):
         self.lam_g = sol["lam_g"]
         self.lam_x = sol["lam_x"]
 
-    def __dispatch_bounds(self):
-        all_g = self.ocp.CX()
-        all_g_bounds = Bounds(interpolation=InterpolationType.CONSTANT)
-        for i in range(len(self.ocp.g)):
-            for j in range(len(self.ocp.g[i])):
-                all_g = vertcat(all_g, self.ocp.g[i][j]["val"])
-                all_g_bounds.concatenate(self.ocp.g[i][j]["bounds"])
+    def load_checkpoint(self, file_path):
+        """
+        Start the next solve from a checkpoint written by a previous solve (see the checkpoint_path option)
+        :param file_path: The path of the checkpoint (string)
+        """
+        iterate, _, options = Checkpoint.load(file_path)
+        n_g = sum([g["val"].numel() for g_entry in self.ocp.g for g in g_entry if g])
+        n_g += sum([g["val"].numel() for nlp in self.ocp.nlp for g_entry in nlp.g for g in g_entry if g])
+        if iterate["x"].shape[0] != self.ocp.V.numel() or iterate["lam_g"].shape[0] != n_g:
+            raise RuntimeError(f"The checkpoint {file_path} was not written by a program of the same size")
+
+        self.previous_sol = iterate
+        self.resume_options = options
+        self.set_warm_start(True)
+
+    def __is_warm_start_compatible(self):
+        """
+        If the previous solution can initialize the current problem (the sizes of V and g did not change)
+        """
+        if self.previous_sol is None:
+            return False
+        n_g = sum([size for block in self.g_blocks for _, size, _ in block])
+        return self.previous_sol["x"].shape[0] == self.ocp.V.numel() and self.previous_sol["lam_g"].shape[0] == n_g
+
+    def __is_linearization_compatible(self):
+        """
+        If the last converged solution can be differentiated to predict the current one (the sizes of V, g and of the
+        parameters did not change)
+        """
+        if self.linearization is None:
+            return False
+        return (
+            self.linearization["x"].shape[0] == self.ocp.V.numel()
+            and self.linearization["lam_g"].shape[0] == self.parametric_nlp["g"].numel()
+            and self.linearization["p"].shape[0] == self.parametric_nlp["p_values"].shape[0]
+        )
+
+    def __all_objectives(self):
+        """
+        :return: The entries of the objectives of the program followed by the ones of each phase (list)
+        """
+        all_objectives = [obj for j_nodes in self.ocp.J for obj in j_nodes]
+        all_objectives += [obj for nlp in self.ocp.nlp for obj_nodes in nlp.J for obj in obj_nodes]
+        return all_objectives
+
+    def __parametric_signature(self, all_g):
+        """
+        Summary of the structure of the parametric problem. The data (the values of the targets and of the external
+        forces) can change without changing it, the expressions of the objectives and constraints are assumed not to
+        change as long as their type, weight, shape and nan samples are the same
+        :param all_g: The constraints (CX)
+        :return: The signature (tuple)
+        """
+        objectives = []
+        for obj in self.__all_objectives():
+            target = None
+            if obj["target"] is not None:
+                target = np.array(obj["target"], dtype=float)
+                target = (target.shape, np.isnan(target).tobytes())
+            objectives.append((obj["objective"].type, obj["objective"].weight, obj["objective"].quadratic, target))
+        f_ext = tuple([None if nlp.F_ext is None else nlp.F_ext.shape for nlp in self.ocp.nlp])
+        return self.ocp.V.numel(), all_g.numel(), f_ext, tuple(objectives)
+
+    def __parameter_values(self):
+        """
+        :return: The current values of the parameters of the parametric problem, the nan targets being zeros (numpy
+        array)
+        """
+        _, all_p_values = self.__dispatch_external_forces()
+        all_p_values = [all_p_values]
+        for obj in self.__all_objectives():
+            if obj["target"] is not None:
+                target = np.nan_to_num(np.array(obj["target"], dtype=float))
+                all_p_values.append(target.reshape((-1, 1), order="F"))
+        return np.vstack(all_p_values)
+
+    def __dispatch_parameters(self, all_g):
+        """
+        Declare the data of the problem as parameters of the NLP. The parameters are the external forces followed by
+        the targets of the objectives, in the order of the objectives. The functions of the KKT system used by the
+        predictions are built once with the problem
+        :param all_g: The constraints (CX)
+        :return: The problem with symbolic parameters (dictionary with x, p, f, g, kkt_derivatives and kkt_values)
+        """
+        all_p, _ = self.__dispatch_external_forces()
+        all_p = [all_p]
+        all_J = self.ocp.CX()
+        for obj in self.__all_objectives():
+            target = None
+            if obj["target"] is not None:
+                target_values = np.array(obj["target"], dtype=float)
+                shape = target_values.shape if target_values.ndim == 2 else (target_values.size, 1)
+                all_p.append(self.ocp.CX.sym("target", target_values.size, 1))
+                target = reshape(all_p[-1], *shape)
+            all_J = vertcat(all_J, IpoptInterface.finalize_objective_value(obj, target))
+
+        V, P, f, g = self.ocp.V, vertcat(*all_p), sum1(all_J), all_g
+        lam_g = self.ocp.CX.sym("lam_g", g.numel(), 1)
+        lam_x = self.ocp.CX.sym("lam_x", V.numel(), 1)
+        lagrangian = f + dot(lam_g, g)
+        grad_lagrangian = gradient(lagrangian, V)
+        return {
+            "x": V,
+            "p": P,
+            "f": f,
+            "g": g,
+            "kkt_derivatives": Function(
+                "kkt_derivatives",
+                [V, P, lam_g],
+                [hessian(lagrangian, V)[0], jacobian(g, V), jacobian(grad_lagrangian, P), jacobian(g, P)],
+            ),
+            "kkt_values": Function("kkt_values", [V, P, lam_g, lam_x], [f, g, grad_lagrangian + lam_x]),
+        }
+
+    def __linearize_solution(self, active_tol=1e-6):
+        """
+        Factorize the KKT system of the last converged solution, restricted to its active constraints. The equality
+        constraints, the bounds with equal limits and the constraints with a non-zero multiplier are active
+        :param active_tol: The smallest absolute value of the multiplier of an active inequality (float)
+        """
+        lin = self.linearization
+        derivatives = self.parametric_nlp["kkt_derivatives"]
+        hess, jac_g, lag_xp, jac_gp = derivatives(lin["x"], lin["p"], lin["lam_g"])
+
+        lin["active_x"] = np.where((lin["lbx"] == lin["ubx"]) | (np.abs(lin["lam_x"]) > active_tol))[0].tolist()
+        lin["active_g"] = np.where((lin["lbg"] == lin["ubg"]) | (np.abs(lin["lam_g"]) > active_tol))[0].tolist()
+        n_x, n_active = lin["x"].shape[0], len(lin["active_x"]) + len(lin["active_g"])
+        jac_active = vertcat(jac_g[lin["active_g"], :], DM.eye(n_x)[lin["active_x"], :])
+        kkt = blockcat([[hess, jac_active.T], [jac_active, DM(n_active, n_active)]])
+
+        linsol = Linsol("sensitivity", "qr", kkt.sparsity())
+        linsol.sfact(kkt)
+        linsol.nfact(kkt)
+        lin["kkt"] = (kkt, linsol)
+        lin["lag_xp"] = lag_xp
+        lin["jac_gp"] = jac_gp[lin["active_g"], :]
+
+    def __predict_solution(self):
+        """
+        First order prediction of the solution for the current values of the parameters. The KKT system of the last
+        converged solution is factorized once, each prediction costing a single back-substitution. The active set
+        is assumed not to change, which the KKT residual of the prediction verifies
+        :return: The predicted solution, with its KKT residual (dictionary)
+        """
+        tic = perf_counter()
+        if self.linearization["kkt"] is None:
+            self.__linearize_solution()
+        lin = self.linearization
+        active_x, active_g = lin["active_x"], lin["active_g"]
+        n_x = lin["x"].shape[0]
+
+        p = self.parametric_nlp["p_values"]
+        dp = DM(p - lin["p"])
+        rhs = -vertcat(mtimes(lin["lag_xp"], dp), mtimes(lin["jac_gp"], dp), DM(len(active_x), 1))
+        kkt, linsol = lin["kkt"]
+        step = np.array(linsol.solve(kkt, rhs))
+
+        x = lin["x"] + step[:n_x]
+        lam_g = lin["lam_g"].copy()
+        lam_g[active_g] += step[n_x : n_x + len(active_g)]
+        lam_x = lin["lam_x"].copy()
+        lam_x[active_x] += step[n_x + len(active_g) :]
+
+        kkt_values = self.parametric_nlp["kkt_values"](x, p, lam_g, lam_x)
+        f_value, g_value, grad_lagrangian = (np.array(val) for val in kkt_values)
+
+        # An inequality multiplier changing sign means the constraint would leave the active set
+        def sign_violation(lam, lam_previous, lb, ub, active):
+            inequality = [i for i in active if lb[i, 0] != ub[i, 0]]
+            return np.max(-np.sign(lam_previous[inequality]) * lam[inequality], initial=0)
+
+        kkt_residual = max(
+            np.max(np.abs(grad_lagrangian), initial=0),
+            np.max(self.__limit("lbx") - x, initial=0),
+            np.max(x - self.__limit("ubx"), initial=0),
+            np.max(self.__limit("lbg") - g_value, initial=0),
+            np.max(g_value - self.__limit("ubg"), initial=0),
+            sign_violation(lam_x, lin["lam_x"], lin["lbx"], lin["ubx"], active_x),
+            sign_violation(lam_g, lin["lam_g"], lin["lbg"], lin["ubg"], active_g),
+        )
+        time_tot = perf_counter() - tic
+        return {
+            "x": DM(x),
+            "f": DM(f_value),
+            "g": DM(g_value),
+            "lam_x": DM(lam_x),
+            "lam_g": DM(lam_g),
+            "interrupted": False,
+            "time_tot": time_tot,
+            "status": 0,
+            "solver_stats": self.__prediction_stats(time_tot),
+            "predicted": True,
+            "kkt_residual": kkt_residual,
+        }
+
+    def __prediction_stats(self, time_tot):
+        """
+        Stats of a predicted solution, with the same keys as the stats of the solve it is predicted from. No
+        iteration is done and no function is called by nlpsol, so the counters are zero
+        :param time_tot: The time spent computing the prediction (float)
+        :return: The stats of the prediction (dictionary)
+        """
+        solver_stats = {}
+        for key, value in self.linearization["solver_stats"].items():
+            if key == "iterations":
+                solver_stats[key] = {it_key: np.array(()) for it_key in value}
+            elif key == "blocks":
+                continue
+            elif key.startswith("t_"):
+                solver_stats[key] = time_tot if key in ("t_wall_total", "t_proc_total") else 0.0
+            elif key.startswith("n_") or key == "iter_count":
+                solver_stats[key] = 0
+            else:
+                solver_stats[key] = value
+        solver_stats["return_status"] = "Sensitivity_Update"
+        solver_stats["success"] = True
+        return solver_stats
+
+    def __limit(self, key):
+        """
+        :param key: The key of the limit (lbx, ubx, lbg or ubg)
+        :return: The current value of the limit as a column (numpy array)
+        """
+        return np.array(self.ipopt_limits[key], dtype=float).reshape((-1, 1))
+
+    def __shift_decision_variables(self, v, shift):
+        """
+        Move the nodes of each phase of a vector with the layout of V backward in time, the last node being repeated
+        :param v: The vector (numpy array)
+        :param shift: The number of nodes (integer)
+        :return: The shifted vector (numpy array)
+        """
+        out = v.copy()
+        if not shift:
+            return out
+
+        # The parameters lead V and are not shifted
+        offset = self.ocp.V.numel() - sum([nlp.nx * len(nlp.X) + nlp.nu * len(nlp.U) for nlp in self.ocp.nlp])
+        for nlp in self.ocp.nlp:
+            x_idx = []
+            u_idx = []
+            for k in range(len(nlp.X)):
+                x_idx.append(offset + np.arange(nlp.nx))
+                offset += nlp.nx
+                if k < len(nlp.U):
+                    u_idx.append(offset + np.arange(nlp.nu))
+                    offset += nlp.nu
+            for idx in (x_idx, u_idx):
+                for k in range(len(idx)):
+                    out[idx[k]] = v[idx[min(k + shift, len(idx) - 1)]]
+        return out
+
+    def __shift_multipliers(self, lam_g, shift):
+        """
+        Move the multipliers of the constraints backward in time. The entries of a penalty are its nodes, and the
+        columns of a continuity constraint are the shooting intervals. The last node is repeated
+        :param lam_g: The multipliers (numpy array)
+        :param shift: The number of nodes (integer)
+        :return: The shifted multipliers (numpy array)
+        """
+        out = lam_g.copy()
+        if not shift:
+            return out
+
+        for block in self.g_blocks:
+            if len(block) > 1 and all([entry[1] == block[0][1] for entry in block]):
+                for k, (idx, size, _) in enumerate(block):
+                    src = block[min(k + shift, len(block) - 1)][0]
+                    out[idx : idx + size] = lam_g[src : src + size]
+            elif len(block) == 1 and block[0][2]:
+                idx, size, n_cols = block[0]
+                cols = lam_g[idx : idx + size].reshape((-1, n_cols), order="F")
+                cols = cols[:, np.minimum(np.arange(n_cols) + shift, n_cols - 1)]
+                out[idx : idx + size] = cols.reshape((-1, 1), order="F")
+        return out
+
+    def __get_stats(self, stats):
+        """
+        Copy the timings and counters of nlpsol
+        :param stats: The output of solver.stats()
+        :return: The stats of the solve (dictionary)
+        """
+        solver_stats = {key: stats[key] for key in stats if key != "iterations"}
+        if self.record_iterations and "iterations" in stats:
+            solver_stats["iterations"] = {key: np.array(stats["iterations"][key]) for key in stats["iterations"]}
+        return solver_stats
+
+    def __profile_blocks(self, stats, sol, nb_evaluations=3):
+        """
+        Estimate the time spent by Ipopt in each block of the problem. Each block is evaluated (value, jacobian and
+        hessian) at the solution and the mean evaluation time is multiplied by the number of calls nlpsol reported.
+        The dynamics block (the integration of all the shooting intervals) is part of the continuity block
+        :param stats: The output of solver.stats()
+        :param sol: The solution of the problem
+        :param nb_evaluations: Number of evaluations used to compute the mean times (integer)
+        :return: The time attributed to each block (dictionary)
+        """
+
+        all_g_continuity = [g["val"] for g_entry in self.ocp.g for g in g_entry if g]
+        all_g_constraints = [g["val"] for nlp in self.ocp.nlp for g_entry in nlp.g for g in g_entry if g]
+        blocks = {
+            "dynamics": (self.__integrated_nodes(), "g"),
+            "continuity": (vertcat(*all_g_continuity), "g"),
+            "constraints": (vertcat(*all_g_constraints), "g"),
+            "objectives": (self.ipopt_nlp["f"], "f"),
+        }
+        nb_hessian_calls = stats.get("n_call_nlp_hess_l", 0)
+
+        def mean_time(func, *args):
+            tic = perf_counter()
+            for _ in range(nb_evaluations):
+                func(*args)
+            return (perf_counter() - tic) / nb_evaluations
+
+        out = {}
+        V = self.ocp.V
+        P = self.ipopt_nlp["p"] if "p" in self.ipopt_nlp else self.ocp.CX()
+        p_num = self.ipopt_limits["p"] if "p" in self.ipopt_limits else np.ndarray((0, 1))
+        for name, (val, kind) in blocks.items():
+            if val.numel() == 0:
+                out[name] = {"t_eval": 0, "t_jacobian": 0, "t_hessian": 0, "estimated_time": 0}
+                continue
+
+            lam = self.ocp.CX.sym("lam", val.numel(), 1)
+            func = Function(name, [V, P], [val])
+            jac = Function(f"jac_{name}", [V, P], [jacobian(val, V)])
+            hess = Function(f"hess_{name}", [V, P, lam], [hessian(dot(lam, val), V)[0]])
+
+            lam_num = np.ones((val.numel(), 1))
+            t_eval = mean_time(func, sol["x"], p_num)
+            t_jacobian = mean_time(jac, sol["x"], p_num)
+            t_hessian = mean_time(hess, sol["x"], p_num, lam_num) if nb_hessian_calls else 0
+
+            if kind == "g":
+                nb_calls = stats.get("n_call_nlp_g", 0), stats.get("n_call_nlp_jac_g", 0)
+            else:
+                nb_calls = stats.get("n_call_nlp_f", 0), stats.get("n_call_nlp_grad_f", 0)
+            out[name] = {
+                "t_eval": t_eval,
+                "t_jacobian": t_jacobian,
+                "t_hessian": t_hessian,
+                "estimated_time": t_eval * nb_calls[0] + t_jacobian * nb_calls[1] + t_hessian * nb_hessian_calls,
+            }
+        return out
+
+    def __integrated_nodes(self):
+        """
+        Integrate every shooting interval from its symbolic initial node
+        :return: The end node of all the intervals (CX)
+        """
+        end_nodes = []
         for nlp in self.ocp.nlp:
-            for i in range(len(nlp.g)):
-                for j in range(len(nlp.g[i])):
-                    all_g = vertcat(all_g, nlp.g[i][j]["val"])
-                    all_g_bounds.concatenate(nlp.g[i][j]["bounds"])
+            for k in range(nlp.ns):
+                if nlp.ode_solver == OdeSolver.CVODES:
+                    end_nodes.append(nlp.dynamics[k](x0=nlp.X[k], p=nlp.U[k])["xf"])
+                else:
+                    if nlp.control_type == ControlType.LINEAR_CONTINUOUS:
+                        u = horzcat(nlp.U[k], nlp.U[k + 1])
+                    else:
+                        u = nlp.U[k]
+                    f_ext = {} if nlp.F_ext is None else {"f_ext": nlp.F_ext[:, k]}
+                    end_nodes.append(nlp.dynamics[k](x0=nlp.X[k], p=u, params=nlp.p, **f_ext)["xf"])
+        return vertcat(*end_nodes)
+
+    def __dispatch_external_forces(self):
+        """
+        Gather the symbolic external forces of all the phases, which are the parameters of the NLP, and their values
+        :return: The symbolic external forces (CX) and their values (numpy array)
+        """
+        all_f_ext = self.ocp.CX()
+        all_f_ext_values = np.ndarray((0, 1))
+        for nlp in self.ocp.nlp:
+            if nlp.F_ext is not None:
+                all_f_ext = vertcat(all_f_ext, vec(nlp.F_ext))
+                all_f_ext_values = np.vstack((all_f_ext_values, nlp.external_forces.reshape((-1, 1), order="F")))
+        return all_f_ext, all_f_ext_values
+
+    def __dispatch_bounds(self):
+        # The columns of the constraints of the program (the continuity) are the shooting intervals
+        ocp_g_blocks = [[g for g in g_entry if g] for g_entry in self.ocp.g]
+        nlp_g_blocks = [[g for g in g_entry if g] for nlp in self.ocp.nlp for g_entry in nlp.g]
+        all_g_entries = [g for block in ocp_g_blocks + nlp_g_blocks for g in block]
 
-        if isinstance(all_g_bounds.min, (SX, MX)) or isinstance(all_g_bounds.max, (SX, MX)):
-            raise RuntimeError("Ipopt doesn't support SX/MX types in constraints bounds")
+        # The bounds are declared for each row of a constraint and are repeated for each of its columns
+        n_g = sum([g["val"].numel() for g in all_g_entries])
+        all_g_min = np.ndarray((n_g, 1))
+        all_g_max = np.ndarray((n_g, 1))
+        idx = 0
+        for g in all_g_entries:
+            if isinstance(g["bounds"].min, (SX, MX)) or isinstance(g["bounds"].max, (SX, MX)):
+                raise RuntimeError("Ipopt doesn't support SX/MX types in constraints bounds")
+            n_rows, n_cols = g["val"].shape
+            all_g_min[idx : idx + n_rows * n_cols, :] = np.tile(g["bounds"].min, (n_cols, 1))
+            all_g_max[idx : idx + n_rows * n_cols, :] = np.tile(g["bounds"].max, (n_cols, 1))
+            idx += n_rows * n_cols
+
+        # Position, size and number of node columns of each entry, grouped by penalty
+        self.g_blocks = []
+        idx = 0
+        for i, block in enumerate(ocp_g_blocks + nlp_g_blocks):
+            self.g_blocks.append([])
+            for g in block:
+                n_cols = g["val"].shape[1] if i < len(ocp_g_blocks) else 0
+                self.g_blocks[-1].append((idx, g["val"].numel(), n_cols))
+                idx += g["val"].numel()
+
+        all_g = vertcat(self.ocp.CX(), *[vec(g["val"]) for g in all_g_entries])
+        all_g_bounds = Bounds(all_g_min, all_g_max, interpolation=InterpolationType.CONSTANT)
         return all_g, all_g_bounds
 
+    def __auto_scaling(self):
+        """
+        Scale factors of the decision variables and of the constraints. A variable is scaled by the largest absolute
+        value of its bounds, or of its initial guess if it is unbounded. A constraint is scaled by the largest
+        absolute value of its jacobian with respect to the scaled variables at the initial guess, only the rows
+        larger than one being scaled down
+        :return: The scale factors of V and g (numpy arrays)
+        """
+        lbx = np.array(self.ipopt_limits["lbx"], dtype=float).reshape((-1, 1))
+        ubx = np.array(self.ipopt_limits["ubx"], dtype=float).reshape((-1, 1))
+        x0 = np.array(self.ipopt_limits["x0"], dtype=float).reshape((-1, 1))
+        is_bounded = np.isfinite(lbx) & np.isfinite(ubx)
+        x_scale = np.ones(lbx.shape)
+        x_scale[is_bounded] = np.maximum(np.abs(lbx[is_bounded]), np.abs(ubx[is_bounded]))
+        x_scale[~is_bounded] = np.maximum(np.abs(x0[~is_bounded]), 1)
+        x_scale[x_scale < 1e-8] = 1
+
+        g = self.ipopt_nlp["g"]
+        g_scale = np.ones((g.numel(), 1))
+        if g.numel():
+            V = self.ocp.V
+            P = self.ipopt_nlp["p"] if "p" in self.ipopt_nlp else self.ocp.CX.sym("p", 0, 1)
+            p_values = self.ipopt_limits["p"] if "p" in self.ipopt_limits else np.ndarray((0, 1))
+            jac = Function("jac_g", [V, P], [jacobian(g, V)])(x0, p_values)
+            rows, cols = jac.sparsity().get_triplet()
+            row_norm = np.zeros(g.numel())
+            np.maximum.at(row_norm, rows, np.abs(np.array(jac.nonzeros()) * x_scale[cols, 0]))
+            g_scale[:, 0] = np.maximum(row_norm, 1)
+        return x_scale, g_scale
+
+    def __scale_problem(self, x_scale, g_scale):
+        """
+        Express the problem and its limits with the scaled variables V / x_scale and the scaled constraints g / g_scale
+        :param x_scale: The scale factors of V (numpy array)
+        :param g_scale: The scale factors of g (numpy array)
+        :return: The scaled problem and limits (dictionaries sent to nlpsol)
+        """
+        V_scaled = self.ocp.CX.sym("V_scaled", self.ocp.V.numel(), 1)
+        P = self.ipopt_nlp["p"] if "p" in self.ipopt_nlp else self.ocp.CX.sym("p", 0, 1)
+        unscaled = Function("nlp_unscaled", [self.ocp.V, P], [self.ipopt_nlp["f"], self.ipopt_nlp["g"]])
+        f, g = unscaled(V_scaled * DM(x_scale), P)
+        nlp = {"x": V_scaled, "f": f, "g": g / DM(g_scale)}
+        if "p" in self.ipopt_nlp:
+            nlp["p"] = P
+
+        limits = dict(self.ipopt_limits)
+        for key in ("lbx", "ubx", "x0"):
+            limits[key] = np.array(limits[key], dtype=float).reshape((-1, 1)) / x_scale
+        for key in ("lbg", "ubg"):
+            limits[key] = np.array(limits[key], dtype=float).reshape((-1, 1)) / g_scale
+        if "lam_x0" in limits:
+            limits["lam_x0"] = np.array(limits["lam_x0"]).reshape((-1, 1)) * x_scale
+        if "lam_g0" in limits:
+            limits["lam_g0"] = np.array(limits["lam_g0"]).reshape((-1, 1)) * g_scale
+        return nlp, limits
+
+    def __gauss_newton_hessian(self, n_g, scaling=None):
+        """
+        Gauss-Newton approximation of the Hessian of the Lagrangian. Each least-squares objective (quadratic with a
+        positive weight) adds 2 * J^T * J, J being the jacobian of its weighted residuals. The other objectives add
+        their exact Hessian and the curvature of the constraints is neglected
+        :param n_g: The number of constraints (integer)
+        :param scaling: The scale factors of V and g if the problem is scaled (tuple of numpy arrays)
+        :return: The hess_lag Function of nlpsol
+        """
+        residuals = self.ocp.CX()
+        others = self.ocp.CX()
+        all_objectives = [obj for j_nodes in self.ocp.J for obj in j_nodes]
+        all_objectives += [obj for nlp in self.ocp.nlp for obj_nodes in nlp.J for obj in obj_nodes]
+        for obj in all_objectives:
+            if obj["objective"].quadratic and obj["objective"].weight >= 0:
+                residual = vec(IpoptInterface.objective_error(obj)) * sqrt(obj["objective"].weight * obj["dt"])
+                residuals = vertcat(residuals, residual)
+            else:
+                others = vertcat(others, IpoptInterface.finalize_objective_value(obj))
+
+        V = self.ocp.V
+        jac = jacobian(residuals, V)
+        hess = 2 * mtimes(jac.T, jac)
+        if others.numel():
+            hess += hessian(sum1(others), V)[0]
+
+        P = self.ipopt_nlp["p"] if "p" in self.ipopt_nlp else self.ocp.CX.sym("p", 0, 1)
+        lam_f = self.ocp.CX.sym("lam_f", 1, 1)
+        lam_g = self.ocp.CX.sym("lam_g", n_g, 1)
+        if scaling is not None:
+            # The Hessian with respect to the scaled variables is D * H * D, D being the diagonal of the scale factors
+            x_scale = DM(scaling[0])
+            V_scaled = self.ocp.CX.sym("V_scaled", V.numel(), 1)
+            hess = Function("hess_unscaled", [V, P], [hess])(V_scaled * x_scale, P)
+            hess = mtimes(diag(x_scale), mtimes(hess, diag(x_scale)))
+            V = V_scaled
+        return Function(
+            "nlp_hess_l",
+            [V, P, lam_f, lam_g],
+            [triu(lam_f * hess)],
+            ["x", "p", "lam_f", "lam_g"],
+            ["triu_hess_gamma_x_x"],
+        )
+
     def __dispatch_obj_func(self):
         all_J = self.ocp.CX()
         for j_nodes in self.ocp.J:
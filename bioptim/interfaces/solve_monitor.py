@@ -0,0 +1,204 @@
+import json
+import os
+from concurrent.futures import Future
+from threading import Event
+from time import perf_counter
+
+import numpy as np
+from casadi import Callback, nlpsol_out, nlpsol_n_out, Sparsity, DM
+
+
+class IterationMonitor(Callback):
+    """
+    Iteration callback of nlpsol which keeps the best iterate and stops the solver when the time budget is exhausted
+    or when a cancellation is requested
+    """
+
+    def __init__(
+        self,
+        lbx,
+        ubx,
+        lbg,
+        ubg,
+        time_budget=None,
+        cancel_event=None,
+        forward=None,
+        tol=1e-4,
+        checkpoint_path=None,
+        checkpoint_every=10,
+        checkpoint_options=None,
+        scaling=None,
+    ):
+        """
+        :param lbx: The lower bounds of the decision variables (numpy array)
+        :param ubx: The upper bounds of the decision variables (numpy array)
+        :param lbg: The lower bounds of the constraints (numpy array)
+        :param ubg: The upper bounds of the constraints (numpy array)
+        :param time_budget: The wall time after which the solver is stopped, in seconds (float)
+        :param cancel_event: The solver is stopped when this event is set (threading.Event)
+        :param forward: Another iteration callback (such as OnlineCallback) which receives every iterate
+        :param tol: The constraint violation under which an iterate is feasible (float)
+        :param checkpoint_path: If not None, the current iterate is saved to this file (see Checkpoint) (string)
+        :param checkpoint_every: The number of iterations between two checkpoints (integer)
+        :param checkpoint_options: The solver options saved with the iterate (dictionary)
+        :param scaling: The scale factors of the variables and of the constraints if the solver works on a scaled
+        problem. The iterates are then unscaled before being used (tuple of numpy arrays)
+        """
+        Callback.__init__(self)
+        self.lbx, self.ubx = np.array(lbx).reshape((-1, 1)), np.array(ubx).reshape((-1, 1))
+        self.lbg, self.ubg = np.array(lbg).reshape((-1, 1)), np.array(ubg).reshape((-1, 1))
+        self.nx = self.lbx.shape[0]
+        self.ng = self.lbg.shape[0]
+        self.time_budget = time_budget
+        self.cancel_event = cancel_event
+        self.forward = forward
+        self.tol = tol
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_options = {} if checkpoint_options is None else checkpoint_options
+        self.scaling = scaling
+        self.iteration = 0
+
+        self.best = None
+        self.best_key = None
+        self.interruption = None
+        self.tic = None
+        self.construct("IterationMonitor", {})
+
+    def start(self):
+        """
+        Start the clock of the time budget, right before the solver is called so its construction is not counted
+        """
+        self.tic = perf_counter()
+
+    @staticmethod
+    def get_n_in():
+        return nlpsol_n_out()
+
+    @staticmethod
+    def get_n_out():
+        return 1
+
+    @staticmethod
+    def get_name_in(i):
+        return nlpsol_out(i)
+
+    @staticmethod
+    def get_name_out(_):
+        return "ret"
+
+    def get_sparsity_in(self, i):
+        n = nlpsol_out(i)
+        if n == "f":
+            return Sparsity.scalar()
+        elif n in ("x", "lam_x"):
+            return Sparsity.dense(self.nx)
+        elif n in ("g", "lam_g"):
+            return Sparsity.dense(self.ng)
+        else:
+            return Sparsity(0, 0)
+
+    def eval(self, arg):
+        if self.tic is None:
+            self.start()
+        iterate = {nlpsol_out(i): np.array(arg[i]) for i in range(nlpsol_n_out())}
+        if self.scaling is not None:
+            x_scale, g_scale = self.scaling
+            iterate["x"] = iterate["x"] * x_scale
+            iterate["lam_x"] = iterate["lam_x"] / x_scale
+            iterate["g"] = iterate["g"] * g_scale
+            iterate["lam_g"] = iterate["lam_g"] / g_scale
+        if self.forward is not None:
+            self.forward.eval([DM(iterate[nlpsol_out(i)]) for i in range(nlpsol_n_out())])
+
+        violation = max(
+            np.max(self.lbx - iterate["x"], initial=0),
+            np.max(iterate["x"] - self.ubx, initial=0),
+            np.max(self.lbg - iterate["g"], initial=0),
+            np.max(iterate["g"] - self.ubg, initial=0),
+        )
+        # A feasible iterate is better than any infeasible one, then the lowest objective (or violation) wins
+        key = (0, iterate["f"].item()) if violation <= self.tol else (1, violation)
+        if self.best_key is None or key < self.best_key:
+            self.best = iterate
+            self.best_key = key
+
+        if self.checkpoint_path is not None and self.iteration % self.checkpoint_every == 0:
+            Checkpoint.save(self.checkpoint_path, iterate, self.iteration, self.checkpoint_options)
+        self.iteration += 1
+
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.interruption = "cancelled"
+            return [1]
+        if self.time_budget is not None and perf_counter() - self.tic > self.time_budget:
+            self.interruption = "time_budget"
+            return [1]
+        return [0]
+
+
+class Checkpoint:
+    """
+    Iterate of a solve saved to disk, so an interrupted solve can be resumed
+    """
+
+    @staticmethod
+    def save(file_path, iterate, iteration, options):
+        """
+        Write the primal-dual iterate and the solver options in a compressed npz file. The file is written next to
+        its destination and then renamed, so an existing checkpoint is never left half written
+        :param file_path: The path of the checkpoint (string)
+        :param iterate: The iterate, with at least x, lam_x and lam_g (dictionary of numpy arrays)
+        :param iteration: The iteration of the iterate (integer)
+        :param options: The solver options, only the numbers, strings and booleans are kept (dictionary)
+        """
+
+        options = {key: options[key] for key in options if isinstance(options[key], (bool, int, float, str))}
+        directory = os.path.dirname(file_path)
+        if directory != "" and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez_compressed(
+                file,
+                x=iterate["x"],
+                lam_x=iterate["lam_x"],
+                lam_g=iterate["lam_g"],
+                iteration=iteration,
+                options=json.dumps(options),
+            )
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, file_path)
+
+    @staticmethod
+    def load(file_path):
+        """
+        :param file_path: The path of the checkpoint (string)
+        :return: The iterate (dictionary with x, lam_x and lam_g), the iteration (integer) and the solver options
+        (dictionary)
+        """
+
+        if not os.path.isfile(file_path):
+            raise RuntimeError(f"The checkpoint {file_path} does not exist")
+        with np.load(file_path) as data:
+            iterate = {key: data[key] for key in ("x", "lam_x", "lam_g")}
+            return iterate, int(data["iteration"]), json.loads(str(data["options"]))
+
+
+class SolveFuture(Future):
+    """
+    Future returned by OptimalControlProgram.solve_async. It can be awaited with asyncio.wrap_future. Cancelling a
+    running solve stops the solver at its next iteration, the result being the best iterate found so far
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cancel_event = Event()
+
+    def cancel(self):
+        if super().cancel():
+            return True
+        if not self.done():
+            self.cancel_event.set()
+        return False
@@ -1,5 +1,5 @@
 import numpy as np
-from casadi import Function, sum1, sum2
+from casadi import Function, sum1, sum2, vertcat
 
 from ..misc.enums import Node
 
@@ -19,6 +19,13 @@ class SolverInterface:
     def get_iterations(self):
         raise RuntimeError("SolverInterface is an abstract class")
 
+    def invalidate(self, modification):
+        """
+        Called by the program when it is modified, so a solver keeping values of the program between its solves can
+        update them
+        :param modification: "objective_functions", "constraints", "parameters", "bounds" or "initial_guess" (string)
+        """
+
     def get_optimized_value(self):
         out = []
         for key in self.out.keys():
@@ -35,61 +42,114 @@ class SolverInterface:
         raise RuntimeError("Get Iteration not implemented for solver")
 
     def get_objectives(self):
-        def get_objective_values(ocp, sol):
-            def __get_nodes(all_nodes, nlp):
-                nodes = []
-                for node in all_nodes:
-                    if isinstance(node, int):
-                        if node < 0 or node > nlp.ns:
-                            raise RuntimeError(f"Invalid node, {node} must be between 0 and {nlp.ns}")
-                        nodes.append(node)
-
-                    elif node == Node.START:
-                        nodes.append(0)
-
-                    elif node == Node.MID:
-                        if nlp.ns % 2 == 1:
-                            raise (ValueError("Number of shooting points must be even to use MID"))
-                        nodes.append(nlp.ns // 2)
-
-                    elif node == Node.INTERMEDIATES:
-                        for i in range(1, nlp.ns - 1):
-                            nodes.append(i)
-
-                    elif node == Node.END:
-                        nodes.append(nlp.ns - 1)
-
-                    elif node == Node.ALL:
-                        for i in range(nlp.ns):
-                            nodes.append(i)
-                return nodes
-
-            sol = sol["x"]
-            out = []
-            for nlp in ocp.nlp:
-                nJ = len(nlp.J)
-                out.append(np.ndarray((nJ, nlp.ns)))
-                out[-1][:, :] = np.nan
-                for idx_obj_func in range(nJ):
-                    nodes = __get_nodes(nlp.J[idx_obj_func][0]["objective"].node, nlp)
-                    nodes = nodes[: len(nlp.J[idx_obj_func])]
-                    for node, idx_node in enumerate(nodes):
-                        obj = Function("obj", [ocp.V], [self.finalize_objective_value(nlp.J[idx_obj_func][node])])
-                        out[-1][idx_obj_func, idx_node] = obj(sol)
-            return out
-
-        self.out["sol_obj"] = get_objective_values(self.ocp, self.out["sol"])
+        self.out["sol_obj"] = SolverInterface.objective_values(self.ocp, self.out["sol"]["x"])
+
+    @staticmethod
+    def objective_values(ocp, V):
+        """
+        Value of every objective at every node. All the values are computed by a single function which is built once
+        and cached on the ocp (ocp.objective_values_func)
+        :param ocp: The OptimalControlProgram
+        :param V: The optimized vector (ocp.V)
+        :return: A list with, for each phase, an array (nb_objectives x ns + 1) of the objective values, nan where an
+        objective is not evaluated. If the program declares objectives outside the phases (parameters or state
+        transitions), an additional array (nb_objectives x nb_entries) is appended to the list
+        """
+
+        if ocp.objective_values_func is None:
+            ocp.objective_values_func = SolverInterface._build_objective_values_func(ocp)
+        func, layout, shapes = ocp.objective_values_func
+
+        values = np.array(func(V)).reshape(-1)
+        out = []
+        for shape in shapes:
+            out.append(np.ndarray(shape))
+            out[-1][:, :] = np.nan
+        for value, (idx_out, row, col) in zip(values, layout):
+            out[idx_out][row, col] = value
+        return out
 
     @staticmethod
-    def finalize_objective_value(j_dict):
+    def _build_objective_values_func(ocp):
+        """
+        Gather all the objective values in a single casadi Function
+        :param ocp: The OptimalControlProgram
+        :return: The Function of ocp.V, the position (output index, row, column) of each of its values and the shape of
+        each output array
+        """
+
+        def __get_nodes(all_nodes, nlp):
+            nodes = []
+            for node in all_nodes:
+                if isinstance(node, int):
+                    if node < 0 or node > nlp.ns:
+                        raise RuntimeError(f"Invalid node, {node} must be between 0 and {nlp.ns}")
+                    nodes.append(node)
+
+                elif node == Node.START:
+                    nodes.append(0)
+
+                elif node == Node.MID:
+                    if nlp.ns % 2 == 1:
+                        raise (ValueError("Number of shooting points must be even to use MID"))
+                    nodes.append(nlp.ns // 2)
+
+                elif node == Node.INTERMEDIATES:
+                    for i in range(1, nlp.ns - 1):
+                        nodes.append(i)
+
+                elif node == Node.END:
+                    nodes.append(nlp.ns)
+
+                elif node == Node.ALL:
+                    for i in range(nlp.ns + 1):
+                        nodes.append(i)
+            return nodes
+
+        all_values = []
+        layout = []
+        shapes = []
+        for idx_phase, nlp in enumerate(ocp.nlp):
+            # The objectives on the states can be declared up to the last node (ns)
+            shapes.append((len(nlp.J), nlp.ns + 1))
+            for idx_obj_func, j_nodes in enumerate(nlp.J):
+                if not j_nodes:
+                    continue
+                nodes = __get_nodes(j_nodes[0]["objective"].node, nlp)
+                for j, node in zip(j_nodes, nodes):
+                    all_values.append(SolverInterface.finalize_objective_value(j))
+                    layout.append((idx_phase, idx_obj_func, node))
+
+        if any(ocp.J):
+            shapes.append((len(ocp.J), max([len(j_nodes) for j_nodes in ocp.J])))
+            for idx_obj_func, j_nodes in enumerate(ocp.J):
+                for idx_entry, j in enumerate(j_nodes):
+                    all_values.append(SolverInterface.finalize_objective_value(j))
+                    layout.append((len(ocp.nlp), idx_obj_func, idx_entry))
+
+        func = Function("objective_values", [ocp.V], [vertcat(ocp.CX(), *all_values)], ["V"], ["values"])
+        return func, layout, shapes
+
+    @staticmethod
+    def objective_error(j_dict, target=None):
+        """
+        :param j_dict: The objective entry
+        :param target: If not None, the target used instead of the one of the entry, such as a symbolic variable of
+        the same shape (CX)
+        :return: The value of the objective minus its target, the elements with a nan target being ignored
+        """
         val = j_dict["val"]
         if j_dict["target"] is not None:
+            # The target of the entry is left untouched, so the nan are still ignored the next time it is finalized
             nan_idx = np.isnan(j_dict["target"])
-            j_dict["target"][nan_idx] = 0
-            val -= j_dict["target"]
+            val -= np.nan_to_num(j_dict["target"]) if target is None else target
             if np.any(nan_idx):
                 val[np.where(nan_idx)] = 0
+        return val
 
+    @staticmethod
+    def finalize_objective_value(j_dict, target=None):
+        val = SolverInterface.objective_error(j_dict, target)
         if j_dict["objective"].quadratic:
-            val = val ** 2
+            val = val**2
         return sum1(sum2(j_dict["objective"].weight * val * j_dict["dt"]))
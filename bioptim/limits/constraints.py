@@ -2,10 +2,11 @@ from math import inf
 from enum import Enum
 
 import numpy as np
-from casadi import sum1, horzcat, if_else, vertcat, lt
+from casadi import sum1, horzcat, if_else, vertcat, lt, repmat, MX, SX
 import biorbd
 
 from .path_conditions import Bounds
+from ..interfaces.integrator import butcher_tableaus
 from .penalty import PenaltyType, PenaltyFunctionAbstract, PenaltyOption
 from ..misc.enums import Node, InterpolationType, OdeSolver, ControlType
 from ..misc.options_lists import OptionList, OptionGeneric
@@ -135,6 +136,15 @@ class ConstraintFunction(PenaltyFunctionAbstract):
 
                 ConstraintFunction.add_to_penalty(ocp, nlp, vertcat(*[u[i] + min_bound, u[i] - max_bound]), constraint)
 
+        @staticmethod
+        def implicit_dynamics(constraint, ocp, nlp, t, x, u, p):
+            """
+            Enforces the inverse dynamics of the implicit formulations (DynamicsFcn.*_IMPLICIT) at each node with
+            a control. This constraint is automatically added by the OptimalControlProgram
+            """
+            for i in range(len(u)):
+                ConstraintFunction.add_to_penalty(ocp, nlp, nlp.implicit_dynamics_func(x[i], u[i], p), constraint)
+
         @staticmethod
         def time_constraint(constraint_type, ocp, nlp, t, x, u, p, **unused_params):
             pass
@@ -158,23 +168,31 @@ class ConstraintFunction(PenaltyFunctionAbstract):
             penalty.list_index = -1
             ConstraintFunction.clear_penalty(ocp, None, penalty)
             # Loop over shooting nodes or use parallelization
-            if ocp.nb_threads > 1:
-                end_nodes = nlp.par_dynamics(horzcat(*nlp.X[:-1]), horzcat(*nlp.U), nlp.p)[0]
+            if nlp.par_dynamics is not None:
+                inputs = [horzcat(*nlp.X[:-1]), horzcat(*nlp.U), nlp.p]
+                if nlp.F_ext is not None:
+                    inputs.append(nlp.F_ext)
+                end_nodes = nlp.par_dynamics(*inputs)[0]
                 vals = horzcat(*nlp.X[1:]) - end_nodes
                 ConstraintFunction.add_to_penalty(ocp, None, vals.reshape((nlp.nx * nlp.ns, 1)), penalty)
             else:
                 for k in range(nlp.ns):
                     # Create an evaluation node
-                    if nlp.ode_solver == OdeSolver.RK or nlp.ode_solver == OdeSolver.IRK:
+                    if nlp.ode_solver in butcher_tableaus or nlp.ode_solver == OdeSolver.IRK:
                         if nlp.control_type == ControlType.CONSTANT:
                             u = nlp.U[k]
                         elif nlp.control_type == ControlType.LINEAR_CONTINUOUS:
                             u = horzcat(nlp.U[k], nlp.U[k + 1])
                         else:
                             raise NotImplementedError(f"Dynamics with {nlp.control_type} is not implemented yet")
-                        end_node = nlp.dynamics[k](x0=nlp.X[k], p=u, params=nlp.p)["xf"]
-                    else:
+                        f_ext = {} if nlp.F_ext is None else {"f_ext": nlp.F_ext[:, k]}
+                        end_node = nlp.dynamics[k](x0=nlp.X[k], p=u, params=nlp.p, **f_ext)["xf"]
+                    elif nlp.ode_solver == OdeSolver.CVODES:
                         end_node = nlp.dynamics[k](x0=nlp.X[k], p=nlp.U[k])["xf"]
+                    else:
+                        raise NotImplementedError(
+                            f"Continuity constraints cannot be declared with {nlp.ode_solver}, which has no integrator"
+                        )
 
                     # Save continuity constraints
                     val = end_node - nlp.X[k + 1]
@@ -198,21 +216,13 @@ class ConstraintFunction(PenaltyFunctionAbstract):
         :param g: Parameter to be constrained. (?)
         :param penalty: Index of the parameter g in the penalty array nlp.g. (integer)
         """
-        g_bounds = Bounds(interpolation=InterpolationType.CONSTANT)
         penalty.min_bound = 0 if penalty.min_bound is None else penalty.min_bound
         penalty.max_bound = 0 if penalty.max_bound is None else penalty.max_bound
-        for i in range(val.rows()):
-            min_bound = (
-                penalty.min_bound[i]
-                if hasattr(penalty.min_bound, "__getitem__") and penalty.min_bound.shape[0] > 1
-                else penalty.min_bound
-            )
-            max_bound = (
-                penalty.max_bound[i]
-                if hasattr(penalty.max_bound, "__getitem__") and penalty.max_bound.shape[0] > 1
-                else penalty.max_bound
-            )
-            g_bounds.concatenate(Bounds(min_bound, max_bound, interpolation=InterpolationType.CONSTANT))
+        g_bounds = Bounds(
+            ConstraintFunction._bound_of_each_row(penalty.min_bound, val.rows()),
+            ConstraintFunction._bound_of_each_row(penalty.max_bound, val.rows()),
+            interpolation=InterpolationType.CONSTANT,
+        )
 
         g = {"constraint": penalty, "val": val, "bounds": g_bounds}
         if nlp:
@@ -220,6 +230,24 @@ class ConstraintFunction(PenaltyFunctionAbstract):
         else:
             ocp.g[penalty.list_index].append(g)
 
+    @staticmethod
+    def _bound_of_each_row(bound, n_rows):
+        """
+        Expands a bound so there is one value per row of the constraint
+        :param bound: A single bound shared by all the rows or a bound per row
+        :param n_rows: Number of rows of the constraint (integer)
+        :return: The bounds as a column (n_rows x 1)
+        """
+        if isinstance(bound, (MX, SX)):
+            return bound[:n_rows] if bound.shape[0] > 1 else repmat(bound, n_rows, 1)
+
+        bound = np.array(bound, dtype=float)
+        if len(bound.shape) and bound.shape[0] > 1:
+            if bound.shape[0] < n_rows:
+                raise RuntimeError(f"The bounds of the constraint should have {n_rows} rows, got {bound.shape[0]}")
+            return bound[:n_rows].reshape((n_rows, 1))
+        return np.repeat(bound.reshape(-1)[:1], n_rows)[:, np.newaxis]
+
     @staticmethod
     def clear_penalty(ocp, nlp, penalty):
         """
@@ -260,6 +288,7 @@ class ConstraintFunction(PenaltyFunctionAbstract):
         if (
             constraint_function == ConstraintFcn.CONTACT_FORCE.value[0]
             or constraint_function == ConstraintFcn.NON_SLIPPING.value[0]
+            or constraint_function == ConstraintFcn.IMPLICIT_DYNAMICS.value[0]
         ):
             if node == Node.END or node == nlp.ns:
                 raise RuntimeError("No control u at last node")
@@ -287,6 +316,7 @@ class ConstraintFcn(Enum):
     NON_SLIPPING = (ConstraintFunction.Functions.non_slipping,)
     TORQUE_MAX_FROM_ACTUATORS = (ConstraintFunction.Functions.torque_max_from_actuators,)
     TIME_CONSTRAINT = (ConstraintFunction.Functions.time_constraint,)
+    IMPLICIT_DYNAMICS = (ConstraintFunction.Functions.implicit_dynamics,)
 
     @staticmethod
     def get_type():
@@ -6,6 +6,7 @@ import casadi
 from .penalty import PenaltyType, PenaltyFunctionAbstract, PenaltyOption
 from ..misc.enums import Node
 from ..misc.options_lists import OptionList, OptionGeneric
+from ..interfaces.solver_interface import SolverInterface
 
 
 class Objective(PenaltyOption):
@@ -284,11 +285,25 @@ class ObjectiveFunction:
 
 class ObjectivePrinter:
     def __init__(self, ocp, sol_obj):
+        """
+        :param ocp: The OptimalControlProgram
+        :param sol_obj: The objective values returned by solve(return_objectives=True) or the solution itself, in which
+        case the values are computed by the function cached on the ocp
+        """
         self.ocp = ocp
+        if isinstance(sol_obj, dict):
+            sol_obj = SolverInterface.objective_values(ocp, sol_obj["x"])
         self.sol_obj = sol_obj
 
     def by_function(self):
         for idx_phase, phase in enumerate(self.sol_obj):
+            if idx_phase == self.ocp.nb_phases:
+                print("********** Program **********")
+                for idx_obj in range(phase.shape[0]):
+                    if self.ocp.J[idx_obj]:
+                        print(f"{self.ocp.J[idx_obj][0]['objective'].type.name} : {np.nansum(phase[idx_obj])}")
+                continue
+
             print(f"********** Phase {idx_phase} **********")
             for idx_obj in range(phase.shape[0]):
                 print(
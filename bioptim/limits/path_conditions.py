@@ -1,5 +1,5 @@
 import numpy as np
-from casadi import MX, SX, vertcat
+from casadi import MX, SX, vertcat, horzcat, vec, jacobian, Function
 from scipy.interpolate import interp1d
 
 from ..misc.enums import InterpolationType
@@ -261,19 +261,22 @@ class Bounds(OptionGeneric):
         self.t = self.min.t
         self.nb_shooting = self.min.nb_shooting
 
-    def concatenate(self, other):
+    def concatenate(self, *others):
         """
-        Concatenates minimal and maximal bounds.
-        :param other: Bounds to concatenate. (Instance of Bounds class)
+        Concatenates minimal and maximal bounds. All the bounds are gathered in a single allocation, so concatenating
+        many blocks should be done in one call.
+        :param others: Bounds to concatenate. (Instances of Bounds class)
         """
-        if not isinstance(self.min, (MX, SX)) and not isinstance(other.min, (MX, SX)):
-            self.min = PathCondition(np.concatenate((self.min, other.min)), interpolation=self.min.type)
+        all_min = [self.min] + [other.min for other in others]
+        all_max = [self.max] + [other.max for other in others]
+        if not any([isinstance(m, (MX, SX)) for m in all_min]):
+            self.min = PathCondition(np.concatenate(all_min), interpolation=self.min.type)
         else:
-            self.min = PathCondition(vertcat(self.min, other.min), interpolation=self.min.type)
-        if not isinstance(self.max, (MX, SX)) and not isinstance(other.max, (MX, SX)):
-            self.max = PathCondition(np.concatenate((self.max, other.max)), interpolation=self.max.type)
+            self.min = PathCondition(vertcat(*all_min), interpolation=self.min.type)
+        if not any([isinstance(m, (MX, SX)) for m in all_max]):
+            self.max = PathCondition(np.concatenate(all_max), interpolation=self.max.type)
         else:
-            self.max = PathCondition(vertcat(self.max, other.max), interpolation=self.max.type)
+            self.max = PathCondition(vertcat(*all_max), interpolation=self.max.type)
 
         self.type = self.min.type
         self.t = self.min.t
@@ -403,13 +406,14 @@ class InitialGuess(OptionGeneric):
         """
         self.init.check_and_adjust_dimensions(nb_elements, nb_shooting, "InitialGuess")
 
-    def concatenate(self, other):
+    def concatenate(self, *others):
         """
-        Concatenates initial guesses.
-        :param other: Initial guesses to concatenate. (?)
+        Concatenates initial guesses. All the initial guesses are gathered in a single allocation, so concatenating
+        many blocks should be done in one call.
+        :param others: Initial guesses to concatenate. (Instances of InitialGuess class)
         """
         self.init = PathCondition(
-            np.concatenate((self.init, other.init)),
+            np.concatenate([self.init] + [other.init for other in others]),
             interpolation=self.init.type,
         )
 
@@ -419,3 +423,127 @@ class InitialGuess(OptionGeneric):
     @property
     def shape(self):
         return self.init.shape
+
+    @staticmethod
+    def from_markers(
+        biorbd_model,
+        markers,
+        final_time,
+        markers_idx=None,
+        q_init=None,
+        q_mapping=None,
+        nb_threads=1,
+        max_iter=100,
+        tol=1e-8,
+    ):
+        """
+        Initial guess of the states [q, q_dot] of a marker tracking program. The generalized coordinates of each frame
+        are fitted to the markers by a least-squares inverse kinematics, all the frames being solved together. A frame
+        whose fit is much worse than the one of its previous frame is solved again starting from the previous frame.
+        The velocities are the finite differences of the generalized coordinates
+        :param biorbd_model: The model. (biorbd.Model('path_to_model'))
+        :param markers: The positions of the markers at each node (3 x nb_markers x nb_shooting + 1). The nan
+        coordinates (occluded markers) are ignored. (numpy array)
+        :param final_time: The duration of the phase. (float)
+        :param markers_idx: The index in the model of each marker, all the markers of the model by default. (list)
+        :param q_init: The generalized coordinates the frames are started from, zeros by default. (list)
+        :param q_mapping: The mapping of the generalized coordinates and velocities of the states.
+        (Instance of BidirectionalMapping class)
+        :param nb_threads: The number of threads the frames are evaluated on. (integer)
+        :param max_iter: The maximum number of iterations of the inverse kinematics. (integer)
+        :param tol: The largest step of the generalized coordinates at convergence. (float)
+        :return: The initial guess of the states. (InitialGuess with InterpolationType.EACH_FRAME)
+        """
+        markers = np.asarray(markers, dtype=float)
+        if markers.ndim != 3 or markers.shape[0] != 3:
+            raise RuntimeError("markers must be a 3 x nb_markers x nb_frames array")
+        markers_idx = list(range(biorbd_model.nbMarkers())) if markers_idx is None else list(markers_idx)
+        if markers.shape[1] != len(markers_idx):
+            raise RuntimeError(f"markers must have {len(markers_idx)} markers, it has {markers.shape[1]}")
+        nb_frames = markers.shape[2]
+        if nb_frames < 2:
+            raise RuntimeError("markers must have at least 2 frames to compute the velocities")
+
+        nq = biorbd_model.nbQ()
+        q = MX.sym("q", nq, 1)
+        targets = MX.sym("targets", 3 * len(markers_idx), 1)
+        weights = MX.sym("weights", 3 * len(markers_idx), 1)
+        model_markers = horzcat(MX(3, 0), *[m.to_mx() for m in biorbd_model.markers(q)])[:, markers_idx]
+        residuals = weights * (vec(model_markers) - targets)
+        frame = Function("inverse_kinematics", [q, targets, weights], [residuals, jacobian(residuals, q)]).expand()
+
+        # A column per frame, the rows being the coordinates of the markers, as in vec(markers)
+        all_targets = markers.reshape((-1, nb_frames), order="F")
+        all_weights = np.isfinite(all_targets).astype(float)
+        all_targets = np.nan_to_num(all_targets)
+
+        q_init = np.zeros((nq, 1)) if q_init is None else np.asarray(q_init, dtype=float).reshape((nq, 1))
+        all_q, cost = InitialGuess.__levenberg_marquardt(
+            frame.map(nb_frames, "thread", nb_threads),
+            np.tile(q_init, (1, nb_frames)),
+            all_targets,
+            all_weights,
+            max_iter,
+            tol,
+        )
+
+        # Warm start from their previous frame the frames which fell in another minimum and the frames with occluded
+        # markers, whose unobserved coordinates would otherwise stay at q_init
+        for k in range(1, nb_frames):
+            if cost[k] > 10 * cost[k - 1] + tol or not np.all(all_weights[:, k]):
+                q_k, cost_k = InitialGuess.__levenberg_marquardt(
+                    frame,
+                    all_q[:, k - 1 : k].copy(),
+                    all_targets[:, k : k + 1],
+                    all_weights[:, k : k + 1],
+                    max_iter,
+                    tol,
+                )
+                if cost_k[0] <= cost[k] + tol:
+                    all_q[:, k] = q_k[:, 0]
+                    cost[k] = cost_k[0]
+
+        all_q_dot = np.gradient(all_q, final_time / (nb_frames - 1), axis=1)
+        if q_mapping is not None:
+            all_q = q_mapping.reduce.map(all_q)
+            all_q_dot = q_mapping.reduce.map(all_q_dot)
+        return InitialGuess(np.vstack((all_q, all_q_dot)), interpolation=InterpolationType.EACH_FRAME)
+
+    @staticmethod
+    def __levenberg_marquardt(func, q, targets, weights, max_iter, tol):
+        """
+        Minimize the squared residuals of each frame, the damping being adapted frame by frame
+        :param func: The residuals and their jacobian with respect to q of the frames. (casadi Function)
+        :param q: The generalized coordinates the frames are started from (nq x nb_frames). (numpy array)
+        :param targets: The positions of the markers of each frame. (numpy array)
+        :param weights: The weight of each coordinate of the markers of each frame. (numpy array)
+        :param max_iter: The maximum number of iterations. (integer)
+        :param tol: The largest step at convergence. (float)
+        :return: The generalized coordinates and the squared norm of the residuals of each frame. (numpy arrays)
+        """
+        nq, nb_frames = q.shape
+
+        def evaluate(q):
+            residuals, jac = func(q, targets, weights)
+            residuals = np.array(residuals)
+            # The jacobians of the frames are concatenated horizontally
+            jac = np.array(jac).reshape((residuals.shape[0], nb_frames, nq)).transpose((1, 0, 2))
+            return residuals, jac, np.sum(residuals**2, axis=0)
+
+        residuals, jac, cost = evaluate(q)
+        damping = np.full(nb_frames, 1e-3)
+        for _ in range(max_iter):
+            jac_t = jac.transpose((0, 2, 1))
+            hess = jac_t @ jac + damping[:, np.newaxis, np.newaxis] * np.eye(nq)
+            step = -np.linalg.solve(hess, jac_t @ residuals.T[:, :, np.newaxis])[:, :, 0].T
+
+            new_residuals, new_jac, new_cost = evaluate(q + step)
+            better = new_cost < cost
+            q[:, better] += step[:, better]
+            residuals[:, better] = new_residuals[:, better]
+            jac[better] = new_jac[better]
+            cost[better] = new_cost[better]
+            damping = np.clip(np.where(better, damping / 10, damping * 10), 1e-12, 1e12)
+            if np.max(np.abs(step)) < tol:
+                break
+        return q, cost
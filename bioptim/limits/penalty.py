@@ -4,7 +4,7 @@ import inspect
 
 import numpy as np
 import biorbd
-from casadi import vertcat, horzcat
+from casadi import vertcat, horzcat, Function, MX
 
 from ..misc.enums import Node, Axe, PlotType, ControlType
 from ..misc.mapping import Mapping
@@ -96,11 +96,8 @@ class PenaltyFunctionAbstract:
                 target = PenaltyFunctionAbstract._check_and_fill_tracking_data_size(
                     penalty.target, (3, len(markers_idx), len(x))
                 )
-            PenaltyFunctionAbstract._add_to_casadi_func(nlp, "biorbd_markers", nlp.model.markers, nlp.q)
-            nq = nlp.mapping["q"].reduce.len
             for i, v in enumerate(x):
-                q = nlp.mapping["q"].expand.map(v[:nq])
-                val = nlp.casadi_func["biorbd_markers"](q)[axis_to_track, markers_idx]
+                val = PenaltyFunctionAbstract._get_kinematics(nlp, v, t[i])["markers"][axis_to_track, markers_idx]
                 penalty.sliced_target = target[axis_to_track, :, i] if target is not None else None
                 penalty.type.get_type().add_to_penalty(ocp, nlp, val, penalty)
 
@@ -112,36 +109,32 @@ class PenaltyFunctionAbstract:
             :coordinates_system_idx: Index of the segment in which to project to displacement
             """
 
-            nq = nlp.mapping["q"].reduce.len
             nb_rts = nlp.model.nbSegment()
 
             markers_idx = PenaltyFunctionAbstract._check_and_fill_index(
                 penalty.index, nlp.model.nbMarkers(), "markers_idx"
             )
 
-            PenaltyFunctionAbstract._add_to_casadi_func(nlp, "biorbd_markers", nlp.model.markers, nlp.q)
             if coordinates_system_idx >= 0:
                 if coordinates_system_idx >= nb_rts:
                     raise RuntimeError(
                         f"coordinates_system_idx ({coordinates_system_idx}) cannot be higher than {nb_rts - 1}"
                     )
-                PenaltyFunctionAbstract._add_to_casadi_func(
-                    nlp, f"globalJCS_{coordinates_system_idx}", nlp.model.globalJCS, nlp.q, coordinates_system_idx
-                )
 
             for i in range(len(x) - 1):
-                q_0 = nlp.mapping["q"].expand.map(x[i][:nq])
-                q_1 = nlp.mapping["q"].expand.map(x[i + 1][:nq])
+                kinematics_0 = PenaltyFunctionAbstract._get_kinematics(nlp, x[i], t[i])
+                kinematics_1 = PenaltyFunctionAbstract._get_kinematics(nlp, x[i + 1], t[i + 1])
 
                 if coordinates_system_idx < 0:
                     jcs_0_T = nlp.CX.eye(4)
                     jcs_1_T = nlp.CX.eye(4)
 
                 elif coordinates_system_idx < nb_rts:
-                    jcs_0 = nlp.casadi_func[f"globalJCS_{coordinates_system_idx}"](q_0)
+                    jcs_idx = slice(4 * coordinates_system_idx, 4 * (coordinates_system_idx + 1))
+                    jcs_0 = kinematics_0["jcs"][:, jcs_idx]
                     jcs_0_T = vertcat(horzcat(jcs_0[:3, :3], -jcs_0[:3, :3] @ jcs_0[:3, 3]), horzcat(0, 0, 0, 1))
 
-                    jcs_1 = nlp.casadi_func[f"globalJCS_{coordinates_system_idx}"](q_1)
+                    jcs_1 = kinematics_1["jcs"][:, jcs_idx]
                     jcs_1_T = vertcat(horzcat(jcs_1[:3, :3], -jcs_1[:3, :3] @ jcs_1[:3, 3]), horzcat(0, 0, 0, 1))
 
                 else:
@@ -151,10 +144,8 @@ class PenaltyFunctionAbstract:
                     )
 
                 val = jcs_1_T @ vertcat(
-                    nlp.casadi_func["biorbd_markers"](q_1)[:, markers_idx], nlp.CX.ones(1, markers_idx.shape[0])
-                ) - jcs_0_T @ vertcat(
-                    nlp.casadi_func["biorbd_markers"](q_0)[:, markers_idx], nlp.CX.ones(1, markers_idx.shape[0])
-                )
+                    kinematics_1["markers"][:, markers_idx], nlp.CX.ones(1, markers_idx.shape[0])
+                ) - jcs_0_T @ vertcat(kinematics_0["markers"][:, markers_idx], nlp.CX.ones(1, markers_idx.shape[0]))
                 penalty.type.get_type().add_to_penalty(ocp, nlp, val[:3, :], penalty)
 
         @staticmethod
@@ -164,8 +155,6 @@ class PenaltyFunctionAbstract:
             It is possible to track markers velocity, in this case the objective is to minimize
             the mismatch between the optimized markers velocities and the reference markers velocities (data_to_track).
             """
-            n_q = nlp.shape["q"]
-            n_qdot = nlp.shape["q_dot"]
             markers_idx = PenaltyFunctionAbstract._check_and_fill_index(
                 penalty.index, nlp.model.nbMarkers(), "markers_idx"
             )
@@ -176,16 +165,28 @@ class PenaltyFunctionAbstract:
                     penalty.target, (3, len(markers_idx), len(x))
                 )
 
-            for m in markers_idx:
-                PenaltyFunctionAbstract._add_to_casadi_func(
-                    nlp, f"biorbd_markerVelocity_{m}", nlp.model.markerVelocity, nlp.q, nlp.q_dot, int(m)
+            if "biorbd_markers_velocity" not in nlp.casadi_func:
+                q = nlp.q
+                q_dot = nlp.q_dot if nlp.q_dot is not None else MX.sym("q_dot", nlp.model.nbQdot(), 1)
+                markers_velocity = horzcat(
+                    MX(3, 0), *[nlp.model.markerVelocity(q, q_dot, m).to_mx() for m in range(nlp.model.nbMarkers())]
                 )
+                nlp.casadi_func["biorbd_markers_velocity"] = Function(
+                    "biorbd_markers_velocity", [q, q_dot], [markers_velocity], ["q", "q_dot"], ["markers_velocity"]
+                ).expand()
 
-            for i, v in enumerate(x):
-                for m in markers_idx:
-                    val = nlp.casadi_func[f"biorbd_markerVelocity_{m}"](v[:n_q], v[n_q : n_q + n_qdot])
-                    penalty.sliced_target = target[:, m, i] if target is not None else None
-                    penalty.type.get_type().add_to_penalty(ocp, nlp, val, penalty)
+            # All the nodes are evaluated by a single call of the mapped function
+            nq = nlp.mapping["q"].reduce.len
+            n_qdot = nlp.shape["q_dot"]
+            q = horzcat(*[nlp.mapping["q"].expand.map(v[:nq]) for v in x])
+            q_dot = horzcat(*[nlp.mapping["q_dot"].expand.map(v[nq : nq + n_qdot]) for v in x])
+            markers_velocity = nlp.casadi_func["biorbd_markers_velocity"].map(len(x))(q, q_dot)
+
+            n_markers = nlp.model.nbMarkers()
+            for i in range(len(x)):
+                val = markers_velocity[:, i * n_markers : (i + 1) * n_markers][:, markers_idx]
+                penalty.sliced_target = target[:, :, i] if target is not None else None
+                penalty.type.get_type().add_to_penalty(ocp, nlp, val, penalty)
 
         @staticmethod
         def align_markers(penalty, ocp, nlp, t, x, u, p, first_marker_idx, second_marker_idx):
@@ -197,12 +198,10 @@ class PenaltyFunctionAbstract:
             :param second_marker_idx: Index of the second marker (integer).
             """
             PenaltyFunctionAbstract._check_idx("marker", [first_marker_idx, second_marker_idx], nlp.model.nbMarkers())
-            PenaltyFunctionAbstract._add_to_casadi_func(nlp, "markers", nlp.model.markers, nlp.q)
-            nq = nlp.mapping["q"].reduce.len
-            for v in x:
-                q = nlp.mapping["q"].expand.map(v[:nq])
-                first_marker = nlp.casadi_func["markers"](q)[:, first_marker_idx]
-                second_marker = nlp.casadi_func["markers"](q)[:, second_marker_idx]
+            for i, v in enumerate(x):
+                markers = PenaltyFunctionAbstract._get_kinematics(nlp, v, t[i])["markers"]
+                first_marker = markers[:, first_marker_idx]
+                second_marker = markers[:, second_marker_idx]
 
                 val = first_marker - second_marker
                 penalty.type.get_type().add_to_penalty(ocp, nlp, val, penalty)
@@ -336,13 +335,10 @@ class PenaltyFunctionAbstract:
             The height is assumed to be the third axis.
             """
             g = -9.81  # get gravity from biorbd
-            PenaltyFunctionAbstract._add_to_casadi_func(nlp, "biorbd_CoM", nlp.model.CoM, nlp.q)
-            PenaltyFunctionAbstract._add_to_casadi_func(nlp, "biorbd_CoMdot", nlp.model.CoMdot, nlp.q, nlp.q_dot)
             for i, v in enumerate(x):
-                q = nlp.mapping["q"].expand.map(v[: nlp.shape["q"]])
-                q_dot = nlp.mapping["q_dot"].expand.map(v[nlp.shape["q"] :])
-                CoM = nlp.casadi_func["biorbd_CoM"](q)
-                CoM_dot = nlp.casadi_func["biorbd_CoMdot"](q, q_dot)
+                kinematics = PenaltyFunctionAbstract._get_kinematics(nlp, v, t[i])
+                CoM = kinematics["com"]
+                CoM_dot = kinematics["com_dot"]
                 CoM_height = (CoM_dot[2] * CoM_dot[2]) / (2 * -g) + CoM[2]
                 penalty.type.get_type().add_to_penalty(ocp, nlp, CoM_height, penalty)
 
@@ -410,24 +406,11 @@ class PenaltyFunctionAbstract:
             if not isinstance(axis, Axe):
                 raise RuntimeError("axis must be a bioptim.Axe")
 
-            def biorbd_meta_func(q, segment_idx, marker_idx):
-                r_rt = nlp.model.globalJCS(q, segment_idx)
-                marker = nlp.model.marker(q, marker_idx)
-                marker.applyRT(r_rt.transpose())
-                return marker.to_mx()
-
-            PenaltyFunctionAbstract._add_to_casadi_func(
-                nlp,
-                f"align_marker_with_segment_axis_{segment_idx}_{marker_idx}",
-                biorbd_meta_func,
-                nlp.q,
-                segment_idx,
-                marker_idx,
-            )
-            nq = nlp.mapping["q"].reduce.len
-            for v in x:
-                q = nlp.mapping["q"].expand.map(v[:nq])
-                marker = nlp.casadi_func[f"align_marker_with_segment_axis_{segment_idx}_{marker_idx}"](q)
+            for i, v in enumerate(x):
+                # Express the marker in the reference frame of the segment
+                kinematics = PenaltyFunctionAbstract._get_kinematics(nlp, v, t[i])
+                jcs = kinematics["jcs"][:, 4 * segment_idx : 4 * (segment_idx + 1)]
+                marker = jcs[:3, :3].T @ (kinematics["markers"][:, marker_idx] - jcs[:3, 3])
                 for axe in Axe:
                     if axe != axis:
                         # To align an axis, the other must be equal to 0
@@ -502,6 +485,45 @@ class PenaltyFunctionAbstract:
             return
         else:
             nlp.casadi_func[name] = biorbd.to_casadi_func(name, function, *all_param)
+            if nlp.expand_kernels:
+                nlp.casadi_func[name] = nlp.casadi_func[name].expand()
+
+    @staticmethod
+    def _get_kinematics(nlp, x, node=None):
+        """
+        Kinematics of a node. All the markers, the segments JCS and the center of mass are computed by a single
+        function, which is called once per node and shared by all the penalties (nlp.kinematics_cache)
+        :param x: States of the node. (element of nlp.X)
+        :param node: The index of the node, used as the key of the cache. The kinematics is not cached if None (int)
+        :return: The markers (3 x nb_markers), the jcs (4 x 4 * nb_segments), the com and the com_dot (dictionary)
+        """
+        if node is not None and node in nlp.kinematics_cache:
+            return nlp.kinematics_cache[node]
+
+        if "biorbd_kinematics" not in nlp.casadi_func:
+            q = nlp.q
+            q_dot = nlp.q_dot if nlp.q_dot is not None else MX.sym("q_dot", nlp.model.nbQdot(), 1)
+            markers = horzcat(MX(3, 0), *[m.to_mx() for m in nlp.model.markers(q)])
+            jcs = horzcat(MX(4, 0), *[nlp.model.globalJCS(q, i).to_mx() for i in range(nlp.model.nbSegment())])
+            nlp.casadi_func["biorbd_kinematics"] = Function(
+                "biorbd_kinematics",
+                [q, q_dot],
+                [markers, jcs, nlp.model.CoM(q).to_mx(), nlp.model.CoMdot(q, q_dot).to_mx()],
+                ["q", "q_dot"],
+                ["markers", "jcs", "com", "com_dot"],
+            ).expand()
+
+        nq = nlp.mapping["q"].reduce.len
+        q = nlp.mapping["q"].expand.map(x[:nq])
+        if nlp.shape["q_dot"]:
+            q_dot = nlp.mapping["q_dot"].expand.map(x[nq : nq + nlp.shape["q_dot"]])
+        else:
+            q_dot = nlp.CX.zeros(nlp.model.nbQdot(), 1)
+        kinematics = nlp.casadi_func["biorbd_kinematics"](q=q, q_dot=q_dot)
+
+        if node is not None:
+            nlp.kinematics_cache[node] = kinematics
+        return kinematics
 
     @staticmethod
     def _parameter_modifier(penalty_function, parameters):
@@ -0,0 +1,145 @@
+from contextlib import contextmanager
+from time import perf_counter
+
+from casadi import Function, MX, SX, symvar, vertcat, vec
+
+
+class BuildProfiler:
+    """
+    Opt-in instrumentation of the construction of an OptimalControlProgram.
+    Each recorded block keeps its wall time, the number of symbolic nodes it created and the size of ocp.V and ocp.g.
+    A block recorded inside another one (such as a penalty declared by a parameter) has a depth of 1 + the depth of
+    the enclosing block, whose time includes the time of the nested block
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.depth = 0
+
+    @contextmanager
+    def record(self, ocp, name, phase=None, detail=None, count_nodes=None):
+        """
+        Time the code executed in the with statement and store the resulting block
+        :param ocp: The OptimalControlProgram being built
+        :param name: Name of the block (string)
+        :param phase: Phase index the block acts on (integer)
+        :param detail: Additional identifier, such as the penalty or the dynamics type (string)
+        :param count_nodes: Callable returning the number of symbolic nodes created by the block. If None, the nodes
+        of the new objective and constraint expressions are counted
+        """
+
+        penalties_before = {id(p) for p in BuildProfiler._all_penalties(ocp)}
+        v_size_before = BuildProfiler._v_size(ocp)
+        g_size_before = BuildProfiler._g_size(ocp)
+        depth = self.depth
+        self.depth += 1
+        tic = perf_counter()
+        try:
+            yield
+        finally:
+            self.depth = depth
+        elapsed_time = perf_counter() - tic
+
+        if count_nodes is None:
+            new_penalties = [p for p in BuildProfiler._all_penalties(ocp) if id(p) not in penalties_before]
+            nodes = BuildProfiler.expression_nodes([p["val"] for p in new_penalties if isinstance(p["val"], (MX, SX))])
+        else:
+            nodes = count_nodes()
+        v_size = BuildProfiler._v_size(ocp)
+        g_size = BuildProfiler._g_size(ocp)
+        self.blocks.append(
+            {
+                "name": name,
+                "phase": phase,
+                "detail": detail,
+                "depth": depth,
+                "time": elapsed_time,
+                "nodes": nodes,
+                "V_size": v_size,
+                "V_added": v_size - v_size_before,
+                "g_size": g_size,
+                "g_added": g_size - g_size_before,
+            }
+        )
+
+    def report(self):
+        """
+        Aggregate the recorded blocks
+        :return: A dictionary with the total time (the sum of the top level blocks, so a nested block is not counted
+        twice), the final V and g sizes, every block in the order they ended and a summary of the blocks grouped by name
+        and detail
+        """
+
+        summary = {}
+        for block in self.blocks:
+            key = block["name"] if block["detail"] is None else f"{block['name']}[{block['detail']}]"
+            if key not in summary:
+                summary[key] = {"count": 0, "time": 0, "nodes": 0, "g_added": 0}
+            summary[key]["count"] += 1
+            summary[key]["time"] += block["time"]
+            summary[key]["nodes"] += block["nodes"]
+            summary[key]["g_added"] += block["g_added"]
+
+        return {
+            "total_time": sum([block["time"] for block in self.blocks if block["depth"] == 0]),
+            "V_size": self.blocks[-1]["V_size"] if self.blocks else 0,
+            "g_size": self.blocks[-1]["g_size"] if self.blocks else 0,
+            "blocks": self.blocks,
+            "summary": dict(sorted(summary.items(), key=lambda item: item[1]["time"], reverse=True)),
+        }
+
+    @staticmethod
+    def expression_nodes(expressions):
+        """
+        Count the symbolic nodes of a set of expressions, shared subexpressions being counted once
+        :param expressions: List of SX or MX expressions
+        :return: The number of nodes (integer)
+        """
+
+        if not expressions:
+            return 0
+        free_symbols = symvar(vertcat(*[vec(e) for e in expressions]))
+        return Function("nodes", free_symbols, expressions).n_nodes()
+
+    @staticmethod
+    def function_nodes(functions):
+        """
+        Count the nodes of the algorithm of CasADi Functions, each Function being counted once
+        :param functions: List of casadi.Function
+        :return: The number of nodes (integer)
+        """
+
+        nodes = 0
+        unique_functions = []
+        for f in functions:
+            if any([f is u for u in unique_functions]):
+                continue
+            unique_functions.append(f)
+            if f.is_a("MXFunction") or f.is_a("SXFunction"):
+                nodes += f.n_nodes()
+        return nodes
+
+    @staticmethod
+    def _all_penalties(ocp):
+        penalties = []
+        for g in ocp.g:
+            penalties += g
+        for j in ocp.J:
+            penalties += j
+        for nlp in ocp.nlp:
+            for g in nlp.g:
+                penalties += g
+            for j in nlp.J:
+                penalties += j
+        return [p for p in penalties if p and "val" in p]
+
+    @staticmethod
+    def _v_size(ocp):
+        return ocp.V.numel() if hasattr(ocp.V, "numel") else len(ocp.V)
+
+    @staticmethod
+    def _g_size(ocp):
+        g_size = 0
+        for g_entry in ocp.g + [g for nlp in ocp.nlp for g in nlp.g]:
+            g_size += sum([g["val"].numel() for g in g_entry if g])
+        return g_size
@@ -257,7 +257,8 @@ class Data:
                 else:
                     raise NotImplementedError(f"Plotting {nlp.control_type} is not implemented yet")
                 params = Data._vertcat(data_parameters, [key for key in ocp.param_to_optimize])
-                xf_dof = np.array(ocp.nlp[idx_phase].dynamics[idx_node](x0=x0, p=p, params=params)["xall"])
+                f_ext = {} if nlp.external_forces is None else {"f_ext": nlp.external_forces[:, idx_node]}
+                xf_dof = np.array(ocp.nlp[idx_phase].dynamics[idx_node](x0=x0, p=p, params=params, **f_ext)["xall"])
 
                 offset = 0
                 for key in nlp.var_states:
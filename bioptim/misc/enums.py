@@ -21,12 +21,22 @@ class OdeSolver(Enum):
     """
     Integration methods.
     (RK is pretty much good balance)
+    RK1, RK2, RK4 (alias of RK), RK45 and RK8: explicit Runge-Kutta of the corresponding order (RK2 and RK45 being
+    embedded methods with an error estimate)
+    IRK: implicit Runge-Kutta (collocation). In SX, the collocation equations are solved by a fixed number of Newton
+    iterations (irk_newton_iterations) instead of a rootfinder, which gives an approximation whose derivatives are the
+    ones of the iterations
     """
 
     RK = 0
     IRK = 1
     CVODES = 2
     NO_SOLVER = 3
+    RK1 = 4
+    RK2 = 5
+    RK4 = 0
+    RK45 = 6
+    RK8 = 7
 
 
 class Node(Enum):
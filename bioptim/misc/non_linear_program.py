@@ -22,9 +22,14 @@ class NonLinearProgram:
         dynamics=[],
         dynamics_func=None,
         dynamics_type=DynamicsFcn.TORQUE_DRIVEN,
+        expand_kernels=False,
         external_forces=None,
+        f_ext=None,
+        F_ext=None,
         g=[],
         g_bounds=Bounds(),
+        implicit_dynamics_func=None,
+        kinematics_cache={},
         mapping={},
         model=None,
         muscleNames=[],
@@ -37,13 +42,14 @@ class NonLinearProgram:
         nx=0,
         ode_solver=OdeSolver.RK,
         p=None,
-        par_dynamics={},
+        par_dynamics=None,
         parameters_to_optimize={},
         phase_idx=0,
         plot={},
         problem_type={},
         q=None,
         q_dot=None,
+        q_ddot=None,
         shape={},
         tau=None,
         t0=0.0,
@@ -68,9 +74,14 @@ class NonLinearProgram:
         self.dynamics = dynamics
         self.dynamics_func = dynamics_func
         self.dynamics_type = dynamics_type
+        self.expand_kernels = expand_kernels
         self.external_forces = external_forces
+        self.f_ext = f_ext
+        self.F_ext = F_ext
         self.g = g
         self.g_bounds = g_bounds
+        self.implicit_dynamics_func = implicit_dynamics_func
+        self.kinematics_cache = kinematics_cache
         self.mapping = mapping
         self.model = model
         self.muscleNames = muscleNames
@@ -90,6 +101,7 @@ class NonLinearProgram:
         self.problem_type = problem_type
         self.q = q
         self.q_dot = q_dot
+        self.q_ddot = q_ddot
         self.shape = shape
         self.tau = tau
         self.t0 = t0
@@ -1,7 +1,9 @@
 import os
 import pickle
+from contextlib import nullcontext
 from copy import deepcopy
 from math import inf
+from threading import Thread, Lock, get_ident
 
 import biorbd
 import casadi
@@ -9,8 +11,9 @@ from casadi import MX, vertcat, SX
 
 from .non_linear_program import NonLinearProgram
 from .__version__ import __version__
+from .build_profiler import BuildProfiler
 from .data import Data
-from .enums import ControlType, OdeSolver, Solver
+from .enums import ControlType, OdeSolver, Solver, Node
 from .mapping import BidirectionalMapping
 from .options_lists import OptionList
 from .parameters import Parameters, ParameterList, Parameter
@@ -19,7 +22,8 @@ from ..dynamics.problem import Problem
 from ..dynamics.dynamics_type import DynamicsList, Dynamics
 from ..gui.plot import CustomPlot
 from ..interfaces.biorbd_interface import BiorbdInterface
-from ..interfaces.integrator import RK4, IRK
+from ..interfaces.integrator import RK, IRK, butcher_tableaus
+from ..interfaces.solve_monitor import SolveFuture
 from ..limits.constraints import ConstraintFunction, ConstraintFcn, ConstraintList, Constraint
 from ..limits.continuity import ContinuityFunctions, StateTransitionFunctions, StateTransitionList
 from ..limits.objective_functions import ObjectiveFcn, ObjectiveFunction, ObjectiveList, Objective
@@ -37,6 +41,9 @@ class OptimalControlProgram:
     To solve problem you have to call : OptimalControlProgram().solve()
     """
 
+    # Maximal number of nodes of an expanded integrator for use_SX="auto" to keep the per-node kernels in SX
+    auto_SX_max_nodes = 100000
+
     def __init__(
         self,
         biorbd_model,
@@ -54,6 +61,8 @@ class OptimalControlProgram:
         ode_solver=OdeSolver.RK,
         nb_integration_steps=5,
         irk_polynomial_interpolation_degree=4,
+        irk_collocation_scheme="legendre",
+        irk_newton_iterations=5,
         control_type=ControlType.CONSTANT,
         all_generalized_mapping=None,
         q_mapping=None,
@@ -63,6 +72,7 @@ class OptimalControlProgram:
         state_transitions=StateTransitionList(),
         nb_threads=1,
         use_SX=False,
+        profile_build=False,
     ):
         """
         Prepare CasADi to solve a problem, defines some parameters, dynamic problem and ode solver.
@@ -80,8 +90,13 @@ class OptimalControlProgram:
         :param objective_functions: Tuple of tuple of objectives functions handler's and weights.
         :param constraints: Tuple of constraints, node(s) and tuple of geometric structures used.
         :param external_forces: Tuple of external forces.
-        :param ode_solver: Name of chosen ode solver to use. (OdeSolver.RK, OdeSolver.CVODES or
-        OdeSolver.NO_SOLVER)
+        :param ode_solver: Name of chosen ode solver to use. (OdeSolver.RK (RK4), OdeSolver.RK1, OdeSolver.RK2,
+        OdeSolver.RK45, OdeSolver.RK8, OdeSolver.IRK, OdeSolver.CVODES or OdeSolver.NO_SOLVER)
+        :param irk_polynomial_interpolation_degree: Degree of the interpolating polynomial of OdeSolver.IRK (integer)
+        :param irk_collocation_scheme: Collocation points of OdeSolver.IRK, "legendre" or "radau" (string)
+        :param irk_newton_iterations: Number of Newton iterations solving the collocation equations of OdeSolver.IRK
+        when the graph is built in SX (use_SX=True), a rootfinder being used otherwise. The equations are then only
+        solved approximately, see OdeSolver (integer)
         :param all_generalized_mapping: States and controls mapping. (Instance of class Mapping)
         :param q_mapping: Generalized coordinates position states mapping. (Instance of class Mapping)
         :param q_dot_mapping: Generalized coordinates velocity states mapping. (Instance of class Mapping)
@@ -90,6 +105,10 @@ class OptimalControlProgram:
         :param state_transitions: State transitions (as a constraint, or an objective if there is a weight higher
         than zero)
         :param nb_threads: Number of threads used for the resolution of the problem. Default: not parallelized (integer)
+        :param use_SX: If the CasADi graph should be built in SX (True) or MX (False). With "auto", the shooting
+        structure is kept in MX while the per-node kernels are expanded to SX when their graph is small enough (see
+        auto_SX_max_nodes). The decisions are reported in cx_decisions
+        :param profile_build: If the construction of the program should be timed, see build_report (bool)
         """
 
         if isinstance(biorbd_model, str):
@@ -120,6 +139,8 @@ class OptimalControlProgram:
             "ode_solver": ode_solver,
             "nb_integration_steps": nb_integration_steps,
             "irk_polynomial_interpolation_degree": irk_polynomial_interpolation_degree,
+            "irk_collocation_scheme": irk_collocation_scheme,
+            "irk_newton_iterations": irk_newton_iterations,
             "control_type": control_type,
             "all_generalized_mapping": all_generalized_mapping,
             "q_mapping": q_mapping,
@@ -129,6 +150,7 @@ class OptimalControlProgram:
             "state_transitions": state_transitions,
             "nb_threads": nb_threads,
             "use_SX": use_SX,
+            "profile_build": profile_build,
         }
 
         # Check integrity of arguments
@@ -215,8 +237,18 @@ class OptimalControlProgram:
         if not isinstance(ode_solver, OdeSolver):
             raise RuntimeError("ode_solver should be built an instance of OdeSolver")
 
-        if not isinstance(use_SX, bool):
-            raise RuntimeError("use_SX should be a bool")
+        if irk_collocation_scheme not in ("legendre", "radau"):
+            raise RuntimeError("irk_collocation_scheme should be 'legendre' or 'radau'")
+
+        if not isinstance(irk_newton_iterations, int) or irk_newton_iterations < 1:
+            raise RuntimeError("irk_newton_iterations should be a positive integer")
+
+        if not isinstance(use_SX, bool) and use_SX != "auto":
+            raise RuntimeError("use_SX should be a bool or 'auto'")
+
+        if not isinstance(profile_build, bool):
+            raise RuntimeError("profile_build should be a bool")
+        self.build_profiler = BuildProfiler() if profile_build else None
 
         # Declare optimization variables
         self.J = []
@@ -226,6 +258,7 @@ class OptimalControlProgram:
         self.V_bounds = Bounds(interpolation=InterpolationType.CONSTANT)
         self.V_init = InitialGuess(interpolation=InterpolationType.CONSTANT)
         self.param_to_optimize = {}
+        self.objective_values_func = None
 
         # nlp is the core of a phase
         self.nlp = [NonLinearProgram() for _ in range(self.nb_phases)]
@@ -233,10 +266,12 @@ class OptimalControlProgram:
         self.__add_to_nlp("phase_idx", [i for i in range(self.nb_phases)], False)
 
         # Type of CasADi graph
-        if use_SX:
+        if use_SX is True:
             self.CX = SX
         else:
             self.CX = MX
+        self.use_SX_auto = use_SX == "auto"
+        self.cx_decisions = []
 
         # Define some aliases
         self.__add_to_nlp("ns", number_shooting_points, False)
@@ -254,6 +289,8 @@ class OptimalControlProgram:
         self.__add_to_nlp("nb_threads", nb_threads, True)
         self.solver_type = Solver.NONE
         self.solver = None
+        self.solve_lock = Lock()
+        self.async_solve_thread = None
 
         # External forces
         if external_forces != ():
@@ -290,6 +327,8 @@ class OptimalControlProgram:
         self.__add_to_nlp("control_type", control_type, True)
         self.__add_to_nlp("nb_integration_steps", nb_integration_steps, True)
         self.__add_to_nlp("irk_polynomial_interpolation_degree", irk_polynomial_interpolation_degree, True)
+        self.__add_to_nlp("irk_collocation_scheme", irk_collocation_scheme, True)
+        self.__add_to_nlp("irk_newton_iterations", irk_newton_iterations, True)
 
         # Prepare the dynamics
         for i in range(self.nb_phases):
@@ -297,11 +336,22 @@ class OptimalControlProgram:
             Problem.initialize(self, self.nlp[i])
             if self.nlp[0].nx != self.nlp[i].nx or self.nlp[0].nu != self.nlp[i].nu:
                 raise RuntimeError("Dynamics with different nx or nu is not supported yet")
-            self.__prepare_dynamics(self.nlp[i])
+            with self.__profile(
+                "prepare_dynamics",
+                phase=i,
+                detail=self.nlp[i].dynamics_type.type.name,
+                count_nodes=lambda: BuildProfiler.function_nodes([self.nlp[i].dynamics_func] + self.nlp[i].dynamics),
+            ):
+                self.__prepare_dynamics(self.nlp[i])
 
         # Define the actual NLP problem
         for i in range(self.nb_phases):
-            self.__define_multiple_shooting_nodes_per_phase(self.nlp[i], i)
+            with self.__profile(
+                "define_multiple_shooting_nodes",
+                phase=i,
+                count_nodes=lambda: len(self.nlp[i].X) + len(self.nlp[i].U),
+            ):
+                self.__define_multiple_shooting_nodes_per_phase(self.nlp[i], i)
 
         # Define continuity constraints
         # Prepare phase transitions (Reminder, it is important that parameters are declared before,
@@ -309,7 +359,16 @@ class OptimalControlProgram:
         self.state_transitions = StateTransitionFunctions.prepare_state_transitions(self, state_transitions)
 
         # Inner- and inter-phase continuity
-        ContinuityFunctions.continuity(self)
+        with self.__profile("continuity"):
+            ContinuityFunctions.continuity(self)
+
+        # Inverse dynamics of the implicit formulations
+        for i in range(self.nb_phases):
+            if self.nlp[i].implicit_dynamics_func is not None:
+                with self.__profile("implicit_dynamics", phase=i):
+                    ConstraintFunction.add_or_replace(
+                        self, self.nlp[i], Constraint(ConstraintFcn.IMPLICIT_DYNAMICS, node=Node.ALL, phase=i)
+                    )
 
         self.isdef_x_init = False
         self.isdef_u_init = False
@@ -338,6 +397,7 @@ class OptimalControlProgram:
         nlp.g = []
         nlp.g_bounds = []
         nlp.casadi_func = {}
+        nlp.kinematics_cache = {}
 
     def __add_to_nlp(self, param_name, param, duplicate_if_size_is_one, _type=None, name=None):
         """Adds coupled parameters to the non linear problem"""
@@ -424,20 +484,18 @@ class OptimalControlProgram:
         """
 
         ode_opt = {"t0": 0, "tf": nlp.dt}
-        if nlp.ode_solver == OdeSolver.RK:
+        if nlp.ode_solver in butcher_tableaus:
             ode_opt["number_of_finite_elements"] = nlp.nb_integration_steps
+            ode_opt["butcher_tableau"] = butcher_tableaus[nlp.ode_solver]
         elif nlp.ode_solver == OdeSolver.IRK:
             nlp.nb_integration_steps = 1
 
         dynamics = nlp.dynamics_func
-        ode = {"x": nlp.x, "p": nlp.u, "ode": dynamics(nlp.x, nlp.u, nlp.p)}
+        ode = {"x": nlp.x, "p": nlp.u}
         nlp.dynamics = []
-        nlp.par_dynamics = {}
-        if nlp.ode_solver == OdeSolver.RK or nlp.ode_solver == OdeSolver.IRK:
+        nlp.par_dynamics = None
+        if nlp.ode_solver in butcher_tableaus or nlp.ode_solver == OdeSolver.IRK:
             if nlp.ode_solver == OdeSolver.IRK:
-                if self.CX is SX:
-                    raise NotImplementedError("use_SX and OdeSolver.IRK are not yet compatible")
-
                 if nlp.model.nbQuat() > 0:
                     raise NotImplementedError(
                         "Quaternions can't be used with IRK yet. If you get this error, please notify the "
@@ -447,41 +505,73 @@ class OptimalControlProgram:
             ode_opt["model"] = nlp.model
             ode_opt["param"] = nlp.p
             ode_opt["CX"] = nlp.CX
-            ode_opt["idx"] = 0
+            ode_opt["external_forces"] = None
             ode["ode"] = dynamics
             ode_opt["control_type"] = nlp.control_type
-            if nlp.external_forces:
-                for idx in range(len(nlp.external_forces)):
-                    ode_opt["idx"] = idx
-                    if nlp.ode_solver == OdeSolver.RK:
-                        nlp.dynamics.append(RK4(ode, ode_opt))
-                    elif nlp.ode_solver == OdeSolver.IRK:
-                        ode_opt["irk_polynomial_interpolation_degree"] = nlp.irk_polynomial_interpolation_degree
-                        nlp.dynamics.append(IRK(ode, ode_opt))
-            else:
-                if self.nb_threads > 1 and nlp.control_type == ControlType.LINEAR_CONTINUOUS:
-                    raise RuntimeError("Piece-wise linear continuous controls cannot be used with multiple threads")
-                if nlp.ode_solver == OdeSolver.RK:
-                    nlp.dynamics.append(RK4(ode, ode_opt))
-                elif nlp.ode_solver == OdeSolver.IRK:
-                    ode_opt["irk_polynomial_interpolation_degree"] = nlp.irk_polynomial_interpolation_degree
-                    nlp.dynamics.append(IRK(ode, ode_opt))
+            if self.nb_threads > 1 and nlp.control_type == ControlType.LINEAR_CONTINUOUS:
+                raise RuntimeError("Piece-wise linear continuous controls cannot be used with multiple threads")
+            if nlp.external_forces is not None:
+                if nlp.external_forces.shape[1] != nlp.ns:
+                    raise RuntimeError(
+                        f"external_forces of phase {nlp.phase_idx} should be declared for each of the "
+                        f"{nlp.ns} shooting nodes"
+                    )
+                ode_opt["external_forces"] = nlp.CX.sym("f_ext", nlp.external_forces.shape[0], 1)
+
+            if nlp.ode_solver in butcher_tableaus:
+                nlp.dynamics.append(RK(ode, ode_opt))
+            elif nlp.ode_solver == OdeSolver.IRK:
+                ode_opt["irk_polynomial_interpolation_degree"] = nlp.irk_polynomial_interpolation_degree
+                ode_opt["irk_collocation_scheme"] = nlp.irk_collocation_scheme
+                ode_opt["irk_newton_iterations"] = nlp.irk_newton_iterations
+                nlp.dynamics.append(IRK(ode, ode_opt))
         elif nlp.ode_solver == OdeSolver.CVODES:
             if not isinstance(self.CX(), MX):
                 raise RuntimeError("CVODES integrator can only be used with MX graphs")
             if len(self.param_to_optimize) != 0:
                 raise RuntimeError("CVODES cannot be used while optimizing parameters")
-            if nlp.external_forces:
+            if nlp.external_forces is not None:
                 raise RuntimeError("CVODES cannot be used with external_forces")
             if nlp.control_type == ControlType.LINEAR_CONTINUOUS:
                 raise RuntimeError("CVODES cannot be used with piece-wise linear controls (only RK4)")
+            ode["ode"] = dynamics(nlp.x, nlp.u, nlp.p)
             nlp.dynamics.append(casadi.integrator("integrator", "cvodes", ode, ode_opt))
 
+        if self.use_SX_auto:
+            self.__choose_kernels_graph(nlp)
+
         if len(nlp.dynamics) == 1:
             if self.nb_threads > 1:
                 nlp.par_dynamics = nlp.dynamics[0].map(nlp.ns, "thread", self.nb_threads)
+            elif (self.use_SX_auto or nlp.external_forces is not None) and nlp.control_type == ControlType.CONSTANT:
+                nlp.par_dynamics = nlp.dynamics[0].map(nlp.ns)
             nlp.dynamics = nlp.dynamics * nlp.ns
 
+    def __choose_kernels_graph(self, nlp):
+        """
+        For use_SX="auto", expand the integrators of a phase (and later its penalty kernels) to SX if the expanded
+        graph is smaller than auto_SX_max_nodes. The decision is appended to cx_decisions
+        :param nlp: The nlp problem
+        """
+
+        decision = {"phase": nlp.phase_idx, "kernels": "MX", "nodes_MX": 0, "nodes_SX": None, "reason": ""}
+        decision["nodes_MX"] = sum([f.n_nodes() for f in nlp.dynamics if f.is_a("MXFunction")])
+        try:
+            expanded = [f.expand() for f in nlp.dynamics]
+        except RuntimeError:
+            decision["reason"] = f"{nlp.ode_solver.name} integrator cannot be expanded"
+        else:
+            decision["nodes_SX"] = sum([f.n_nodes() for f in expanded])
+            if decision["nodes_SX"] <= self.auto_SX_max_nodes:
+                nlp.dynamics = expanded
+                nlp.expand_kernels = True
+                decision["kernels"] = "SX"
+                decision["reason"] = f"expanded graph is smaller than {self.auto_SX_max_nodes} nodes"
+            else:
+                decision["reason"] = f"expanded graph is larger than {self.auto_SX_max_nodes} nodes"
+        decision["map"] = nlp.control_type == ControlType.CONSTANT and len(nlp.dynamics) == 1
+        self.cx_decisions.append(decision)
+
     def __define_multiple_shooting_nodes_per_phase(self, nlp, idx_phase):
         """
         For each node, puts x_bounds and u_bounds in V_bounds.
@@ -516,8 +606,13 @@ class OptimalControlProgram:
 
         nlp.X = X
         nlp.U = U
+        nlp.kinematics_cache = {}
         self.V = vertcat(self.V, V)
 
+        # The external forces are parameters of the NLP, their values are only sent to the solver
+        if nlp.external_forces is not None:
+            nlp.F_ext = nlp.CX.sym(f"F_ext_{idx_phase}", nlp.external_forces.shape[0], nlp.ns)
+
     def __define_initial_guesss(self):
         for i in range(self.nb_phases):
             self.nlp[i].x_init.check_and_adjust_dimensions(self.nlp[i].nx, self.nlp[i].ns)
@@ -529,9 +624,7 @@ class OptimalControlProgram:
                 raise NotImplementedError(f"Plotting {self.nlp[i]['control_type']} is not implemented yet")
 
         self.V_init = InitialGuess(interpolation=InterpolationType.CONSTANT)
-
-        for key in self.param_to_optimize.keys():
-            self.V_init.concatenate(self.param_to_optimize[key].initial_guess)
+        all_V_init = [self.param_to_optimize[key].initial_guess for key in self.param_to_optimize.keys()]
 
         for idx_phase, nlp in enumerate(self.nlp):
             if nlp.control_type == ControlType.CONSTANT:
@@ -555,7 +648,8 @@ class OptimalControlProgram:
                     offset += nlp.nu
 
             V_init.check_and_adjust_dimensions(nV, 1)
-            self.V_init.concatenate(V_init)
+            all_V_init.append(V_init)
+        self.V_init.concatenate(*all_V_init)
 
     def __define_bounds(self):
         for i in range(self.nb_phases):
@@ -568,9 +662,7 @@ class OptimalControlProgram:
                 raise NotImplementedError(f"Plotting {self.nlp[i]['control_type']} is not implemented yet")
 
         self.V_bounds = Bounds(interpolation=InterpolationType.CONSTANT)
-
-        for key in self.param_to_optimize.keys():
-            self.V_bounds.concatenate(self.param_to_optimize[key].bounds)
+        all_V_bounds = [self.param_to_optimize[key].bounds for key in self.param_to_optimize.keys()]
 
         for idx_phase, nlp in enumerate(self.nlp):
             if nlp.control_type == ControlType.CONSTANT:
@@ -595,7 +687,8 @@ class OptimalControlProgram:
                     offset += nlp.nu
 
             V_bounds.check_and_adjust_dimensions(nV, 1)
-            self.V_bounds.concatenate(V_bounds)
+            all_V_bounds.append(V_bounds)
+        self.V_bounds.concatenate(*all_V_bounds)
 
     def __init_phase_time(self, phase_time, objective_functions, constraints):
         """
@@ -656,13 +749,13 @@ class OptimalControlProgram:
         :param min_bound: variable time minimums as set by user (default: 0)
         :param max_bound: variable time maximums as set by user (default: inf)
         """
-        i = 0
-        for nlp in self.nlp:
-            if isinstance(nlp.tf, self.CX):
-                time_bounds = Bounds(min_bound[i], max_bound[i], interpolation=InterpolationType.CONSTANT)
-                time_init = InitialGuess(initial_guess[i])
-                Parameters._add_to_v(self, "time", 1, None, time_bounds, time_init, nlp.tf)
-                i += 1
+        # All the variable times are declared as a single parameter, so its bounds and initial guess are built once
+        all_tf = [nlp.tf for nlp in self.nlp if isinstance(nlp.tf, self.CX)]
+        if all_tf:
+            nb_tf = len(all_tf)
+            time_bounds = Bounds(min_bound[:nb_tf], max_bound[:nb_tf], interpolation=InterpolationType.CONSTANT)
+            time_init = InitialGuess(initial_guess[:nb_tf])
+            Parameters._add_to_v(self, "time", nb_tf, None, time_bounds, time_init, vertcat(*all_tf))
 
     def update_objectives(self, new_objective_function):
         if isinstance(new_objective_function, Objective):
@@ -688,6 +781,26 @@ class OptimalControlProgram:
         else:
             raise RuntimeError("new_constraint must be a Constraint or a ConstraintList")
 
+    def update_external_forces(self, external_forces):
+        """
+        Change the values of the external forces. Since they are inputs of the dynamics, the program is not rebuilt
+        :param external_forces: The external forces of each phase, see OptimalControlProgram external_forces
+        """
+        all_f_ext = BiorbdInterface.convert_array_to_external_forces(external_forces)
+        if len(all_f_ext) != self.nb_phases:
+            raise RuntimeError("external_forces should be declared for each phase")
+        for nlp, f_ext in zip(self.nlp, all_f_ext):
+            if nlp.external_forces is None:
+                raise RuntimeError("external_forces can only be updated if they were declared at the construction")
+            if f_ext.shape != nlp.external_forces.shape:
+                raise RuntimeError(
+                    f"external_forces of phase {nlp.phase_idx} should be a matrix of dimension "
+                    f"{nlp.external_forces.shape}, it is {f_ext.shape}"
+                )
+        for nlp, f_ext in zip(self.nlp, all_f_ext):
+            nlp.external_forces = f_ext
+        self.original_values["external_forces"] = external_forces
+
     def update_parameters(self, new_parameters):
         if isinstance(new_parameters, Parameter):
             self.__modify_penalty(new_parameters, "parameters")
@@ -706,7 +819,10 @@ class OptimalControlProgram:
         if u_bounds:
             self.__add_path_condition_to_nlp(u_bounds, "u_bounds", Bounds, BoundsList, "Bounds")
         if self.isdef_x_bounds and self.isdef_u_bounds:
-            self.__define_bounds()
+            with self.__profile("define_bounds", count_nodes=lambda: 0):
+                self.__define_bounds()
+        if self.solver is not None:
+            self.solver.invalidate("bounds")
 
     def update_initial_guess(self, x_init=InitialGuessList(), u_init=InitialGuessList(), param_init=InitialGuessList()):
         if x_init:
@@ -728,7 +844,10 @@ class OptimalControlProgram:
             self.param_to_optimize[param.name].initial_guess.init = param.init
 
         if self.isdef_x_init and self.isdef_u_init:
-            self.__define_initial_guesss()
+            with self.__profile("define_initial_guess", count_nodes=lambda: 0):
+                self.__define_initial_guesss()
+        if self.solver is not None:
+            self.solver.invalidate("initial_guess")
 
     def __modify_penalty(self, new_penalty, penalty_name):
         """
@@ -742,15 +861,42 @@ class OptimalControlProgram:
 
         # Copy to self.original_values so it can be save/load
         self.original_values[penalty_name].add(deepcopy(new_penalty))
+        self.objective_values_func = None
+        if self.solver is not None:
+            self.solver.invalidate(penalty_name)
+
+        detail = new_penalty.type.name if hasattr(new_penalty.type, "name") else new_penalty.name
+        with self.__profile(penalty_name, phase=phase_idx, detail=detail):
+            if penalty_name == "objective_functions":
+                ObjectiveFunction.add_or_replace(self, self.nlp[phase_idx], new_penalty)
+            elif penalty_name == "constraints":
+                ConstraintFunction.add_or_replace(self, self.nlp[phase_idx], new_penalty)
+            elif penalty_name == "parameters":
+                Parameters.add_or_replace(self, new_penalty)
+            else:
+                raise RuntimeError("Unrecognized penalty")
 
-        if penalty_name == "objective_functions":
-            ObjectiveFunction.add_or_replace(self, self.nlp[phase_idx], new_penalty)
-        elif penalty_name == "constraints":
-            ConstraintFunction.add_or_replace(self, self.nlp[phase_idx], new_penalty)
-        elif penalty_name == "parameters":
-            Parameters.add_or_replace(self, new_penalty)
-        else:
-            raise RuntimeError("Unrecognized penalty")
+    def __profile(self, name, phase=None, detail=None, count_nodes=None):
+        """
+        Record a construction block if profile_build was requested
+        :param name: Name of the block (string)
+        :param phase: Phase index the block acts on (integer)
+        :param detail: Additional identifier of the block (string)
+        :param count_nodes: Callable returning the number of symbolic nodes created by the block
+        :return: A context manager
+        """
+        if self.build_profiler is None:
+            return nullcontext()
+        return self.build_profiler.record(self, name, phase=phase, detail=detail, count_nodes=count_nodes)
+
+    def build_report(self):
+        """
+        Report of the time spent building the program, see BuildProfiler.report
+        :return: The report (dictionary)
+        """
+        if self.build_profiler is None:
+            raise RuntimeError("build_report is only available if the program is declared with profile_build=True")
+        return self.build_profiler.report()
 
     def add_plot(self, fig_name, update_function, phase=-1, **parameters):
         """
@@ -797,6 +943,12 @@ class OptimalControlProgram:
         return_iterations=False,
         return_objectives=False,
         solver_options={},
+        warm_start=False,
+        warm_start_shift=0,
+        cancel_event=None,
+        resume_from=None,
+        sensitivity_update=False,
+        sensitivity_tol=1e-6,
     ):
         """
         Gives to CasADi states, controls, constraints, sum of all objective functions and theirs bounds.
@@ -804,41 +956,107 @@ class OptimalControlProgram:
         :param solver: Name of the solver to use during the optimization. (string)
         :param show_online_optim: if True, optimization process is graphed in realtime. (bool)
         :param options_ipopt: See Ippot documentation for options. (dictionary)
+        :param warm_start: If True, the solve starts from the primal-dual solution of the previous solve of the
+        program (if its size did not change) instead of the initial guess. Only available with Ipopt (bool)
+        :param warm_start_shift: Number of nodes the previous solution is moved backward in time, for receding
+        horizons (integer)
+        :param cancel_event: When set (from another thread), Ipopt stops at the end of its current iteration and the
+        solution is the best iterate found so far, with sol["interrupted"] set to True (threading.Event)
+        :param resume_from: Path of a checkpoint written by a previous solve (see the checkpoint_path solver option).
+        Ipopt is warm started from its iterate and with its options. Only available with Ipopt (string)
+        :param sensitivity_update: If True and the last solve with this option converged, the solution is first
+        predicted from its derivatives with respect to the targets of the objectives and the external forces (after
+        update_objectives or update_external_forces). Ipopt is only called when the KKT residual of the prediction
+        is larger than sensitivity_tol, sol["predicted"] telling which one was returned. Only available with Ipopt
+        (bool)
+        :param sensitivity_tol: The largest KKT residual of an accepted prediction (float)
         :return: Solution of the problem. (dictionary)
+        A program is solved by one solve at a time, a RuntimeError being raised if solve is called while another
+        solve (or solve_async) of the program is running
         """
 
-        if return_iterations and not show_online_optim:
-            raise RuntimeError("return_iterations without show_online_optim is not implemented yet.")
-
-        if solver == Solver.IPOPT and self.solver_type != Solver.IPOPT:
-            from ..interfaces.ipopt_interface import IpoptInterface
-
-            self.solver = IpoptInterface(self)
-
-        elif solver == Solver.ACADOS and self.solver_type != Solver.ACADOS:
-            from ..interfaces.acados_interface import AcadosInterface
-
-            self.solver = AcadosInterface(self, **solver_options)
+        # The thread of solve_async already holds the lock
+        take_lock = self.async_solve_thread != get_ident()
+        if take_lock and not self.solve_lock.acquire(blocking=False):
+            raise RuntimeError("A solve of this program is already running, the solves of a program cannot overlap")
+        try:
+            if return_iterations and not show_online_optim:
+                raise RuntimeError("return_iterations without show_online_optim is not implemented yet.")
+
+            if solver == Solver.IPOPT and self.solver_type != Solver.IPOPT:
+                from ..interfaces.ipopt_interface import IpoptInterface
+
+                self.solver = IpoptInterface(self)
+
+            elif solver == Solver.ACADOS and self.solver_type != Solver.ACADOS:
+                from ..interfaces.acados_interface import AcadosInterface
+
+                self.solver = AcadosInterface(self, **solver_options)
+
+            elif self.solver_type == Solver.NONE:
+                raise RuntimeError("Solver not specified")
+            self.solver_type = solver
+
+            if show_online_optim:
+                self.solver.online_optim(self)
+                if return_iterations:
+                    self.solver.start_get_iterations()
+
+            if solver == Solver.IPOPT:
+                self.solver.set_warm_start(warm_start, warm_start_shift)
+                self.solver.set_cancel_event(cancel_event)
+                self.solver.set_sensitivity_update(sensitivity_update, sensitivity_tol)
+                if resume_from is not None:
+                    self.solver.load_checkpoint(resume_from)
+            elif warm_start or resume_from is not None or sensitivity_update:
+                raise NotImplementedError(
+                    "warm_start, resume_from and sensitivity_update are only implemented with Ipopt"
+                )
 
-        elif self.solver_type == Solver.NONE:
-            raise RuntimeError("Solver not specified")
-        self.solver_type = solver
+            self.solver.configure(solver_options)
+            self.solver.solve()
 
-        if show_online_optim:
-            self.solver.online_optim(self)
             if return_iterations:
-                self.solver.start_get_iterations()
+                self.solver.finish_get_iterations()
 
-        self.solver.configure(solver_options)
-        self.solver.solve()
+            if return_objectives:
+                self.solver.get_objectives()
 
-        if return_iterations:
-            self.solver.finish_get_iterations()
+            return self.solver.get_optimized_value()
+        finally:
+            if take_lock:
+                self.solve_lock.release()
 
-        if return_objectives:
-            self.solver.get_objectives()
+    def solve_async(self, **solve_args):
+        """
+        Solve the program in a background thread
+        :param solve_args: The arguments of solve
+        :return: A SolveFuture (a concurrent.futures.Future, which can be awaited through asyncio.wrap_future) of the
+        solution. Cancelling it while the solve is running stops Ipopt at its next iteration. The program is locked
+        until the solve is done, solve and solve_async raising a RuntimeError in the meantime
+        """
 
-        return self.solver.get_optimized_value()
+        if "cancel_event" in solve_args:
+            raise RuntimeError("The cancellation of solve_async is done through the returned future")
+        if not self.solve_lock.acquire(blocking=False):
+            raise RuntimeError("A solve of this program is already running, the solves of a program cannot overlap")
+        future = SolveFuture()
+
+        def run():
+            self.async_solve_thread = get_ident()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    future.set_result(self.solve(cancel_event=future.cancel_event, **solve_args))
+                except BaseException as e:
+                    future.set_exception(e)
+            finally:
+                self.async_solve_thread = None
+                self.solve_lock.release()
+
+        Thread(target=run, daemon=True).start()
+        return future
 
     def save(self, sol, file_path, sol_iterations=None):
         """
@@ -125,10 +125,9 @@ class Parameters:
         else:
             ocp.param_to_optimize[name] = param_to_store
 
+        # V_bounds and V_init are built from param_to_optimize when the bounds and initial guess of the program are
+        # defined, so they are not concatenated here
         bounds.check_and_adjust_dimensions(size, 1)
-        ocp.V_bounds.concatenate(bounds)
-
         initial_guess.check_and_adjust_dimensions(size, 1)
-        ocp.V_init.concatenate(initial_guess)
 
         return cx
@@ -27,8 +27,9 @@ class Simulate:
                 else:
                     raise NotImplementedError(f"Plotting {nlp.control_type} is not implemented yet")
 
+                f_ext = {} if nlp.external_forces is None else {"f_ext": nlp.external_forces[:, idx_nodes]}
                 v_output[offset + nlp.nx + nlp.nu : offset + 2 * nlp.nx + nlp.nu] = np.array(
-                    nlp.dynamics[idx_nodes](x0=x0, p=p)["xf"]
+                    nlp.dynamics[idx_nodes](x0=x0, p=p, **f_ext)["xf"]
                 ).squeeze()
 
                 offset += nlp.nx + nlp.nu
@@ -71,11 +72,9 @@ class Simulate:
                 else:
                     raise NotImplementedError(f"Plotting {nlp.control_type} is not implemented yet")
 
+                f_ext = {} if nlp.external_forces is None else {"f_ext": nlp.external_forces[:, idx_nodes]}
                 v_phase[offset + nlp.nx + nlp.nu : offset + 2 * nlp.nx + nlp.nu] = np.array(
-                    nlp.dynamics[idx_nodes](
-                        x0=x0,
-                        p=p,
-                    )["xf"]
+                    nlp.dynamics[idx_nodes](x0=x0, p=p, **f_ext)["xf"]
                 ).squeeze()
 
                 offset += nlp.nx + nlp.nu
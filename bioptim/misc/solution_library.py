@@ -0,0 +1,252 @@
+import hashlib
+import os
+import pickle
+from uuid import uuid4
+
+import numpy as np
+
+from .enums import ControlType, InterpolationType
+from ..interfaces.solve_monitor import Checkpoint
+from ..limits.path_conditions import InitialGuess, InitialGuessList
+
+
+class SolutionLibrary:
+    """
+    On-disk library of solutions, each one saved with OptimalControlProgram.save. The solutions are indexed by a
+    feature vector (the phase times and the mean and standard deviation of the targets of each objective) and by a
+    hash of the models, so a new program can be started from the solution of the closest program already solved
+    """
+
+    index_file = "library.pkl"
+
+    def __init__(self, directory, max_entries=100):
+        """
+        :param directory: The directory of the library, created if it does not exist (string)
+        :param max_entries: The number of solutions kept. When it is exceeded, the least recently used solution is
+        removed from the disk (integer)
+        """
+        if max_entries < 1:
+            raise RuntimeError("max_entries must be at least 1")
+        self.directory = directory
+        self.max_entries = max_entries
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.index = {"entries": {}, "counter": 0}
+        if os.path.isfile(self.__path(SolutionLibrary.index_file)):
+            with open(self.__path(SolutionLibrary.index_file), "rb") as file:
+                self.index = pickle.load(file)
+
+    def __len__(self):
+        return len(self.index["entries"])
+
+    def add(self, ocp, sol):
+        """
+        Save a solution in the library, the least recently used one being evicted if the library is full
+        :param ocp: The OptimalControlProgram
+        :param sol: The solution of ocp (dictionary)
+        :return: The path of the saved solution (string)
+        """
+        name = f"solution_{self.index['counter']}"
+        file_path = self.__path(f"{name}.bo")
+        ocp.save(sol, file_path)
+
+        self.index["entries"][name] = {
+            "model_hash": SolutionLibrary.model_hash(ocp),
+            "features": SolutionLibrary.features(ocp),
+            "layout": SolutionLibrary.layout(ocp),
+            "last_used": self.index["counter"],
+        }
+        self.index["counter"] += 1
+
+        while len(self.index["entries"]) > self.max_entries:
+            oldest = min(self.index["entries"], key=lambda key: self.index["entries"][key]["last_used"])
+            del self.index["entries"][oldest]
+            if os.path.isfile(self.__path(f"{oldest}.bo")):
+                os.remove(self.__path(f"{oldest}.bo"))
+        self.__save_index()
+        return file_path
+
+    def nearest(self, ocp):
+        """
+        Find the stored solution of the same models whose features are the closest to the ones of ocp
+        :param ocp: The OptimalControlProgram
+        :return: None if no solution is compatible, otherwise a dictionary with the x_init and u_init
+        (InitialGuessList, the stored solution being interpolated with InterpolationType.SPLINE on the nodes of
+        ocp), param_init (list of named InitialGuess), distance (float) and file_path (string). If the stored
+        program has the same structure as ocp, x, lam_x and lam_g (numpy arrays) are also returned
+        """
+        model_hash = SolutionLibrary.model_hash(ocp)
+        features = SolutionLibrary.features(ocp)
+        layout = SolutionLibrary.layout(ocp)
+
+        best, best_distance = None, np.inf
+        for name, entry in self.index["entries"].items():
+            if entry["model_hash"] != model_hash or entry["features"].shape != features.shape:
+                continue
+            if not SolutionLibrary.__is_interpolable(entry["layout"], layout):
+                continue
+            distance = np.linalg.norm((entry["features"] - features) / np.maximum(np.abs(features), 1))
+            if distance < best_distance:
+                best, best_distance = name, distance
+        if best is None:
+            return None
+
+        entry = self.index["entries"][best]
+        entry["last_used"] = self.index["counter"]
+        self.index["counter"] += 1
+        self.__save_index()
+
+        file_path = self.__path(f"{best}.bo")
+        with open(file_path, "rb") as file:
+            sol = pickle.load(file)["sol"]
+        v = np.array(sol["x"]).reshape((-1, 1))
+        params, all_x, all_u = SolutionLibrary.__split(v, entry["layout"])
+
+        out = {"x_init": InitialGuessList(), "u_init": InitialGuessList(), "param_init": []}
+        for x, u in zip(all_x, all_u):
+            out["x_init"].add(SolutionLibrary.__interpolated_guess(x))
+            out["u_init"].add(SolutionLibrary.__interpolated_guess(u))
+        for param_name, value in params.items():
+            out["param_init"].append(InitialGuess(value, name=param_name))
+        out["distance"] = best_distance
+        out["file_path"] = file_path
+        if entry["layout"] == layout:
+            out["x"] = v
+            out["lam_x"] = np.array(sol["lam_x"]).reshape((-1, 1))
+            out["lam_g"] = np.array(sol["lam_g"]).reshape((-1, 1))
+        return out
+
+    def initialize(self, ocp, checkpoint_path=None):
+        """
+        Set the initial guess of ocp to the nearest stored solution. If the stored program has the same structure,
+        its primal-dual solution is also written as a checkpoint, which can be given to ocp.solve(resume_from=...)
+        :param ocp: The OptimalControlProgram
+        :param checkpoint_path: The path of the checkpoint. If None, a new file named after the stored solution is
+        written in the library directory at each call, so concurrent calls never overwrite each other's checkpoint.
+        The checkpoint is left to the caller, it is not removed with the solution (string)
+        :return: The output of nearest, with the path of the checkpoint (checkpoint) if the structure matches
+        """
+        out = self.nearest(ocp)
+        if out is None:
+            return None
+
+        ocp.update_initial_guess(out["x_init"], out["u_init"])
+        for param_init in out["param_init"]:
+            ocp.update_initial_guess(param_init=param_init)
+        if "lam_g" in out:
+            if checkpoint_path is None:
+                name = os.path.splitext(os.path.basename(out["file_path"]))[0]
+                checkpoint_path = self.__path(f"{name}_{uuid4().hex}.npz")
+            out["checkpoint"] = checkpoint_path
+            Checkpoint.save(out["checkpoint"], out, 0, {})
+        return out
+
+    @staticmethod
+    def model_hash(ocp):
+        """
+        :param ocp: The OptimalControlProgram
+        :return: The hash of the model files of all the phases (string)
+        """
+        model_hash = hashlib.sha1()
+        for model_path in ocp.original_values["biorbd_model"]:
+            if os.path.isfile(model_path):
+                with open(model_path, "rb") as file:
+                    model_hash.update(file.read())
+            else:
+                model_hash.update(model_path.encode())
+        return model_hash.hexdigest()
+
+    @staticmethod
+    def features(ocp):
+        """
+        :param ocp: The OptimalControlProgram
+        :return: The duration of each phase followed by the mean and the standard deviation of the targets of each
+        objective which has a target (numpy array)
+        """
+        features = [float(phase_time) for phase_time in np.array(ocp.original_values["phase_time"]).reshape(-1)]
+        all_j_nodes = [j_nodes for nlp in ocp.nlp for j_nodes in nlp.J] + list(ocp.J)
+        for j_nodes in all_j_nodes:
+            targets = [np.array(j["target"], dtype=float).reshape(-1) for j in j_nodes if j["target"] is not None]
+            if targets:
+                targets = np.concatenate(targets)
+                features += [np.nanmean(targets), np.nanstd(targets)]
+        return np.array(features)
+
+    @staticmethod
+    def layout(ocp):
+        """
+        :param ocp: The OptimalControlProgram
+        :return: The size of the parameters and, for each phase, the number of states, of controls, of shooting
+        points and its control type, and the number of constraints (dictionary)
+        """
+        n_g = sum([g["val"].numel() for g_entry in ocp.g for g in g_entry if g])
+        n_g += sum([g["val"].numel() for nlp in ocp.nlp for g_entry in nlp.g for g in g_entry if g])
+        return {
+            "params": [(key, ocp.param_to_optimize[key].size) for key in ocp.param_to_optimize],
+            "phases": [(nlp.nx, nlp.nu, nlp.ns, nlp.control_type.name) for nlp in ocp.nlp],
+            "n_g": n_g,
+        }
+
+    @staticmethod
+    def __is_interpolable(stored, layout):
+        """
+        If a stored solution can be interpolated on the nodes of a program (same parameters, same states and
+        controls in each phase)
+        """
+        if stored["params"] != layout["params"] or len(stored["phases"]) != len(layout["phases"]):
+            return False
+        for (nx, nu, _, control_type), (nx_new, nu_new, _, control_type_new) in zip(stored["phases"], layout["phases"]):
+            if nx != nx_new or nu != nu_new or control_type != control_type_new:
+                return False
+        return True
+
+    @staticmethod
+    def __split(v, layout):
+        """
+        Split a vector with the layout of V into its parameters and the states and controls of each phase
+        :param v: The vector (numpy array)
+        :param layout: The layout of the program (see layout)
+        :return: The parameters (dictionary), the states (nx x ns + 1) and the controls of each phase (lists)
+        """
+        params = {}
+        offset = 0
+        for key, size in layout["params"]:
+            params[key] = v[offset : offset + size, 0]
+            offset += size
+
+        all_x, all_u = [], []
+        for nx, nu, ns, control_type in layout["phases"]:
+            x, u = [], []
+            for k in range(ns + 1):
+                x.append(v[offset : offset + nx, 0])
+                offset += nx
+                if control_type != ControlType.CONSTANT.name or k != ns:
+                    u.append(v[offset : offset + nu, 0])
+                    offset += nu
+            all_x.append(np.array(x).T)
+            all_u.append(np.array(u).T)
+        return params, all_x, all_u
+
+    @staticmethod
+    def __interpolated_guess(values):
+        """
+        :param values: The values at each node of a phase (n x nb_nodes) (numpy array)
+        :return: The initial guess interpolating the values over the normalized duration of a phase (InitialGuess)
+        """
+        if values.shape[1] < 2:
+            return InitialGuess(values[:, 0], interpolation=InterpolationType.CONSTANT)
+        t = np.linspace(0, 1, values.shape[1])
+        return InitialGuess(values, t=t, interpolation=InterpolationType.SPLINE)
+
+    def __path(self, file_name):
+        return os.path.join(self.directory, file_name)
+
+    def __save_index(self):
+        """
+        Write the index next to its destination and rename it, so an existing index is never left half written
+        """
+        tmp_path = self.__path(f"{SolutionLibrary.index_file}.tmp")
+        with open(tmp_path, "wb") as file:
+            pickle.dump(self.index, file)
+        os.replace(tmp_path, self.__path(SolutionLibrary.index_file))
@@ -24,6 +24,7 @@ def prepare_ocp(
     weight=1,
     min_time=0,
     max_time=np.inf,
+    use_SX=False,
 ):
     # --- Options --- #
     biorbd_model = biorbd.Model(biorbd_model_path)
@@ -72,6 +73,7 @@ def prepare_ocp(
         u_bounds,
         objective_functions,
         ode_solver=ode_solver,
+        use_SX=use_SX,
     )
 
 
@@ -3,6 +3,7 @@ Test for file IO.
 It tests the results of an optimal control problem with acados regarding the proper functioning of :
 - the handling of mayer and lagrange obj
 """
+
 import importlib.util
 from pathlib import Path
 
@@ -15,6 +16,13 @@ import biorbd
 from bioptim import (
     Axe,
     Data,
+    OptimalControlProgram,
+    DynamicsList,
+    DynamicsFcn,
+    DynamicsFunctions,
+    BoundsList,
+    InitialGuessList,
+    InitialGuess,
     Solver,
     ObjectiveList,
     ObjectiveFcn,
@@ -24,6 +32,8 @@ from bioptim import (
     ConstraintList,
     ConstraintFcn,
     Node,
+    StateTransitionFcn,
+    StateTransitionList,
 )
 
 
@@ -46,8 +56,7 @@ def test_acados_no_obj(cost_type):
     sol = ocp.solve(solver=Solver.ACADOS, solver_options={"cost_type": cost_type})
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 @pytest.mark.parametrize("cost_type", ["LINEAR_LS", "NONLINEAR_LS"])
@@ -77,8 +86,7 @@ def test_acados_one_mayer(cost_type):
     np.testing.assert_almost_equal(q[0, -1], 1.0)
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 @pytest.mark.parametrize("cost_type", ["LINEAR_LS", "NONLINEAR_LS"])
@@ -111,8 +119,7 @@ def test_acados_several_mayer(cost_type):
     np.testing.assert_almost_equal(q[2, -1], 3.0)
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 @pytest.mark.parametrize("cost_type", ["LINEAR_LS", "NONLINEAR_LS"])
@@ -145,8 +152,7 @@ def test_acados_one_lagrange(cost_type):
     np.testing.assert_almost_equal(q[0, :], target[0, :].squeeze())
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 @pytest.mark.parametrize("cost_type", ["LINEAR_LS", "NONLINEAR_LS"])
@@ -180,8 +186,7 @@ def test_acados_one_lagrange_and_one_mayer(cost_type):
     np.testing.assert_almost_equal(q[0, :], target[0, :].squeeze())
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 @pytest.mark.parametrize("cost_type", ["LINEAR_LS", "NONLINEAR_LS"])
@@ -216,8 +221,7 @@ def test_acados_control_lagrange_and_state_mayer(cost_type):
     np.testing.assert_almost_equal(q[0, -1], target.squeeze())
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 @pytest.mark.parametrize("cost_type", ["LINEAR_LS", "NONLINEAR_LS"])
@@ -255,8 +259,7 @@ def test_acados_mhe(cost_type):
         np.testing.assert_almost_equal(q[0, :], target[0, i : i + nbs + 1].squeeze())
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 @pytest.mark.parametrize("cost_type", ["LINEAR_LS", "NONLINEAR_LS"])
@@ -287,8 +290,7 @@ def test_acados_options(cost_type):
     np.testing.assert_array_less(iter[2], iter[1])
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 def test_acados_fail_external():
@@ -428,8 +430,7 @@ def test_acados_one_parameter():
     np.testing.assert_almost_equal(gravity, np.array([[-8]]), decimal=6)
 
     # Clean test folder
-    os.remove(f"./acados_ocp.json")
-    shutil.rmtree(f"./c_generated_code/")
+    shutil.rmtree(f"./acados_cache/")
 
 
 def test_acados_one_end_constraints():
@@ -560,3 +561,301 @@ def test_acados_constraints_end_all():
     # initial and final controls
     np.testing.assert_almost_equal(tau[:, 0], np.array((0, 9.81, 2.27903226, 0)), decimal=6)
     np.testing.assert_almost_equal(tau[:, -1], np.array((0, 9.81, -2.27903226, 0)), decimal=6)
+
+
+def test_acados_code_generation_cache():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "cube",
+        str(PROJECT_FOLDER) + "/examples/acados/cube.py",
+    )
+    cube = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cube)
+
+    cache_dir = "./acados_cache_test/"
+    all_q = []
+    for _ in range(2):
+        ocp = cube.prepare_ocp(
+            biorbd_model_path=str(PROJECT_FOLDER) + "/examples/acados/cube.bioMod",
+            nbs=10,
+            tf=2,
+        )
+        objective_functions = ObjectiveList()
+        objective_functions.add(ObjectiveFcn.Mayer.MINIMIZE_STATE, index=[0], target=np.array([[1.0]]).T)
+        ocp.update_objectives(objective_functions)
+        sol = ocp.solve(solver=Solver.ACADOS, solver_options={"acados_cache_dir": cache_dir, "print_level": 0})
+        all_q.append(np.array(sol["qqdot"]))
+
+    # The second program reuses the code generated by the first one
+    problems = os.listdir(cache_dir)
+    assert len(problems) == 1
+    assert os.path.isfile(f"{cache_dir}/{problems[0]}/built")
+    assert ocp.solver.acados_model.name == f"model_{problems[0][:16]}"
+    np.testing.assert_almost_equal(all_q[0], all_q[1])
+
+    # Clean test folder
+    shutil.rmtree(cache_dir)
+
+
+def test_acados_rti():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "cube",
+        str(PROJECT_FOLDER) + "/examples/acados/cube.py",
+    )
+    cube = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cube)
+
+    ocp = cube.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/acados/cube.bioMod",
+        nbs=10,
+        tf=2,
+    )
+    objective_functions = ObjectiveList()
+    objective_functions.add(ObjectiveFcn.Mayer.MINIMIZE_STATE, index=[0], target=np.array([[1.0]]).T)
+    ocp.update_objectives(objective_functions)
+
+    with pytest.raises(RuntimeError, match="The program must be solved once with ACADOS before calling prepare"):
+        from bioptim.interfaces.acados_interface import AcadosInterface
+
+        AcadosInterface(ocp).prepare()
+
+    sol = ocp.solve(solver=Solver.ACADOS, solver_options={"nlp_solver_type": "SQP_RTI", "print_level": 0})
+    assert "time_preparation" not in sol
+
+    with pytest.raises(RuntimeError, match="prepare must be called before feedback"):
+        ocp.solver.feedback(np.zeros(ocp.nlp[0].nx))
+
+    x0 = np.array(sol["qqdot"])[:, 1]
+    for _ in range(5):
+        ocp.solver.prepare()
+        sol = ocp.solver.feedback(x0)
+
+        # The first node is the measured state
+        np.testing.assert_almost_equal(np.array(sol["qqdot"])[:, 0], x0)
+        assert sol["time_preparation"] > 0
+        assert sol["time_feedback"] > 0
+        x0 = np.array(sol["qqdot"])[:, 1]
+
+    # Clean test folder
+    shutil.rmtree(f"./acados_cache/")
+
+
+def test_acados_resolve_with_unchanged_values():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "cube",
+        str(PROJECT_FOLDER) + "/examples/acados/cube.py",
+    )
+    cube = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cube)
+
+    ocp = cube.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/acados/cube.bioMod",
+        nbs=10,
+        tf=2,
+    )
+    objective_functions = ObjectiveList()
+    objective_functions.add(ObjectiveFcn.Mayer.MINIMIZE_STATE, index=[0], target=np.array([[1.0]]).T)
+    ocp.update_objectives(objective_functions)
+
+    sol = ocp.solve(solver=Solver.ACADOS, solver_options={"print_level": 0})
+    x_first = np.array(sol["x"])
+    assert ("constraints", 0, "lbx") in ocp.solver.last_sent
+    assert ("cost", 10, "yref") in ocp.solver.last_sent
+
+    x_init_values = ocp.solver.x_init_values
+    assert not ocp.solver.outdated
+
+    # Values that did not change are neither computed nor sent again, but the solution is the same
+    sol = ocp.solve(solver=Solver.ACADOS, solver_options={"print_level": 0})
+    np.testing.assert_almost_equal(np.array(sol["x"]), x_first)
+    np.testing.assert_equal(np.array(sol["x"]).shape, (ocp.V.shape[0], 1))
+    assert ocp.solver.x_init_values is x_init_values
+
+    # Modifying the objectives only updates the costs
+    objective_functions = ObjectiveList()
+    objective_functions.add(ObjectiveFcn.Mayer.MINIMIZE_STATE, index=[0], target=np.array([[2.0]]).T)
+    ocp.update_objectives(objective_functions)
+    assert ocp.solver.outdated == {"costs"}
+    ocp.solve(solver=Solver.ACADOS, solver_options={"print_level": 0})
+    np.testing.assert_almost_equal(ocp.solver.last_sent[("cost", 10, "yref")], np.array([2.0]))
+    assert ocp.solver.x_init_values is x_init_values
+
+    # And modifying the initial guess computes it again
+    ocp.update_initial_guess(InitialGuess([0.1] * ocp.nlp[0].nx), InitialGuess([0] * ocp.nlp[0].nu))
+    assert ocp.solver.outdated == {"initial_guess"}
+    ocp.solve(solver=Solver.ACADOS, solver_options={"print_level": 0})
+    np.testing.assert_almost_equal(ocp.solver.x_init_values, 0.1 * np.ones(x_init_values.shape))
+
+    # Clean test folder
+    shutil.rmtree(f"./acados_cache/")
+
+
+def damped_dynamics(states, controls, parameters, nlp):
+    q, qdot, tau = DynamicsFunctions.dispatch_q_qdot_tau_data(states, controls, nlp)
+    qddot = nlp.model.ForwardDynamics(q, qdot, tau - qdot).to_mx()
+    return qdot, qddot
+
+
+def prepare_multiphase_ocp(state_transitions=None, second_phase_dynamics=None):
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    biorbd_model = (
+        biorbd.Model(str(PROJECT_FOLDER) + "/examples/acados/cube.bioMod"),
+        biorbd.Model(str(PROJECT_FOLDER) + "/examples/acados/cube.bioMod"),
+    )
+    n_q = biorbd_model[0].nbQ()
+    n_tau = biorbd_model[0].nbGeneralizedTorque()
+
+    dynamics = DynamicsList()
+    dynamics.add(DynamicsFcn.TORQUE_DRIVEN)
+    dynamics.add(DynamicsFcn.TORQUE_DRIVEN, dynamic_function=second_phase_dynamics)
+
+    objective_functions = ObjectiveList()
+    objective_functions.add(ObjectiveFcn.Lagrange.MINIMIZE_TORQUE, weight=100, phase=0)
+    objective_functions.add(ObjectiveFcn.Lagrange.MINIMIZE_TORQUE, weight=100, phase=1)
+
+    constraints = ConstraintList()
+    constraints.add(ConstraintFcn.ALIGN_MARKERS, node=Node.END, first_marker_idx=0, second_marker_idx=2, phase=0)
+
+    x_bounds = BoundsList()
+    x_bounds.add(bounds=QAndQDotBounds(biorbd_model[0]))
+    x_bounds.add(bounds=QAndQDotBounds(biorbd_model[0]))
+    x_bounds[0][:, 0] = 0
+    x_bounds[1][:, -1] = 0
+
+    x_init = InitialGuessList()
+    x_init.add([0] * (2 * n_q))
+    x_init.add([0] * (2 * n_q))
+    u_bounds = BoundsList()
+    u_bounds.add([-100] * n_tau, [100] * n_tau)
+    u_bounds.add([-100] * n_tau, [100] * n_tau)
+    u_init = InitialGuessList()
+    u_init.add([0] * n_tau)
+    u_init.add([0] * n_tau)
+
+    # The phases have different time steps (0.2 s and 0.4 s)
+    return OptimalControlProgram(
+        biorbd_model,
+        dynamics,
+        (10, 5),
+        (2, 2),
+        x_init,
+        u_init,
+        x_bounds,
+        u_bounds,
+        objective_functions,
+        constraints,
+        state_transitions=state_transitions,
+        use_SX=True,
+    )
+
+
+@pytest.mark.parametrize("transition", [StateTransitionFcn.CONTINUOUS, StateTransitionFcn.IMPACT])
+def test_acados_multiphase(transition):
+    def prepare_ocp():
+        # The cube has no contact, so the impact must leave the velocities unchanged
+        state_transitions = StateTransitionList()
+        state_transitions.add(transition, phase_pre_idx=0)
+        return prepare_multiphase_ocp(state_transitions)
+
+    ocp = prepare_ocp()
+    n_q = ocp.nlp[0].model.nbQ()
+    sol = ocp.solve(solver=Solver.ACADOS, solver_options={"print_level": 0})
+    np.testing.assert_equal(np.array(sol["x"]).shape, (ocp.V.shape[0], 1))
+
+    # The phases are chained in a single horizon
+    states, controls = Data.get_data(ocp, sol["x"])
+    q = states["q"]
+    np.testing.assert_almost_equal(q[0][:, 0], np.zeros(n_q))
+    np.testing.assert_almost_equal(q[0][:, -1], np.array((2, 0, 0)), decimal=6)
+    np.testing.assert_almost_equal(q[1][:, 0], q[0][:, -1])
+    np.testing.assert_almost_equal(q[1][:, -1], np.zeros(n_q), decimal=6)
+
+    # Each phase is integrated and weighted with its own time step, as with Ipopt
+    ocp_ipopt = prepare_ocp()
+    sol_ipopt = ocp_ipopt.solve()
+    states_ipopt, controls_ipopt = Data.get_data(ocp_ipopt, sol_ipopt["x"])
+    for phase in range(2):
+        np.testing.assert_almost_equal(states["q"][phase], states_ipopt["q"][phase], decimal=4)
+        np.testing.assert_almost_equal(states["q_dot"][phase], states_ipopt["q_dot"][phase], decimal=4)
+        np.testing.assert_almost_equal(controls["tau"][phase], controls_ipopt["tau"][phase], decimal=3)
+
+    # Clean test folder
+    shutil.rmtree(f"./acados_cache/")
+
+
+def test_acados_multiphase_different_dynamics():
+    # Phases with different dynamics are all evaluated at every stage, which must be requested explicitly
+    ocp = prepare_multiphase_ocp(second_phase_dynamics=damped_dynamics)
+    with pytest.raises(NotImplementedError, match="stacked_phase_dynamics"):
+        ocp.solve(solver=Solver.ACADOS, solver_options={"print_level": 0})
+
+    ocp = prepare_multiphase_ocp(second_phase_dynamics=damped_dynamics)
+    sol = ocp.solve(solver=Solver.ACADOS, solver_options={"print_level": 0, "stacked_phase_dynamics": True})
+    states, controls = Data.get_data(ocp, sol["x"])
+
+    ocp_ipopt = prepare_multiphase_ocp(second_phase_dynamics=damped_dynamics)
+    sol_ipopt = ocp_ipopt.solve()
+    states_ipopt, controls_ipopt = Data.get_data(ocp_ipopt, sol_ipopt["x"])
+    for phase in range(2):
+        np.testing.assert_almost_equal(states["q"][phase], states_ipopt["q"][phase], decimal=4)
+        np.testing.assert_almost_equal(controls["tau"][phase], controls_ipopt["tau"][phase], decimal=3)
+
+    # Clean test folder
+    shutil.rmtree(f"./acados_cache/")
+
+
+def test_acados_min_time_mayer():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum_min_time_Mayer",
+        str(PROJECT_FOLDER) + "/examples/optimal_time_ocp/pendulum_min_time_Mayer.py",
+    )
+    pendulum_min_time_Mayer = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum_min_time_Mayer)
+
+    ocp = pendulum_min_time_Mayer.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/optimal_time_ocp/pendulum.bioMod",
+        final_time=2,
+        number_shooting_points=10,
+        max_time=5,
+        use_SX=True,
+    )
+    sol = ocp.solve(solver=Solver.ACADOS, solver_options={"print_level": 0})
+    np.testing.assert_equal(np.array(sol["x"]).shape, (ocp.V.shape[0], 1))
+
+    # Check some of the results
+    states, controls, param = Data.get_data(ocp, sol["x"], get_parameters=True)
+    q, qdot, tau = states["q"], states["q_dot"], controls["tau"]
+    tf = param["time"][0, 0]
+
+    # initial and final position
+    np.testing.assert_almost_equal(q[:, 0], np.array((0, 0)), decimal=6)
+    np.testing.assert_almost_equal(q[:, -1], np.array((0, 3.14)), decimal=6)
+
+    # The duration is optimized and the bounds of the controls are respected
+    assert 0 < tf < 2
+    assert np.all(np.abs(tau) <= 100 + 1e-6)
+
+    # Clean test folder
+    shutil.rmtree(f"./acados_cache/")
+
+
+def test_acados_min_time_infinite_bound():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum_min_time_Mayer",
+        str(PROJECT_FOLDER) + "/examples/optimal_time_ocp/pendulum_min_time_Mayer.py",
+    )
+    pendulum_min_time_Mayer = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum_min_time_Mayer)
+
+    ocp = pendulum_min_time_Mayer.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/optimal_time_ocp/pendulum.bioMod",
+        final_time=2,
+        number_shooting_points=10,
+        use_SX=True,
+    )
+    with pytest.raises(NotImplementedError, match="The bounds of the parameters"):
+        ocp.solve(solver=Solver.ACADOS)
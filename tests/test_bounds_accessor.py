@@ -2,6 +2,7 @@ import numpy as np
 
 from bioptim import (
     Bounds,
+    InitialGuess,
     InterpolationType,
 )
 
@@ -44,3 +45,22 @@ def test_accessors_on_bounds_option_multidimensional():
         x_bounds.max[:],
         np.array([[0, 150, 200], [0, 10, 10], [0, 10, 10], [100, 10, 10], [100, 10, 10], [100, 150, 200]]),
     )
+
+
+def test_concatenate_many_blocks():
+    bounds = Bounds(interpolation=InterpolationType.CONSTANT)
+    bounds.concatenate(
+        Bounds([-1, -2], [1, 2], interpolation=InterpolationType.CONSTANT),
+        Bounds([-3], [3], interpolation=InterpolationType.CONSTANT),
+    )
+    bounds.concatenate(Bounds([-4], [4], interpolation=InterpolationType.CONSTANT))
+    np.testing.assert_almost_equal(bounds.min, np.array([[-1], [-2], [-3], [-4]]))
+    np.testing.assert_almost_equal(bounds.max, np.array([[1], [2], [3], [4]]))
+    assert bounds.type == InterpolationType.CONSTANT
+
+    init = InitialGuess(interpolation=InterpolationType.CONSTANT)
+    init.concatenate(
+        InitialGuess([1, 2], interpolation=InterpolationType.CONSTANT),
+        InitialGuess([3], interpolation=InterpolationType.CONSTANT),
+    )
+    np.testing.assert_almost_equal(init.init, np.array([[1], [2], [3]]))
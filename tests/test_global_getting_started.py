@@ -8,12 +8,12 @@ from pathlib import Path
 import pytest
 import numpy as np
 
-from bioptim import Data, InterpolationType, OdeSolver
+from bioptim import Data, InterpolationType, OdeSolver, Objective, ObjectiveFcn, Constraint, ConstraintFcn, Node
 from .utils import TestUtils
 
 
 @pytest.mark.parametrize("nb_threads", [1, 2])
-@pytest.mark.parametrize("use_SX", [False, True])
+@pytest.mark.parametrize("use_SX", [False, True, "auto"])
 @pytest.mark.parametrize("ode_solver", [OdeSolver.RK, OdeSolver.IRK])
 def test_pendulum(nb_threads, use_SX, ode_solver):
     # Load pendulum
@@ -25,58 +25,49 @@ def test_pendulum(nb_threads, use_SX, ode_solver):
     spec.loader.exec_module(pendulum)
 
     if ode_solver == OdeSolver.IRK:
-        if use_SX:
-            with pytest.raises(NotImplementedError, match="use_SX and OdeSolver.IRK are not yet compatible"):
-                pendulum.prepare_ocp(
-                    biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
-                    final_time=2,
-                    number_shooting_points=10,
-                    nb_threads=nb_threads,
-                    use_SX=use_SX,
-                    ode_solver=ode_solver,
-                )
-        else:
-            ocp = pendulum.prepare_ocp(
-                biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
-                final_time=2,
-                number_shooting_points=10,
-                nb_threads=nb_threads,
-                use_SX=use_SX,
-                ode_solver=ode_solver,
-            )
-            sol = ocp.solve()
-
-            # Check objective function value
-            f = np.array(sol["f"])
-            np.testing.assert_equal(f.shape, (1, 1))
-            np.testing.assert_almost_equal(f[0, 0], 6644.75968052)
-
-            # Check constraints
-            g = np.array(sol["g"])
-            np.testing.assert_equal(g.shape, (40, 1))
-            np.testing.assert_almost_equal(g, np.zeros((40, 1)))
-
-            # Check some of the results
-            states, controls = Data.get_data(ocp, sol["x"])
-            q, qdot, tau = states["q"], states["q_dot"], controls["tau"]
-
-            # initial and final position
-            np.testing.assert_almost_equal(q[:, 0], np.array((0, 0)))
-            np.testing.assert_almost_equal(q[:, -1], np.array((0, 3.14)))
-
-            # initial and final velocities
-            np.testing.assert_almost_equal(qdot[:, 0], np.array((0, 0)))
-            np.testing.assert_almost_equal(qdot[:, -1], np.array((0, 0)))
-
-            # initial and final controls
-            np.testing.assert_almost_equal(tau[:, 0], np.array((16.23831574, 0)))
-            np.testing.assert_almost_equal(tau[:, -1], np.array((-25.59884582, 0)))
-
-            # save and load
-            TestUtils.save_and_load(sol, ocp, True)
+        ocp = pendulum.prepare_ocp(
+            biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
+            final_time=2,
+            number_shooting_points=10,
+            nb_threads=nb_threads,
+            use_SX=use_SX,
+            ode_solver=ode_solver,
+        )
+        sol = ocp.solve()
+        if use_SX == "auto":
+            np.testing.assert_equal(ocp.cx_decisions[0]["kernels"], "MX")
+
+        # Check objective function value
+        f = np.array(sol["f"])
+        np.testing.assert_equal(f.shape, (1, 1))
+        np.testing.assert_almost_equal(f[0, 0], 6644.75968052)
+
+        # Check constraints
+        g = np.array(sol["g"])
+        np.testing.assert_equal(g.shape, (40, 1))
+        np.testing.assert_almost_equal(g, np.zeros((40, 1)))
+
+        # Check some of the results
+        states, controls = Data.get_data(ocp, sol["x"])
+        q, qdot, tau = states["q"], states["q_dot"], controls["tau"]
+
+        # initial and final position
+        np.testing.assert_almost_equal(q[:, 0], np.array((0, 0)))
+        np.testing.assert_almost_equal(q[:, -1], np.array((0, 3.14)))
+
+        # initial and final velocities
+        np.testing.assert_almost_equal(qdot[:, 0], np.array((0, 0)))
+        np.testing.assert_almost_equal(qdot[:, -1], np.array((0, 0)))
+
+        # initial and final controls
+        np.testing.assert_almost_equal(tau[:, 0], np.array((16.23831574, 0)))
+        np.testing.assert_almost_equal(tau[:, -1], np.array((-25.59884582, 0)))
 
-            # simulate
-            TestUtils.simulate(sol, ocp)
+        # save and load
+        TestUtils.save_and_load(sol, ocp, True)
+
+        # simulate
+        TestUtils.simulate(sol, ocp)
     else:
         ocp = pendulum.prepare_ocp(
             biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
@@ -87,6 +78,9 @@ def test_pendulum(nb_threads, use_SX, ode_solver):
             ode_solver=ode_solver,
         )
         sol = ocp.solve()
+        if use_SX == "auto":
+            np.testing.assert_equal(ocp.cx_decisions[0]["kernels"], "SX")
+            np.testing.assert_equal(ocp.cx_decisions[0]["map"], True)
 
         # Check objective function value
         f = np.array(sol["f"])
@@ -121,6 +115,142 @@ def test_pendulum(nb_threads, use_SX, ode_solver):
         TestUtils.simulate(sol, ocp)
 
 
+def test_pendulum_warm_start():
+    # Load pendulum
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum", str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.py"
+    )
+    pendulum = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum)
+
+    ocp = pendulum.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
+        final_time=2,
+        number_shooting_points=10,
+        nb_threads=1,
+    )
+    sol_cold = ocp.solve()
+
+    # Starting from the solution, the solver converges right away to the same point
+    sol = ocp.solve(warm_start=True)
+    assert sol["solver_stats"]["iter_count"] < sol_cold["solver_stats"]["iter_count"]
+    np.testing.assert_almost_equal(np.array(sol["f"]), np.array(sol_cold["f"]), decimal=5)
+    np.testing.assert_almost_equal(np.array(sol["x"]), np.array(sol_cold["x"]), decimal=5)
+
+    # A shifted start is still a valid initial guess
+    sol = ocp.solve(warm_start=True, warm_start_shift=1)
+    np.testing.assert_almost_equal(np.array(sol["f"]), np.array(sol_cold["f"]), decimal=5)
+
+    # Without warm start, the solve starts back from the initial guess
+    sol = ocp.solve()
+    np.testing.assert_equal(sol["solver_stats"]["iter_count"], sol_cold["solver_stats"]["iter_count"])
+
+    # When the size of the problem changed, the solve starts cold, without the warm start options of Ipopt
+    ocp.update_constraints(Constraint(ConstraintFcn.TRACK_STATE, node=Node.MID, index=[0]))
+    sol = ocp.solve(warm_start=True)
+    sol_cold = ocp.solve()
+    np.testing.assert_equal(sol["solver_stats"]["iter_count"], sol_cold["solver_stats"]["iter_count"])
+    np.testing.assert_almost_equal(np.array(sol["x"]), np.array(sol_cold["x"]))
+
+
+def test_pendulum_gauss_newton():
+    # Load pendulum
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum", str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.py"
+    )
+    pendulum = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum)
+
+    ocp = pendulum.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
+        final_time=2,
+        number_shooting_points=10,
+        nb_threads=1,
+    )
+    sol_exact = ocp.solve()
+    sol = ocp.solve(solver_options={"hessian_approximation": "gauss-newton"})
+
+    # The objective is a least-squares, so both Hessians lead to the same optimum
+    np.testing.assert_equal(sol["status"], 0)
+    np.testing.assert_almost_equal(np.array(sol["f"]), np.array(sol_exact["f"]), decimal=5)
+    np.testing.assert_almost_equal(np.array(sol["x"]), np.array(sol_exact["x"]), decimal=4)
+
+    # The occluded (nan) samples of a target are ignored by both the objective and its Gauss-Newton Hessian
+    target = np.linspace(0, 3.14, 11)[np.newaxis, :]
+    target[0, 3] = np.nan
+    ocp.update_objectives(
+        Objective(ObjectiveFcn.Lagrange.TRACK_STATE, weight=10, index=[1], target=target, list_index=1)
+    )
+    sol_exact = ocp.solve()
+    sol = ocp.solve(solver_options={"hessian_approximation": "gauss-newton"})
+    np.testing.assert_equal(sol["status"], 0)
+    np.testing.assert_almost_equal(np.array(sol["f"]), np.array(sol_exact["f"]), decimal=5)
+    np.testing.assert_almost_equal(np.array(sol["x"]), np.array(sol_exact["x"]), decimal=4)
+    assert np.isnan(ocp.nlp[0].J[1][3]["target"]).all()
+
+
+def test_pendulum_objective_values():
+    # Load pendulum
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum", str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.py"
+    )
+    pendulum = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum)
+
+    ocp = pendulum.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
+        final_time=2,
+        number_shooting_points=10,
+        nb_threads=1,
+    )
+    # Objectives declared on the last node (ns), by its index and over all the nodes
+    ocp.update_objectives(Objective(ObjectiveFcn.Mayer.MINIMIZE_STATE, node=10, index=[1], weight=2, list_index=1))
+    ocp.update_objectives(Objective(ObjectiveFcn.Lagrange.MINIMIZE_STATE, index=[0], list_index=2))
+    sol, obj = ocp.solve(return_objectives=True)
+    states, _ = Data.get_data(ocp, sol["x"])
+
+    np.testing.assert_equal(len(obj), 1)
+    np.testing.assert_equal(obj[0].shape, (3, 11))
+    assert np.isnan(obj[0][1, :10]).all()
+    np.testing.assert_almost_equal(obj[0][1, 10], 2 * states["q"][1, -1] ** 2)
+    assert not np.isnan(obj[0][2, :]).any()
+    np.testing.assert_almost_equal(np.nansum(obj[0]), np.array(sol["f"])[0, 0])
+
+
+def test_pendulum_auto_scaling():
+    # Load pendulum
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum", str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.py"
+    )
+    pendulum = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum)
+
+    ocp = pendulum.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
+        final_time=2,
+        number_shooting_points=10,
+        nb_threads=1,
+    )
+    sol_unscaled = ocp.solve()
+    sol = ocp.solve(solver_options={"auto_scaling": True})
+
+    # The solution is returned in the units of the problem
+    np.testing.assert_equal(sol["status"], 0)
+    np.testing.assert_equal(sol["scaling"]["x"].shape, (ocp.V.shape[0], 1))
+    np.testing.assert_equal(sol["scaling"]["g"].shape, (40, 1))
+    np.testing.assert_almost_equal(np.array(sol["f"]), np.array(sol_unscaled["f"]), decimal=5)
+    np.testing.assert_almost_equal(np.array(sol["g"]), np.zeros((40, 1)))
+
+    states, controls = Data.get_data(ocp, sol["x"])
+    states_unscaled, controls_unscaled = Data.get_data(ocp, sol_unscaled["x"])
+    np.testing.assert_almost_equal(states["q"], states_unscaled["q"], decimal=4)
+    np.testing.assert_almost_equal(controls["tau"], controls_unscaled["tau"], decimal=3)
+
+
 @pytest.mark.parametrize("ode_solver", [OdeSolver.RK, OdeSolver.IRK])
 def test_custom_constraint_align_markers(ode_solver):
     PROJECT_FOLDER = Path(__file__).parent / ".."
@@ -8,7 +8,7 @@ import pytest
 import numpy as np
 import biorbd
 
-from bioptim import Data, OdeSolver, ConstraintList, ConstraintFcn, Node
+from bioptim import Data, OdeSolver, ConstraintList, ConstraintFcn, Node, ObjectivePrinter
 from .utils import TestUtils
 
 
@@ -255,6 +255,7 @@ def test_multiphase_align_markers(ode_solver):
                     975.08076936,
                     978.6988371,
                     982.76916331,
+                    np.nan,
                 ]
             ]
         ),
@@ -294,6 +295,7 @@ def test_multiphase_align_markers(ode_solver):
                     1604.6031506,
                     1604.71433086,
                     1604.83406345,
+                    np.nan,
                 ]
             ]
         ),
@@ -323,11 +325,21 @@ def test_multiphase_align_markers(ode_solver):
                     1930.23109111,
                     1931.79812149,
                     1933.56103067,
+                    np.nan,
                 ]
             ]
         ),
     )
 
+    # The objective values are computed by a single function cached on the ocp
+    func = ocp.objective_values_func
+    assert func is not None
+    np.testing.assert_almost_equal(sum([np.nansum(o) for o in obj]), np.array(sol["f"])[0, 0])
+    printer = ObjectivePrinter(ocp, sol)
+    assert ocp.objective_values_func is func
+    for o_printer, o in zip(printer.sol_obj, obj):
+        np.testing.assert_almost_equal(o_printer, o)
+
     # Check objective function value
     f = np.array(sol["f"])
     np.testing.assert_equal(f.shape, (1, 1))
@@ -436,6 +448,45 @@ def test_external_forces(ode_solver):
     TestUtils.simulate(sol, ocp)
 
 
+def test_update_external_forces():
+    # Load external_forces
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "external_forces", str(PROJECT_FOLDER) + "/examples/torque_driven_ocp/external_forces.py"
+    )
+    external_forces = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(external_forces)
+
+    ocp = external_forces.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/torque_driven_ocp/cube_with_forces.bioMod",
+    )
+    nlp = ocp.nlp[0]
+    ns = nlp.ns
+
+    # A single integrator serves all the nodes, the forces being one of its inputs
+    np.testing.assert_equal(nlp.external_forces.shape, (12, ns))
+    assert all([dynamics is nlp.dynamics[0] for dynamics in nlp.dynamics])
+    assert "f_ext" in nlp.dynamics[0].name_in()
+
+    # Updating the forces does not rebuild the program
+    V = ocp.V
+    f_ext = np.repeat(np.array([[0, 0, 0, 0, 0, -2], [0, 0, 0, 0, 0, 5]]).T[:, :, np.newaxis], ns, axis=2)
+    ocp.update_external_forces([f_ext])
+    assert ocp.V is V
+    sol = ocp.solve()
+    np.testing.assert_almost_equal(np.array(sol["f"])[0, 0], 9875.88768746912)
+
+    ocp.update_external_forces([np.zeros((6, 2, ns))])
+    np.testing.assert_almost_equal(nlp.external_forces, np.zeros((12, ns)))
+    sol = ocp.solve()
+    g = np.array(sol["g"])
+    np.testing.assert_almost_equal(g, np.zeros((246, 1)))
+    assert np.array(sol["f"])[0, 0] != pytest.approx(9875.88768746912)
+
+    with pytest.raises(RuntimeError, match="external_forces of phase 0 should be a matrix of dimension"):
+        ocp.update_external_forces([np.zeros((6, 1, ns))])
+
+
 @pytest.mark.parametrize("ode_solver", [OdeSolver.RK, OdeSolver.IRK])
 def test_track_marker_2D_pendulum(ode_solver):
     # Load muscle_activations_contact_tracker
@@ -0,0 +1,116 @@
+from pathlib import Path
+
+import pytest
+import numpy as np
+import biorbd
+
+from bioptim import (
+    OptimalControlProgram,
+    DynamicsList,
+    DynamicsFcn,
+    Bounds,
+    QAndQDotBounds,
+    InitialGuess,
+    Objective,
+    ObjectiveFcn,
+    OdeSolver,
+    Data,
+)
+from .utils import TestUtils
+
+
+def prepare_pendulum(dynamics_fcn, ode_solver=OdeSolver.RK):
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    biorbd_model = biorbd.Model(str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod")
+    n_q = biorbd_model.nbQ()
+    n_tau = biorbd_model.nbGeneralizedTorque()
+
+    dynamics = DynamicsList()
+    dynamics.add(dynamics_fcn)
+
+    x_bounds = QAndQDotBounds(biorbd_model)
+    x_bounds[:, [0, -1]] = 0
+    x_bounds[1, -1] = 3.14
+
+    if dynamics_fcn == DynamicsFcn.TORQUE_DRIVEN_IMPLICIT:
+        n_u = n_tau + n_q
+        u_bounds = Bounds([-100] * n_tau + [-1000] * n_q, [100] * n_tau + [1000] * n_q)
+    else:
+        n_u = n_tau
+        u_bounds = Bounds([-100] * n_tau, [100] * n_tau)
+    u_bounds[n_tau - 1, :] = 0
+
+    return OptimalControlProgram(
+        biorbd_model,
+        dynamics,
+        10,
+        2,
+        InitialGuess([0] * 4),
+        InitialGuess([0] * n_u),
+        x_bounds,
+        u_bounds,
+        objective_functions=Objective(ObjectiveFcn.Lagrange.MINIMIZE_TORQUE),
+        ode_solver=ode_solver,
+    )
+
+
+@pytest.mark.parametrize("ode_solver", [OdeSolver.RK, OdeSolver.IRK])
+def test_pendulum_implicit(ode_solver):
+    ocp = prepare_pendulum(DynamicsFcn.TORQUE_DRIVEN_IMPLICIT, ode_solver)
+    sol = ocp.solve()
+
+    # Check constraints (continuity and inverse dynamics at each node with a control)
+    g = np.array(sol["g"])
+    np.testing.assert_equal(g.shape, (40 + 2 * 10, 1))
+    np.testing.assert_almost_equal(g, np.zeros((60, 1)))
+
+    # Check some of the results
+    states, controls = Data.get_data(ocp, sol["x"])
+    q, qdot, tau, qddot = states["q"], states["q_dot"], controls["tau"], controls["q_ddot"]
+    np.testing.assert_almost_equal(q[:, 0], np.array((0, 0)))
+    np.testing.assert_almost_equal(q[:, -1], np.array((0, 3.14)))
+    np.testing.assert_almost_equal(qdot[:, 0], np.array((0, 0)))
+    np.testing.assert_almost_equal(qdot[:, -1], np.array((0, 0)))
+
+    # The accelerations are the ones of the forward dynamics
+    model = ocp.nlp[0].model
+    for k in range(ocp.nlp[0].ns):
+        forward_qddot = model.ForwardDynamics(q[:, k], qdot[:, k], tau[:, k]).to_array()
+        np.testing.assert_almost_equal(qddot[:, k], forward_qddot)
+
+    # The implicit constraint is added by the program, so save and load must not duplicate it
+    TestUtils.save_and_load(sol, ocp, False)
+
+
+def test_muscle_activations_and_torque_driven_implicit():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    biorbd_model = biorbd.Model(str(PROJECT_FOLDER) + "/examples/muscle_driven_ocp/arm26.bioMod")
+    n_q = biorbd_model.nbQ()
+    n_tau = biorbd_model.nbGeneralizedTorque()
+    n_mus = biorbd_model.nbMuscles()
+    n_u = n_tau + n_mus + n_q
+
+    dynamics = DynamicsList()
+    dynamics.add(DynamicsFcn.MUSCLE_ACTIVATIONS_AND_TORQUE_DRIVEN_IMPLICIT)
+    ocp = OptimalControlProgram(
+        biorbd_model,
+        dynamics,
+        5,
+        0.5,
+        InitialGuess([0] * (2 * n_q)),
+        InitialGuess([0] * n_u),
+        QAndQDotBounds(biorbd_model),
+        Bounds([-100] * n_u, [100] * n_u),
+    )
+
+    nlp = ocp.nlp[0]
+    np.testing.assert_equal(nlp.nu, n_u)
+    assert list(nlp.var_controls.keys()) == ["tau", "muscles", "q_ddot"]
+    np.testing.assert_equal(nlp.implicit_dynamics_func.numel_out(), n_tau)
+
+    # At rest with no activation, the residual is the gravity
+    x = np.zeros((2 * n_q, 1))
+    u = np.zeros((n_u, 1))
+    residual = np.array(nlp.implicit_dynamics_func(x, u, []))
+    gravity = biorbd_model.InverseDynamics(np.zeros(n_q), np.zeros(n_q), np.zeros(n_q)).to_array()
+    np.testing.assert_almost_equal(residual[:, 0], gravity)
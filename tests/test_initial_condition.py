@@ -3,6 +3,8 @@ import importlib.util
 from pathlib import Path
 
 import numpy as np
+import biorbd
+from casadi import MX, Function, horzcat
 
 from bioptim import Data, InterpolationType, Simulate, InitialGuess
 
@@ -173,6 +175,34 @@ def test_initial_guess_custom():
         np.testing.assert_almost_equal(init.init.evaluate_at(i), expected_val)
 
 
+def test_initial_guess_from_markers():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    biorbd_model = biorbd.Model(str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod")
+    nb_shoot = 20
+    final_time = 2
+
+    q = MX.sym("q", biorbd_model.nbQ(), 1)
+    markers_func = Function("markers", [q], [horzcat(*[m.to_mx() for m in biorbd_model.markers(q)])])
+    q_ref = np.vstack((np.linspace(0, 1, nb_shoot + 1), np.linspace(0, 3, nb_shoot + 1)))
+    markers = np.stack([np.array(markers_func(q_ref[:, k])) for k in range(nb_shoot + 1)], axis=2)
+    # The rotation is not observed when the second marker is occluded, so it is taken from the previous frame
+    markers[:, 1, 5] = np.nan
+
+    init = InitialGuess.from_markers(biorbd_model, markers, final_time, nb_threads=2)
+    init.check_and_adjust_dimensions(2 * biorbd_model.nbQ(), nb_shoot)
+    np.testing.assert_equal(init.init.type, InterpolationType.EACH_FRAME)
+
+    expected_q = q_ref.copy()
+    expected_q[1, 5] = q_ref[1, 4]
+    expected_q_dot = np.gradient(expected_q, final_time / nb_shoot, axis=1)
+    for i in range(nb_shoot + 1):
+        expected_val = np.concatenate((expected_q[:, i], expected_q_dot[:, i]))
+        np.testing.assert_almost_equal(init.init.evaluate_at(i), expected_val)
+
+    with pytest.raises(RuntimeError, match="markers must have 2 markers, it has 1"):
+        InitialGuess.from_markers(biorbd_model, markers[:, :1, :], final_time)
+
+
 def test_simulate_from_initial_multiple_shoot():
     # Load pendulum
     PROJECT_FOLDER = Path(__file__).parent / ".."
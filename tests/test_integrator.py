@@ -0,0 +1,144 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+import numpy as np
+from casadi import MX, SX, Function, vertcat, sin
+
+from bioptim import Data, OdeSolver, ControlType
+from bioptim.interfaces.integrator import collocation_coefficients, butcher_tableaus, IRK
+
+
+@pytest.mark.parametrize("scheme", ["legendre", "radau"])
+@pytest.mark.parametrize("degree", [1, 2, 4])
+def test_collocation_coefficients(degree, scheme):
+    time_points, C, D = collocation_coefficients(degree, scheme)
+    np.testing.assert_equal(time_points.shape, (degree + 1,))
+    np.testing.assert_equal(C.shape, (degree + 1, degree + 1))
+    np.testing.assert_equal(D.shape, (degree + 1,))
+
+    # The Lagrange polynomials are a partition of unity
+    np.testing.assert_almost_equal(np.sum(D), 1)
+    np.testing.assert_almost_equal(np.sum(C, axis=0), np.zeros(degree + 1))
+    if scheme == "radau":
+        np.testing.assert_almost_equal(time_points[-1], 1)
+        np.testing.assert_almost_equal(D, np.append(np.zeros(degree), 1))
+
+    # The table is computed once
+    assert collocation_coefficients(degree, scheme)[1] is C
+
+
+def test_collocation_coefficients_wrong_scheme():
+    with pytest.raises(RuntimeError, match="scheme should be 'legendre' or 'radau'"):
+        collocation_coefficients(3, "chebyshev")
+
+
+def prepare_irk(CX, scheme, newton_iterations=5):
+    x = CX.sym("x", 2, 1)
+    u = CX.sym("u", 1, 1)
+    params = CX.sym("params", 0, 1)
+    pendulum = Function("pendulum", [x, u, params], [vertcat(x[1], -9.81 * sin(x[0]) + u)])
+    ode = {"x": x, "p": u, "ode": pendulum}
+    ode_opt = {
+        "t0": 0,
+        "tf": 0.2,
+        "CX": CX,
+        "param": params,
+        "control_type": ControlType.CONSTANT,
+        "irk_polynomial_interpolation_degree": 4,
+        "irk_collocation_scheme": scheme,
+        "irk_newton_iterations": newton_iterations,
+    }
+    return IRK(ode, ode_opt)
+
+
+@pytest.mark.parametrize("scheme", ["legendre", "radau"])
+def test_irk_sx_newton_iterations(scheme):
+    irk_sx = prepare_irk(SX, scheme)
+    irk_mx = prepare_irk(MX, scheme)
+    x0, u = np.array([0.5, -1]), np.array([2])
+
+    # The Newton iterations of the SX graph solve the collocation equations solved by the rootfinder in MX
+    out_sx = irk_sx(x0=x0, p=u, params=[])
+    out_mx = irk_mx(x0=x0, p=u, params=[])
+    assert "residual" not in out_mx
+    assert np.max(np.abs(np.array(out_sx["residual"]))) < 1e-10
+    np.testing.assert_almost_equal(np.array(out_sx["xf"]), np.array(out_mx["xf"]), decimal=10)
+
+    # And so do their derivatives
+    jac_sx = irk_sx.factory("jac_sx", ["x0", "p", "params"], ["jac:xf:x0", "jac:xf:p"])
+    jac_mx = irk_mx.factory("jac_mx", ["x0", "p", "params"], ["jac:xf:x0", "jac:xf:p"])
+    for d_sx, d_mx in zip(jac_sx(x0, u, []), jac_mx(x0, u, [])):
+        np.testing.assert_almost_equal(np.array(d_sx), np.array(d_mx), decimal=8)
+
+    # A single iteration is only an approximation
+    out_sx = prepare_irk(SX, scheme, newton_iterations=1)(x0=x0, p=u, params=[])
+    assert np.max(np.abs(np.array(out_sx["residual"]))) > 1e-10
+
+
+@pytest.mark.parametrize("ode_solver", [OdeSolver.RK1, OdeSolver.RK2, OdeSolver.RK4, OdeSolver.RK45, OdeSolver.RK8])
+def test_butcher_tableaus(ode_solver):
+    tableau = butcher_tableaus[ode_solver]
+    np.testing.assert_almost_equal(np.sum(tableau.b), 1)
+    for a, c in zip(tableau.a, tableau.c):
+        np.testing.assert_almost_equal(np.sum(a), c)
+    if tableau.b_hat is not None:
+        np.testing.assert_almost_equal(np.sum(tableau.b_hat), 1)
+
+
+@pytest.mark.parametrize("ode_solver", [OdeSolver.RK1, OdeSolver.RK2, OdeSolver.RK45, OdeSolver.RK8])
+def test_pendulum_explicit_rk(ode_solver):
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum", str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.py"
+    )
+    pendulum = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum)
+
+    ocp = pendulum.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
+        final_time=2,
+        number_shooting_points=10,
+        nb_threads=1,
+        ode_solver=ode_solver,
+    )
+    sol = ocp.solve()
+
+    # Check constraints
+    g = np.array(sol["g"])
+    np.testing.assert_equal(g.shape, (40, 1))
+    np.testing.assert_almost_equal(g, np.zeros((40, 1)))
+
+    # Check some of the results
+    states, controls = Data.get_data(ocp, sol["x"])
+    q, qdot = states["q"], states["q_dot"]
+    np.testing.assert_almost_equal(q[:, 0], np.array((0, 0)))
+    np.testing.assert_almost_equal(q[:, -1], np.array((0, 3.14)))
+    np.testing.assert_almost_equal(qdot[:, -1], np.array((0, 0)))
+
+    # The embedded methods give an error estimate of each interval
+    x = np.array(sol["x"])[:4]
+    u = np.array(sol["x"])[4:6]
+    out = ocp.nlp[0].dynamics[0](x0=x, p=u, params=[])
+    if butcher_tableaus[ode_solver].b_hat is None:
+        assert "xerr" not in out
+    else:
+        np.testing.assert_equal(np.array(out["xerr"]).shape, (4, 1))
+
+
+def test_pendulum_no_solver():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum", str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.py"
+    )
+    pendulum = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum)
+
+    with pytest.raises(NotImplementedError, match="Continuity constraints cannot be declared with OdeSolver.NO_SOLVER"):
+        pendulum.prepare_ocp(
+            biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
+            final_time=2,
+            number_shooting_points=10,
+            nb_threads=1,
+            ode_solver=OdeSolver.NO_SOLVER,
+        )
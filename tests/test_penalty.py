@@ -231,7 +231,7 @@ def test_penalty_minimize_markers_velocity(penalty_origin, value):
 
     if value == 0.1:
         np.testing.assert_almost_equal(
-            ocp.nlp[0].J[0][6]["val"],
+            ocp.nlp[0].J[0][0]["val"][:, 6],
             np.array(
                 [
                     [-0.00499167],
@@ -242,7 +242,7 @@ def test_penalty_minimize_markers_velocity(penalty_origin, value):
         )
     else:
         np.testing.assert_almost_equal(
-            ocp.nlp[0].J[0][6]["val"],
+            ocp.nlp[0].J[0][0]["val"][:, 6],
             np.array(
                 [
                     [2.7201056],
@@ -268,9 +268,9 @@ def test_penalty_track_markers_velocity(penalty_origin, value):
     penalty_type.value[0](penalty, ocp, ocp.nlp[0], [3], x, [], [])
 
     if isinstance(penalty_type, (ObjectiveFcn.Lagrange, ObjectiveFcn.Mayer)):
-        res = ocp.nlp[0].J[0][6]["val"]
+        res = ocp.nlp[0].J[0][0]["val"][:, 6]
     else:
-        res = ocp.nlp[0].g[0][6]["val"]
+        res = ocp.nlp[0].g[0][0]["val"][:, 6]
 
     if value == 0.1:
         np.testing.assert_almost_equal(
@@ -1053,3 +1053,55 @@ def test_penalty_track_markers_with_nan(penalty_origin, value):
         np.array(res),
         expected,
     )
+
+
+def test_penalty_kinematics_cache():
+    ocp = prepare_test_ocp()
+    nlp = ocp.nlp[0]
+    ocp.update_objectives(Objective(ObjectiveFcn.Lagrange.MINIMIZE_MARKERS, node=Node.ALL))
+    ocp.update_constraints(
+        Constraint(ConstraintFcn.ALIGN_MARKERS, node=Node.END, first_marker_idx=0, second_marker_idx=1)
+    )
+    ocp.update_objectives(Objective(ObjectiveFcn.Mayer.MINIMIZE_PREDICTED_COM_HEIGHT, node=Node.END))
+
+    # The kinematics is computed once per node and shared by all the penalties
+    np.testing.assert_equal(len(nlp.kinematics_cache), nlp.ns + 1)
+    assert "biorbd_kinematics" in nlp.casadi_func
+    kinematics = nlp.kinematics_cache[nlp.ns]
+
+    x = np.ones((12, 1)) * 0.1
+    markers = np.array(Function("markers", [nlp.X[nlp.ns]], [kinematics["markers"]])(x))
+    expected = np.array(nlp.casadi_func["biorbd_kinematics"](q=x[:6], q_dot=x[6:])["markers"])
+    np.testing.assert_almost_equal(markers, expected)
+    np.testing.assert_almost_equal(markers[:, 0], np.array([0.1, 0, 0.1]))
+
+
+def test_penalty_minimize_markers_velocity_all_nodes():
+    ocp = prepare_test_ocp()
+    nlp = ocp.nlp[0]
+    x = [DM.ones((12, 1)) * 0.1, DM.ones((12, 1)) * -10]
+    penalty_type = ObjectiveFcn.Lagrange.MINIMIZE_MARKERS_VELOCITY
+    penalty = Objective(penalty_type, index=[2, 6])
+    penalty_type.value[0](penalty, ocp, nlp, [], x, [], [])
+
+    # A single entry per node with the velocity of all the requested markers
+    np.testing.assert_equal(len(nlp.J[0]), 2)
+    np.testing.assert_equal(nlp.J[0][0]["val"].shape, (3, 2))
+    assert "biorbd_markers_velocity" in nlp.casadi_func
+    np.testing.assert_almost_equal(nlp.J[0][0]["val"][:, 1], np.array([[-0.00499167], [0], [-0.0497502]]))
+    np.testing.assert_almost_equal(nlp.J[0][1]["val"][:, 1], np.array([[2.7201056], [0], [-4.1953576]]))
+
+
+def test_constraint_bounds_of_each_row():
+    ocp = prepare_test_ocp()
+    u = [DM.ones((12, 1))]
+    penalty_type = ConstraintFcn.TRACK_TORQUE
+    penalty = Constraint(penalty_type, min_bound=np.array([-1, -2, -3, -4]), max_bound=2)
+    penalty_type.value[0](penalty, ocp, ocp.nlp[0], [], [], u, [])
+
+    np.testing.assert_almost_equal(ocp.nlp[0].g[0][0]["bounds"].min, np.array([[-1, -2, -3, -4]]).T)
+    np.testing.assert_almost_equal(ocp.nlp[0].g[0][0]["bounds"].max, np.array([[2, 2, 2, 2]]).T)
+
+    penalty = Constraint(penalty_type, min_bound=np.array([-1, -2]))
+    with pytest.raises(RuntimeError, match="The bounds of the constraint should have 4 rows, got 2"):
+        penalty_type.value[0](penalty, ocp, ocp.nlp[0], [], [], u, [])
@@ -0,0 +1,103 @@
+from pathlib import Path
+
+import pytest
+import numpy as np
+import biorbd
+
+from bioptim import (
+    OptimalControlProgram,
+    DynamicsList,
+    DynamicsFcn,
+    Bounds,
+    QAndQDotBounds,
+    InitialGuess,
+    Objective,
+    ObjectiveFcn,
+)
+
+
+def prepare_pendulum(profile_build=False):
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    biorbd_model = biorbd.Model(str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod")
+    n_tau = biorbd_model.nbGeneralizedTorque()
+
+    dynamics = DynamicsList()
+    dynamics.add(DynamicsFcn.TORQUE_DRIVEN)
+
+    x_bounds = QAndQDotBounds(biorbd_model)
+    x_bounds[:, [0, -1]] = 0
+    x_bounds[1, -1] = 3.14
+    u_bounds = Bounds([-100] * n_tau, [100] * n_tau)
+    u_bounds[n_tau - 1, :] = 0
+
+    return OptimalControlProgram(
+        biorbd_model,
+        dynamics,
+        10,
+        2,
+        InitialGuess([0] * 4),
+        InitialGuess([0] * n_tau),
+        x_bounds,
+        u_bounds,
+        objective_functions=Objective(ObjectiveFcn.Lagrange.MINIMIZE_TORQUE),
+        profile_build=profile_build,
+    )
+
+
+def test_build_report():
+    ocp = prepare_pendulum(profile_build=True)
+    report = ocp.build_report()
+
+    names = [block["name"] for block in report["blocks"]]
+    assert names[:3] == ["prepare_dynamics", "define_multiple_shooting_nodes", "continuity"]
+    assert "define_bounds" in names
+    assert "define_initial_guess" in names
+    assert "objective_functions[MINIMIZE_TORQUE]" in report["summary"]
+
+    np.testing.assert_equal(report["V_size"], 4 * 11 + 2 * 10)
+    np.testing.assert_equal(report["g_size"], 4 * 10)
+    continuity = report["blocks"][2]
+    np.testing.assert_equal(continuity["g_added"], 4 * 10)
+    assert continuity["nodes"] > 0
+    assert all([block["depth"] == 0 for block in report["blocks"]])
+    np.testing.assert_almost_equal(report["total_time"], sum([block["time"] for block in report["blocks"]]))
+
+    # A nested block is part of the time of its enclosing block, so it is not added to the total time again
+    with ocp.build_profiler.record(ocp, "outer"):
+        with ocp.build_profiler.record(ocp, "inner"):
+            pass
+    nested_report = ocp.build_report()
+    inner, outer = nested_report["blocks"][-2:]
+    assert (inner["name"], inner["depth"]) == ("inner", 1)
+    assert (outer["name"], outer["depth"]) == ("outer", 0)
+    assert outer["time"] >= inner["time"]
+    np.testing.assert_almost_equal(nested_report["total_time"], report["total_time"] + outer["time"])
+
+
+def test_build_report_not_requested():
+    ocp = prepare_pendulum()
+    with pytest.raises(RuntimeError, match="build_report is only available if the program is declared with"):
+        ocp.build_report()
+
+
+def test_solver_stats():
+    ocp = prepare_pendulum()
+    sol = ocp.solve(solver_options={"record_iterations": True, "profile_blocks": True})
+
+    stats = sol["solver_stats"]
+    for key in ("t_wall_nlp_f", "t_wall_nlp_grad_f", "t_wall_nlp_hess_l", "n_call_nlp_f", "iter_count", "success"):
+        assert key in stats
+    np.testing.assert_equal(stats["iterations"]["obj"].shape[0], stats["iter_count"] + 1)
+    np.testing.assert_almost_equal(stats["iterations"]["obj"][-1], np.array(sol["f"])[0, 0])
+
+    for block in ("dynamics", "continuity", "constraints", "objectives"):
+        assert block in stats["blocks"]
+        assert stats["blocks"][block]["estimated_time"] >= 0
+    assert stats["blocks"]["dynamics"]["t_eval"] > 0
+
+
+def test_solver_stats_without_iterations():
+    ocp = prepare_pendulum()
+    sol = ocp.solve()
+    assert "iterations" not in sol["solver_stats"]
+    assert "blocks" not in sol["solver_stats"]
@@ -0,0 +1,65 @@
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+
+from bioptim import SolutionLibrary
+
+
+def prepare_pendulum(final_time, number_shooting_points):
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    spec = importlib.util.spec_from_file_location(
+        "pendulum", str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.py"
+    )
+    pendulum = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pendulum)
+
+    return pendulum.prepare_ocp(
+        biorbd_model_path=str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod",
+        final_time=final_time,
+        number_shooting_points=number_shooting_points,
+        nb_threads=1,
+    )
+
+
+def test_solution_library(tmp_path):
+    library = SolutionLibrary(str(tmp_path), max_entries=2)
+    ocp = prepare_pendulum(2, 10)
+    assert library.nearest(ocp) is None
+
+    sol = ocp.solve()
+    library.add(ocp, sol)
+    assert len(library) == 1
+
+    # A program of the same structure is started from the primal-dual solution of the nearest one
+    ocp_close = prepare_pendulum(2.1, 10)
+    sol_cold = ocp_close.solve()
+    out = library.initialize(ocp_close)
+    assert out["distance"] > 0
+    np.testing.assert_almost_equal(ocp_close.V_init.init, np.array(sol["x"]))
+    sol_warm = ocp_close.solve(resume_from=out["checkpoint"])
+    np.testing.assert_almost_equal(np.array(sol_warm["f"]), np.array(sol_cold["f"]), decimal=5)
+    assert sol_warm["solver_stats"]["iter_count"] < sol_cold["solver_stats"]["iter_count"]
+
+    # Each call writes its own checkpoint, unless the caller gives its path
+    out_other = library.initialize(ocp_close)
+    assert out_other["checkpoint"] != out["checkpoint"]
+    assert Path(out["checkpoint"]).exists() and Path(out_other["checkpoint"]).exists()
+    checkpoint_path = str(tmp_path / "checkpoints" / "close.npz")
+    out_other = library.initialize(ocp_close, checkpoint_path=checkpoint_path)
+    assert out_other["checkpoint"] == checkpoint_path
+    np.testing.assert_almost_equal(ocp_close.solve(resume_from=checkpoint_path)["f"], sol_warm["f"])
+
+    # With another number of nodes, only the interpolated initial guess is available
+    ocp_fine = prepare_pendulum(2, 20)
+    out = library.initialize(ocp_fine)
+    assert "checkpoint" not in out
+    np.testing.assert_almost_equal(ocp_fine.V_init.init[:4], np.array(sol["x"])[:4])
+    np.testing.assert_almost_equal(ocp_fine.V_init.init[-4:], np.array(sol["x"])[-4:])
+
+    # The least recently used solution is evicted, and the index is kept on disk
+    library.add(ocp_close, sol_warm)
+    library.add(ocp_fine, ocp_fine.solve())
+    assert len(library) == 2
+    assert not (tmp_path / "solution_0.bo").exists()
+    assert len(SolutionLibrary(str(tmp_path))) == 2
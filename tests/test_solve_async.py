@@ -0,0 +1,151 @@
+import asyncio
+from pathlib import Path
+from time import sleep
+
+import pytest
+import numpy as np
+import biorbd
+
+from bioptim import (
+    OptimalControlProgram,
+    DynamicsList,
+    DynamicsFcn,
+    Bounds,
+    QAndQDotBounds,
+    InitialGuess,
+    Objective,
+    ObjectiveFcn,
+)
+
+
+def prepare_pendulum():
+    PROJECT_FOLDER = Path(__file__).parent / ".."
+    biorbd_model = biorbd.Model(str(PROJECT_FOLDER) + "/examples/getting_started/pendulum.bioMod")
+    n_tau = biorbd_model.nbGeneralizedTorque()
+
+    dynamics = DynamicsList()
+    dynamics.add(DynamicsFcn.TORQUE_DRIVEN)
+
+    x_bounds = QAndQDotBounds(biorbd_model)
+    x_bounds[:, [0, -1]] = 0
+    x_bounds[1, -1] = 3.14
+    u_bounds = Bounds([-100] * n_tau, [100] * n_tau)
+    u_bounds[n_tau - 1, :] = 0
+
+    return OptimalControlProgram(
+        biorbd_model,
+        dynamics,
+        10,
+        2,
+        InitialGuess([0] * 4),
+        InitialGuess([0] * n_tau),
+        x_bounds,
+        u_bounds,
+        objective_functions=Objective(ObjectiveFcn.Lagrange.MINIMIZE_TORQUE),
+    )
+
+
+def test_solve_async():
+    ocp = prepare_pendulum()
+    sol_sync = ocp.solve()
+    assert not sol_sync["interrupted"]
+    # Without time budget, cancellation or checkpoint, no callback is added to the iterations
+    assert ocp.solver.monitor is None
+
+    future = ocp.solve_async()
+    sol = future.result()
+    assert not sol["interrupted"]
+    np.testing.assert_almost_equal(np.array(sol["x"]), np.array(sol_sync["x"]))
+
+    async def solve():
+        return await asyncio.wrap_future(ocp.solve_async())
+
+    sol = asyncio.run(solve())
+    np.testing.assert_almost_equal(np.array(sol["f"]), np.array(sol_sync["f"]))
+
+
+def test_solve_time_budget():
+    ocp = prepare_pendulum()
+    sol = ocp.solve(solver_options={"time_budget": 0})
+
+    # The solver stops at the first iteration, the initial guess being the best iterate
+    assert sol["interrupted"]
+    assert sol["interruption"] == "time_budget"
+    np.testing.assert_equal(sol["status"], 1)
+    np.testing.assert_equal(sol["solver_stats"]["return_status"], "User_Requested_Stop")
+    np.testing.assert_equal(np.array(sol["x"]).shape, (ocp.V.shape[0], 1))
+
+
+def test_solve_async_cancel():
+    ocp = prepare_pendulum()
+    future = ocp.solve_async(solver_options={"max_iter": 100000, "tol": 1e-30})
+    while not future.running() and not future.done():
+        sleep(0.001)
+
+    # The program cannot be solved again while it is being solved
+    with pytest.raises(RuntimeError, match="A solve of this program is already running"):
+        ocp.solve()
+    with pytest.raises(RuntimeError, match="A solve of this program is already running"):
+        ocp.solve_async()
+
+    # A running solve is not cancelled, it is interrupted at its next iteration
+    assert not future.cancel()
+    sol = future.result()
+
+    assert sol["interrupted"]
+    assert sol["interruption"] == "cancelled"
+    np.testing.assert_equal(np.array(sol["x"]).shape, (ocp.V.shape[0], 1))
+
+
+def test_solve_checkpoint_and_resume(tmp_path):
+    ocp = prepare_pendulum()
+    sol_full = ocp.solve()
+
+    # An interrupted solve leaves its last iterate on disk
+    checkpoint_path = str(tmp_path / "pendulum.npz")
+    sol = ocp.solve(solver_options={"max_iter": 5, "checkpoint_path": checkpoint_path, "checkpoint_every": 1})
+    np.testing.assert_equal(sol["solver_stats"]["iter_count"], 5)
+    assert not (tmp_path / "pendulum.npz.tmp").exists()
+
+    # The options of the interrupted solve are restored, unless they are given again
+    ocp = prepare_pendulum()
+    sol = ocp.solve(resume_from=checkpoint_path, solver_options={"max_iter": 1000})
+    np.testing.assert_almost_equal(np.array(sol["f"]), np.array(sol_full["f"]), decimal=5)
+    assert sol["solver_stats"]["iter_count"] < sol_full["solver_stats"]["iter_count"]
+
+    with pytest.raises(RuntimeError, match="The checkpoint .* does not exist"):
+        ocp.solve(resume_from=str(tmp_path / "missing.npz"))
+
+
+def test_solve_sensitivity_update():
+    ocp = prepare_pendulum()
+    target = np.linspace(0, 3.14, 11)[np.newaxis, :]
+    # An occluded sample, which must stay ignored by the predictions
+    target[0, 4] = np.nan
+    ocp.update_objectives(
+        Objective(ObjectiveFcn.Lagrange.TRACK_STATE, weight=10, index=[1], target=target, list_index=1)
+    )
+    sol = ocp.solve(sensitivity_update=True)
+    assert not sol["predicted"]
+
+    # A small change of the target is predicted from the derivatives of the solution, without calling Ipopt
+    ocp.update_objectives(
+        Objective(ObjectiveFcn.Lagrange.TRACK_STATE, weight=10, index=[1], target=target + 1e-4, list_index=1)
+    )
+    sol = ocp.solve(sensitivity_update=True, sensitivity_tol=1e-4)
+    assert sol["predicted"]
+    assert sol["kkt_residual"] <= 1e-4
+    np.testing.assert_equal(sol["solver_stats"]["return_status"], "Sensitivity_Update")
+    np.testing.assert_equal(sol["solver_stats"]["iter_count"], 0)
+    sol_full = ocp.solve()
+    assert sol["solver_stats"].keys() == sol_full["solver_stats"].keys()
+    np.testing.assert_almost_equal(np.array(sol["x"]), np.array(sol_full["x"]), decimal=5)
+
+    # A large change is solved by Ipopt, starting from the prediction
+    ocp.update_objectives(
+        Objective(ObjectiveFcn.Lagrange.TRACK_STATE, weight=10, index=[1], target=target + 0.5, list_index=1)
+    )
+    sol = ocp.solve(sensitivity_update=True, sensitivity_tol=1e-8)
+    assert not sol["predicted"]
+    assert sol["kkt_residual"] > 1e-8
+    np.testing.assert_equal(sol["status"], 0)